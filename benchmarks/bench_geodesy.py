@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Throughput of the batch geodetic ↔ ENU engine vs. the old per-point path.
+
+Run from the repository root:
+
+    python benchmarks/bench_geodesy.py            # N = 10, 10k, 1M
+    python benchmarks/bench_geodesy.py --loop-max 1000000
+
+The per-point path (one PyProj call + one f-string log line per row) is
+only timed up to ``--loop-max`` points; above that it is skipped because
+it takes minutes.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "pose_estimation"))
+
+from final_navigation.geodesy import (  # noqa: E402
+    _from_ecef,
+    _to_ecef,
+    enu_to_geodetic,
+    geodetic_to_enu,
+)
+
+ORIGIN = np.array([49.099386, 12.181031, 465.52])
+
+
+def _per_point_to_ecef(lat, lon, alt):
+    x, y, z = _to_ecef().transform(lon, lat, alt)
+    logging.info(f"Geodetic coordinates: {lat=}, {lon=}, {alt=} got converted to ECEF: {x=}, {y=}, {z=}")
+    return np.array([x, y, z])
+
+
+def _per_point_from_ecef(x, y, z):
+    lon, lat, alt = _from_ecef().transform(x, y, z)
+    logging.info(f"ECEF coordinates: {x=}, {y=}, {z=} got converted to Geodetic: {lat=}, {lon=}, {alt=}")
+    return np.array([lat, lon, alt])
+
+
+def _per_point_rot(origin):
+    lat0, lon0, _ = np.radians(origin)
+    sin_lat, cos_lat = np.sin(lat0), np.cos(lat0)
+    sin_lon, cos_lon = np.sin(lon0), np.cos(lon0)
+    return np.array(
+        [
+            [-sin_lon, cos_lon, 0.0],
+            [-sin_lat * cos_lon, -sin_lat * sin_lon, cos_lat],
+            [cos_lat * cos_lon, cos_lat * sin_lon, sin_lat],
+        ]
+    )
+
+
+def per_point_geodetic_to_enu(points, origin):
+    """Replica of the pre-batch implementation (one transform per row)."""
+    ecef0 = _per_point_to_ecef(*origin)
+    ecef_pts = np.vstack([_per_point_to_ecef(*p) for p in points])
+    return (_per_point_rot(origin) @ (ecef_pts - ecef0).T).T
+
+
+def per_point_enu_to_geodetic(enu, origin):
+    """Replica of the pre-batch implementation (one transform per row)."""
+    ecef0 = _per_point_to_ecef(*origin)
+    ecef = ecef0 + (_per_point_rot(origin).T @ enu.T).T
+    return np.vstack([_per_point_from_ecef(*row) for row in ecef])
+
+
+def synthetic_points(n: int, seed: int = 0) -> np.ndarray:
+    """*n* random points within ~500 m of :data:`ORIGIN`."""
+    rng = np.random.default_rng(seed)
+    offs = rng.uniform(-1, 1, size=(n, 3)) * np.array([0.005, 0.005, 30.0])
+    return ORIGIN + offs
+
+
+def _rate(fn, *args) -> tuple[float, np.ndarray]:
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - t0, out
+
+
+def run(sizes: list[int], loop_max: int) -> None:
+    _to_ecef(), _from_ecef()                 # transformers are built lazily – not part of the timings
+    print(f"{'N':>9} | {'path':<10} | {'fwd pts/s':>12} | {'inv pts/s':>12} | {'speed-up':>8}")
+    print("-" * 64)
+    for n in sizes:
+        pts = synthetic_points(n)
+        t_fwd, enu = _rate(geodetic_to_enu, pts, ORIGIN)
+        t_inv, back = _rate(enu_to_geodetic, enu, ORIGIN)
+        err = np.abs(back - pts).max()
+        print(f"{n:>9} | {'batch':<10} | {n / t_fwd:>12,.0f} | {n / t_inv:>12,.0f} | {'':>8}"
+              f"   (round-trip max err {err:.2e})")
+
+        if n > loop_max:
+            print(f"{n:>9} | {'per-point':<10} | {'skipped':>12} | {'skipped':>12} |")
+            continue
+        l_fwd, enu_loop = _rate(per_point_geodetic_to_enu, pts, ORIGIN)
+        l_inv, _ = _rate(per_point_enu_to_geodetic, enu_loop, ORIGIN)
+        assert np.allclose(enu, enu_loop, atol=1e-6), "batch and per-point ENU disagree"
+        speedup = (l_fwd + l_inv) / (t_fwd + t_inv)
+        print(f"{n:>9} | {'per-point':<10} | {n / l_fwd:>12,.0f} | {n / l_inv:>12,.0f} | {speedup:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 10_000, 1_000_000])
+    parser.add_argument("--loop-max", type=int, default=10_000,
+                        help="largest N for which the per-point path is timed")
+    args = parser.parse_args()
+    # INFO-level logging is what the pipeline runs with; keep it so the old
+    # per-point path pays its real formatting cost, but send it nowhere.
+    logging.basicConfig(level=logging.INFO, handlers=[logging.NullHandler()])
+    run(args.sizes, args.loop_max)
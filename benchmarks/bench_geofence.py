@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Geofence validation time for large missions.
+
+Run from the repository root:
+
+    python benchmarks/bench_geofence.py
+    python benchmarks/bench_geofence.py --waypoints 10000 100000 --zones 50 500
+
+Every mission is a random walk of hover waypoints over a 600 × 600 m site
+at 30 m, checked by :func:`geofence.validate_mission` against that many
+square keep-out prisms (racks, 4–16 m wide) and a straight pallet row.
+The table shows the best of ``--repeats`` runs and the number of
+violations found; ``--budget-ms`` fails the run (exit status 1) when the
+largest mission is slower than that.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+for _folder in ("pose_estimation", "kmz_file_generation"):
+    sys.path.insert(0, str(ROOT / _folder))
+logging.disable(logging.INFO)
+
+from config import TAKEOFF_REF_POINT  # noqa: E402
+from final_navigation.geodesy import enu_to_geodetic  # noqa: E402
+from geofence import Geofence, KeepOut, validate_mission  # noqa: E402
+from route import parse_ref_point  # noqa: E402
+from waypoints import WaypointArray  # noqa: E402
+
+SITE_M = 300.0
+
+
+def make_case(n_waypoints: int, n_zones: int, seed: int = 0) -> tuple[WaypointArray, Geofence, np.ndarray]:
+    """Random-walk mission, keep-out racks and pallet row around the take-off point."""
+    rng = np.random.default_rng(seed)
+    origin = parse_ref_point(TAKEOFF_REF_POINT)
+
+    walk = np.cumsum(rng.normal(0.0, 1.5, (n_waypoints, 2)), axis=0)
+    walk = (walk - walk.mean(axis=0)) / np.abs(walk - walk.mean(axis=0)).max() * SITE_M
+    geo = enu_to_geodetic(np.c_[walk, np.full(n_waypoints, 30.0)], origin)
+    waypoints = WaypointArray(longitude=geo[:, 1], latitude=geo[:, 0], altitude=geo[:, 2],
+                              height=np.full(n_waypoints, 30.0), heading=np.zeros(n_waypoints),
+                              pitch=np.zeros(n_waypoints))
+
+    corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]], dtype=float)
+    zones = []
+    for i in range(n_zones):
+        square = rng.uniform(-SITE_M, SITE_M, 2) + corners * rng.uniform(2.0, 8.0)
+        lla = enu_to_geodetic(np.c_[square, np.zeros(4)], origin)
+        zones.append(KeepOut(f"rack {i}", tuple(map(tuple, lla[:, :2].tolist())),
+                             floor=origin[2], ceiling=origin[2] + rng.uniform(20.0, 40.0)))
+
+    row = np.c_[np.linspace(-50.0, 50.0, 20), np.full(20, 40.0), np.zeros(20)]
+    return waypoints, Geofence(keep_out=tuple(zones)), enu_to_geodetic(row, origin)
+
+
+def run(sizes: list[int], zone_counts: list[int], repeats: int) -> float:
+    """Print the table; return the best time (s) of the largest case."""
+    print(f"{'waypoints':>9} | {'zones':>5} | {'ms':>8} | {'µs/wp':>6} | violations")
+    print("-" * 70)
+    seconds = 0.0
+    for n in sizes:
+        for zones in zone_counts:
+            waypoints, fence, pallets = make_case(n, zones)
+            validate_mission(waypoints, fence, pallets=pallets)               # warm-up (imports)
+            seconds = float("inf")
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                report = validate_mission(waypoints, fence, pallets=pallets)
+                seconds = min(seconds, time.perf_counter() - t0)
+            found = ", ".join(f"{v.check} {len(v.index)}" for v in report.violations) or "-"
+            print(f"{n:>9} | {zones:>5} | {seconds * 1e3:>8.1f} | {seconds / n * 1e6:>6.2f} | {found}")
+    return seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--waypoints", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--zones", type=int, nargs="+", default=[20, 300])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=500.0,
+                        help="maximum time of the largest case")
+    args = parser.parse_args()
+
+    largest = run(sorted(args.waypoints), sorted(args.zones), args.repeats)
+    if largest * 1e3 > args.budget_ms:
+        print(f"SLOW  {largest * 1e3:.1f} ms > {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Cold-start latency of the mission writer and the hover-point solver.
+
+Run from the repository root:
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --runs 20 --importtime
+
+Every run is a fresh interpreter, which is what a short-lived mission
+process pays.  Per entry point the table shows the median of:
+
+* ``import``     – importing the entry point;
+* ``first call`` – its first call (lazy dependencies load here);
+* ``process``    – wall time of the whole interpreter, start-up included;
+
+plus the heavy modules that are already loaded right after the import.
+``--importtime`` prints the slowest modules of one run
+(``python -X importtime``).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+PATHS = [str(ROOT / "kmz_file_generation"), str(ROOT / "pose_estimation")]
+
+#: Modules that dominate start-up when they are imported eagerly
+HEAVY = ("scipy", "pyproj", "pandas", "PIL", "cv2")
+
+#: entry point → (import statement, first call)
+ENTRY_POINTS = {
+    "build_kmz": (
+        "from writer import Waypoint, build_kmz",
+        "import tempfile\n"
+        "with tempfile.TemporaryDirectory() as tmp:\n"
+        "    build_kmz([Waypoint(longitude=12.181 + 1e-4 * i, latitude=49.099, altitude=470.0,\n"
+        "                        height=40, heading=0, pitch=0) for i in range(3)], f'{tmp}/m.kmz')",
+    ),
+    "compute_target_coordinate": (
+        "from final_navigation import compute_target_coordinate",
+        "import contextlib, io\n"
+        "with contextlib.redirect_stdout(io.StringIO()):\n"
+        "    compute_target_coordinate([[49.0990, 12.1810, 445.3], [49.0990, 12.1811, 445.1],\n"
+        "                               [49.0991, 12.1811, 445.4], [49.0991, 12.1810, 445.2]])",
+    ),
+}
+
+_PROBE = """
+import sys, time, json
+sys.path[:0] = {paths!r}
+t0 = time.perf_counter()
+{stmt}
+t1 = time.perf_counter()
+loaded = [m for m in {heavy!r} if m in sys.modules]
+{call}
+t2 = time.perf_counter()
+print(json.dumps({{"import": t1 - t0, "call": t2 - t1, "loaded": loaded}}))
+"""
+
+
+def probe(name: str) -> dict:
+    """One fresh-interpreter measurement of *name*."""
+    stmt, call = ENTRY_POINTS[name]
+    code = _PROBE.format(paths=PATHS, stmt=stmt, call=call, heavy=HEAVY)
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["process"] = time.perf_counter() - t0
+    return result
+
+
+def slowest_imports(name: str, top: int) -> list[tuple[int, str]]:
+    """``(cumulative µs, module)`` of the *top* slowest imports of *name*."""
+    code = f"import sys; sys.path[:0] = {PATHS!r}\n{ENTRY_POINTS[name][0]}"
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                         capture_output=True, text=True, check=True, cwd=ROOT).stderr
+    rows = []
+    for line in err.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def run(names: list[str], runs: int, importtime: int) -> None:
+    print(f"{'entry point':<26} | {'import ms':>9} | {'first call ms':>13} | {'process ms':>10} | loaded at import")
+    print("-" * 90)
+    for name in names:
+        probe(name)                                     # warm the bytecode cache
+        results = [probe(name) for _ in range(runs)]
+
+        def median_ms(key):
+            return statistics.median(r[key] for r in results) * 1e3
+
+        loaded = ", ".join(results[-1]["loaded"]) or "-"
+        print(f"{name:<26} | {median_ms('import'):>9.1f} | {median_ms('call'):>13.1f} | "
+              f"{median_ms('process'):>10.1f} | {loaded}")
+    if importtime:
+        for name in names:
+            print(f"\nslowest imports of {name}:")
+            for us, module in slowest_imports(name, importtime):
+                print(f"  {us / 1e3:>8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entry", nargs="+", choices=list(ENTRY_POINTS), default=list(ENTRY_POINTS))
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--importtime", type=int, nargs="?", const=10, default=0, metavar="TOP",
+                        help="also list the TOP slowest imports of one run")
+    args = parser.parse_args()
+    run(args.entry, args.runs, args.importtime)
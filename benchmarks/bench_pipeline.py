@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+End-to-end pipeline benchmark on synthetic flights, checked against a baseline.
+
+Run from the repository root:
+
+    python benchmarks/bench_pipeline.py                      # compare with baseline.json
+    python benchmarks/bench_pipeline.py --scales small medium
+    python benchmarks/bench_pipeline.py --save-baseline      # record this machine's numbers
+
+Every scale is one flight from :mod:`synthetic_flight` (GPS-tagged JPEGs on
+disk, detections in memory).  The stages are timed one by one – best of
+``--repeats`` runs – and once more under tracemalloc for their peak
+memory:
+
+=============  =====================================================
+stage          timed call
+=============  =====================================================
+exif           :func:`camera_position.join_camera_positions` (no cache)
+geodesy        ``geodetic_to_enu`` + ``enu_to_geodetic`` of every box
+rank           :func:`pallet_ranks.rank_pallet_points`
+triangulate    :meth:`triangulation.Triangulator.triangulate`
+merge          :func:`pallet_merge.merge_pallets`
+mono           :func:`ground_projection.locate_pallets` (known plane and
+               camera attitude)
+hover          :func:`flight_pipeline.hover_waypoints`
+kmz            :func:`writer.build_kmz`
+pipeline       :func:`flight_pipeline.run_flight` from the boxes CSV and
+               the photo folder, without the stage cache
+=============  =====================================================
+
+The pallets found by ``triangulate`` + ``merge`` and by ``mono`` are
+scored against the ground truth (:func:`synthetic_flight.score`).
+
+A stage regresses when it is more than ``--tolerance`` slower than the
+baseline (and by more than ``--min-delta-ms``), when its peak memory grows
+by the same factor, or when the recall drops; the script then exits with
+status 1.
+
+Timings are machine-specific.  Every run also times a fixed calibration
+workload (:func:`calibrate`, Python loops, numpy and pandas) before and
+after the scales, keeping the faster, and the baseline stores that time
+next to the stage times; baseline times are
+scaled by the ratio of the two calibrations before comparing, so a
+baseline recorded on a faster or slower host still applies.  The scaling
+is only as good as the calibration is representative – re-record the
+baseline (``--save-baseline``) when the host changes a lot, e.g. another
+CPU family, Python or numpy version.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+for _folder in ("pipeline", "pose_estimation", "kmz_file_generation", "object_detection"):
+    sys.path.insert(0, str(ROOT / _folder))
+logging.disable(logging.INFO)
+
+from camera_position import join_camera_positions  # noqa: E402
+from final_navigation.geodesy import enu_to_geodetic, geodetic_to_enu  # noqa: E402
+from final_navigation.geometry import BACK_DISTANCE_METRES, UP_DISTANCE_METRES  # noqa: E402
+from flight_pipeline import hover_waypoints, run_flight  # noqa: E402
+from ground_projection import GroundProjector, locate_pallets  # noqa: E402
+from pallet_merge import merge_pallets  # noqa: E402
+from pallet_ranks import rank_pallet_points  # noqa: E402
+from synthetic_flight import make_flight, score  # noqa: E402
+from triangulation import CameraIntrinsics, Triangulator, camera_rotation  # noqa: E402
+from writer import WaypointArray, build_kmz  # noqa: E402
+
+BASELINE = Path(__file__).with_name("baseline.json")
+
+#: scale → (pallets, images, capture distance m, camera height m); the
+#: README's 10 m / 5 m geometry, stretched where a longer row must fit the view
+SCALES = {
+    "small": (4, 12, 10.0, 5.0),
+    "medium": (12, 200, 20.0, 10.0),
+    "large": (24, 2000, 40.0, 20.0),
+}
+STAGES = ["exif", "geodesy", "rank", "triangulate", "merge", "mono", "hover", "kmz", "pipeline"]
+
+
+def _best_of(fn, repeats: int) -> tuple[float, object]:
+    best, out = float("inf"), None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def calibrate(repeats: int = 10) -> float:
+    """Best-of-*repeats* seconds of a fixed Python / numpy / pandas workload."""
+    rng = np.random.default_rng(0)
+    points = rng.normal(size=(20_000, 3))
+    frame = pd.DataFrame({"key": rng.integers(0, 500, 20_000), "value": points[:, 0]})
+
+    def workload():
+        counts = {}
+        for i in range(30_000):
+            counts[i % 97] = counts.get(i % 97, 0) + i
+        np.linalg.svd(points[:6_000].reshape(-1, 4, 3), full_matrices=False)
+        np.sort(np.hypot(points[:, 0], points[:, 1]))
+        frame.groupby("key")["value"].agg(["mean", "count"])
+
+    return _best_of(workload, repeats)[0]
+
+
+def _peak_bytes(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_scale(name: str, repeats: int, seed: int = 0) -> dict:
+    """``{"stages": {stage: {"seconds", "peak_mb"}}, "accuracy": {...}}`` for one scale."""
+    n_pallets, n_images, distance, height = SCALES[name]
+    intrinsics = CameraIntrinsics()
+    flight = make_flight(n_pallets, n_images, distance, height, intrinsics=intrinsics, seed=seed)
+    plane_alt = float(flight.truth["alt"].mean())
+    triangulator = Triangulator(intrinsics, camera_rotation(flight.heading, flight.pitch))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        photos = flight.write_photos(tmp / "photos")
+        boxes_csv = tmp / "boxes.csv"
+        flight.boxes.to_csv(boxes_csv, index=False)
+
+        # Each stage is fed the previous stage's output, computed once up front
+        combined = join_camera_positions(flight.boxes, photos)
+        cams = combined[["latitude", "longitude", "altitude"]].to_numpy(dtype=float)
+        origin = cams.mean(axis=0)
+        ranked = rank_pallet_points(combined, intrinsics.image_width_px, intrinsics.image_height_px)
+        triangulated = triangulator.triangulate(ranked)
+        pallets = merge_pallets(triangulated)
+        hover = hover_waypoints(pallets, BACK_DISTANCE_METRES, UP_DISTANCE_METRES)
+        projector = GroundProjector(intrinsics, flight.heading, flight.pitch, plane_alt=plane_alt)
+
+        calls = {
+            "exif": lambda: join_camera_positions(flight.boxes, photos),
+            "geodesy": lambda: enu_to_geodetic(geodetic_to_enu(cams, origin), origin),
+            "rank": lambda: rank_pallet_points(combined, intrinsics.image_width_px, intrinsics.image_height_px),
+            "triangulate": lambda: triangulator.triangulate(ranked),
+            "merge": lambda: merge_pallets(triangulated),
+            "mono": lambda: locate_pallets(combined, projector),
+            "hover": lambda: hover_waypoints(pallets, BACK_DISTANCE_METRES, UP_DISTANCE_METRES),
+            "kmz": lambda: build_kmz(WaypointArray.from_frame(hover), tmp / "bench.kmz"),
+            "pipeline": lambda: run_flight(tmp / "pipeline.kmz", cache_dir=None, boxes_csv=boxes_csv,
+                                           photo_dir=photos, intrinsics=intrinsics,
+                                           camera_heading=flight.heading, camera_pitch=flight.pitch),
+        }
+        stages = {}
+        for stage in STAGES:
+            seconds, _ = _best_of(calls[stage], repeats)
+            stages[stage] = {"seconds": seconds, "peak_mb": _peak_bytes(calls[stage]) / 2**20}
+
+    accuracy = {"triangulate": score(pallets, flight.truth),
+                "mono": score(locate_pallets(combined, projector), flight.truth)}
+    return {"pallets": n_pallets, "images": n_images, "boxes": len(flight.boxes),
+            "stages": stages, "accuracy": accuracy}
+
+
+def host_speed(calibration: float, baseline: dict) -> float:
+    """Factor that scales *baseline* times to this host (1.0 without a recorded calibration)."""
+    recorded = baseline.get("calibration_s")
+    return calibration / recorded if recorded else 1.0
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta_ms: float,
+            speed: float = 1.0) -> list[str]:
+    """
+    Human-readable regressions of *results* against *baseline*.
+
+    :param speed: :func:`host_speed`; baseline times are multiplied by it.
+    """
+    problems = []
+    for scale, res in results.items():
+        base = baseline.get("scales", {}).get(scale)
+        if base is None:
+            continue
+        for stage, cur in res["stages"].items():
+            old = base["stages"].get(stage)
+            if old is None:
+                continue
+            expected = old["seconds"] * speed
+            if cur["seconds"] > expected * tolerance and (cur["seconds"] - expected) * 1e3 > min_delta_ms:
+                problems.append(f"{scale}/{stage}: {expected * 1e3:.1f} → {cur['seconds'] * 1e3:.1f} ms")
+            if cur["peak_mb"] > old["peak_mb"] * tolerance and cur["peak_mb"] - old["peak_mb"] > 1.0:
+                problems.append(f"{scale}/{stage}: peak {old['peak_mb']:.1f} → {cur['peak_mb']:.1f} MB")
+        for method, acc in res["accuracy"].items():
+            old = base["accuracy"].get(method)
+            if old is not None and acc["recall"] < old["recall"]:
+                problems.append(f"{scale}/{method}: recall {old['recall']:.0%} → {acc['recall']:.0%}")
+    return problems
+
+
+def print_results(results: dict, baseline: dict | None, speed: float = 1.0) -> None:
+    print(f"{'scale':<7} | {'stage':<11} | {'ms':>9} | {'baseline ms':>11} | {'ratio':>6} | {'peak MB':>8}")
+    print("-" * 68)
+    for scale, res in results.items():
+        base = (baseline or {}).get("scales", {}).get(scale, {}).get("stages", {})
+        for stage, cur in res["stages"].items():
+            old = base.get(stage)
+            ref = f"{old['seconds'] * speed * 1e3:>11.1f} | {cur['seconds'] / (old['seconds'] * speed):>5.2f}x" \
+                if old else \
+                f"{'-':>11} | {'-':>6}"
+            print(f"{scale:<7} | {stage:<11} | {cur['seconds'] * 1e3:>9.1f} | {ref} | {cur['peak_mb']:>8.1f}")
+        for method, acc in res["accuracy"].items():
+            print(f"{scale:<7} | {method:<11} | recall {acc['recall']:.0%}, median err {acc['median_err_m']:.3f} m, "
+                  f"max err {acc['max_err_m']:.3f} m, spurious {acc['spurious']}")
+        print(f"{'':<7} | {res['images']} images, {res['boxes']} boxes, {res['pallets']} pallets")
+        print("-" * 68)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=list(SCALES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with this run")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="allowed slow-down / memory growth factor")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0,
+                        help="ignore slow-downs smaller than this (timer noise on tiny stages)")
+    args = parser.parse_args()
+
+    calibration = calibrate()
+    results = {scale: bench_scale(scale, args.repeats) for scale in args.scales}
+    calibration = min(calibration, calibrate())
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else None
+    reference = None if args.save_baseline else baseline
+    speed = host_speed(calibration, reference) if reference is not None else 1.0
+    if reference is not None and "calibration_s" in reference:
+        print(f"Calibration {calibration * 1e3:.1f} ms, baseline {reference['calibration_s'] * 1e3:.1f} ms: "
+              f"baseline times scaled by {speed:.2f}")
+    elif reference is not None:
+        print(f"{args.baseline.name} has no calibration – times are compared unscaled; re-record it")
+    print_results(results, reference, speed)
+
+    if args.save_baseline:
+        record = {"machine": platform.platform(), "python": platform.python_version(),
+                  "numpy": np.__version__, "calibration_s": calibration, "scales": results}
+        args.baseline.write_text(json.dumps(record, indent=2) + "\n", encoding="utf-8")
+        print(f"🎉  Baseline written: {args.baseline.resolve()}")
+    elif baseline is not None:
+        problems = compare(results, baseline, args.tolerance, args.min_delta_ms, speed)
+        for problem in problems:
+            print(f"REGRESSION  {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline.name} ({baseline.get('machine', '?')})")
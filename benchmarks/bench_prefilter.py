@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Preview prefilter cascade vs. full-resolution detection on every frame.
+
+Run from the repository root:
+
+    python benchmarks/bench_prefilter.py
+    python benchmarks/bench_prefilter.py --weights runs/detect/train/weights/best.pt
+
+Recall is measured on the existing detection CSVs: the full-resolution
+boxes are shrunk to each preview size and boxes with a side below
+``--min-px`` (the detector's smallest stride) are dropped – that is what
+the preview pass can at best see.  :func:`prefilter.select_frames` then
+decides which frames go to the full pass, and ``rank_pallet_points`` is run
+on the survivors:
+
+* ``pass``       – share of frames sent to the full pass;
+* ``frames``     – recall of the frames ``rank_pallet_points`` uses;
+* ``rows``       – recall of its ranked ``(image, rank)`` points.
+
+Throughput is measured on a synthetic 4032×3024 JPEG with an embedded
+160×120 EXIF thumbnail: decode time per source, plus YOLO inference at
+``imgsz=1280`` vs. the preview size when ``--weights`` is given.  Without
+weights, ``--infer-ms`` models inference as that many ms at 1280 scaled by
+input area; with neither, the images/sec columns are decode-only.  Cascade
+cost per frame is ``preview + pass × full``.
+
+Entropy decoding is not reduced by DCT scaling, so a draft decode of a
+~5 MB frame is only ~1.5–2× faster than a full decode: the cascade pays
+off through the smaller inference, not through decoding.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "object_detection"))
+sys.path.insert(0, str(ROOT / "pose_estimation"))
+logging.disable(logging.INFO)
+
+from pallet_ranks import rank_pallet_points  # noqa: E402
+from prefilter import decode_draft, decode_thumbnail, select_frames  # noqa: E402
+
+IMAGE_W, IMAGE_H = 4032, 3024
+THUMB_W, THUMB_H = 160, 120
+FULL_IMGSZ = 1280
+DEFAULT_CSVS = [ROOT / "pose_estimation" / "combined_with_gps.csv",
+                ROOT / "object_detection" / "test_boundingBox.csv"]
+
+#: source → (decode function, linear downscale factor)
+SOURCES = {
+    "draft/2": (lambda p: decode_draft(p, 2), 2.0),
+    "draft/4": (lambda p: decode_draft(p, 4), 4.0),
+    "draft/8": (lambda p: decode_draft(p, 8), 8.0),
+    "thumbnail": (decode_thumbnail, IMAGE_W / THUMB_W),
+}
+
+
+# ---------------------------------------------------------------------- #
+#  Recall on the detection CSVs                                           #
+# ---------------------------------------------------------------------- #
+def load_boxes(path: Path) -> pd.DataFrame:
+    df = pd.read_csv(path)
+    for col in ("latitude", "longitude", "altitude"):
+        if col not in df:
+            df[col] = np.nan
+    return df
+
+
+def simulate_preview(boxes: pd.DataFrame, scale: float, min_px: float) -> pd.DataFrame:
+    """Boxes as seen at 1/*scale* resolution; boxes below *min_px* are lost."""
+    preview = boxes[["image", "class", "x1", "y1", "x2", "y2"]].copy()
+    preview[["x1", "y1", "x2", "y2"]] = np.round(preview[["x1", "y1", "x2", "y2"]] / scale)
+    side = np.minimum(boxes["x2"] - boxes["x1"], boxes["y2"] - boxes["y1"]) / scale
+    return preview[side.to_numpy() >= min_px]
+
+
+def recall(boxes: pd.DataFrame, scale: float, min_px: float, thresh: float) -> tuple[float, float, float]:
+    """``(pass rate, frame recall, row recall)`` of the cascade at one preview scale."""
+    full = rank_pallet_points(boxes, IMAGE_W, IMAGE_H, thresh)
+    passed = select_frames(simulate_preview(boxes, scale, min_px))
+    cascade = rank_pallet_points(boxes[boxes["image"].astype(str).isin(passed)], IMAGE_W, IMAGE_H, thresh)
+
+    def keys(ranked):
+        return set(zip(ranked["image"].astype(str), ranked["rank"]))
+
+    full_frames = set(full["image"].astype(str))
+    frames = len(full_frames & set(cascade["image"].astype(str))) / len(full_frames) if full_frames else 1.0
+    rows = len(keys(full) & keys(cascade)) / len(full) if len(full) else 1.0
+    return len(passed) / boxes["image"].nunique(), frames, rows
+
+
+# ---------------------------------------------------------------------- #
+#  Throughput on a synthetic frame                                        #
+# ---------------------------------------------------------------------- #
+def _exif_with_thumbnail(thumb: bytes) -> bytes:
+    """APP1 segment: empty IFD0 → IFD1 with JPEGInterchangeFormat(+Length)."""
+    ifd0 = struct.pack("<HI", 0, 14)
+    ifd1 = struct.pack("<H", 2) + struct.pack("<HHII", 0x0201, 4, 1, 44) + struct.pack("<HHII", 0x0202, 4, 1, len(thumb))
+    tiff = b"II*\x00" + struct.pack("<I", 8) + ifd0 + ifd1 + struct.pack("<I", 0) + thumb
+    payload = b"Exif\x00\x00" + tiff
+    return b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+
+
+def synthetic_frame(folder: Path, seed: int = 0) -> Path:
+    """A DJI-sized JPEG with photo-like texture and an EXIF thumbnail."""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    base = cv2.resize(rng.uniform(0, 255, (96, 128, 3)).astype(np.uint8), (IMAGE_W, IMAGE_H),
+                      interpolation=cv2.INTER_CUBIC)
+    img = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    full = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 92])[1].tobytes()
+    thumb = cv2.imencode(".jpg", cv2.resize(img, (THUMB_W, THUMB_H), interpolation=cv2.INTER_AREA))[1].tobytes()
+    path = folder / "DJI_synthetic_V.jpeg"
+    path.write_bytes(full[:2] + _exif_with_thumbnail(thumb) + full[2:])
+    return path
+
+
+def _timed(fn, repeats: int) -> tuple[float, object]:
+    out = fn()
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        out = fn()
+    return (time.perf_counter() - t0) / repeats, out
+
+
+def frame_costs(path: Path, repeats: int, weights: str | None, infer_ms: float | None) -> dict[str, float]:
+    """Seconds per frame for ``full`` and every preview source."""
+    import cv2
+
+    model = None
+    if weights is not None:
+        from ultralytics import YOLO
+
+        model = YOLO(weights)
+
+    def cost(decode, imgsz):
+        seconds, img = _timed(lambda: decode(path), repeats)
+        size = imgsz or min(FULL_IMGSZ, 32 * -(-max(img.shape[:2]) // 32))
+        if model is not None:
+            seconds += _timed(lambda: model.predict(source=[img], imgsz=size, verbose=False), repeats)[0]
+        elif infer_ms is not None:
+            seconds += infer_ms / 1e3 * (size / FULL_IMGSZ) ** 2
+        return seconds
+
+    costs = {"full": cost(lambda p: cv2.imread(str(p)), FULL_IMGSZ)}
+    for name, (decode, _) in SOURCES.items():
+        costs[name] = cost(decode, None)
+    return costs
+
+
+def run(csvs: list[Path], min_px: float, thresh: float, repeats: int,
+        weights: str | None, infer_ms: float | None) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        costs = frame_costs(synthetic_frame(Path(tmp)), repeats, weights, infer_ms)
+    what = ("decode + inference" if weights else
+            f"decode + modelled inference {infer_ms:g} ms @1280" if infer_ms is not None else "decode only")
+    full_rate = 1.0 / costs["full"]
+    print(f"full pass: {costs['full'] * 1e3:.1f} ms/frame ({what})")
+    print(f"{'csv':<22} | {'source':<9} | {'ms/frame':>8} | {'pass':>5} | {'frames':>6} | {'rows':>6} | "
+          f"{'full img/s':>10} | {'cascade img/s':>13} | {'speed-up':>8}")
+    print("-" * 110)
+    for csv in csvs:
+        boxes = load_boxes(csv)
+        for name, (_, scale) in SOURCES.items():
+            scale = max(scale, IMAGE_W / FULL_IMGSZ)           # previews are never inferred above 1280
+            pass_rate, frames, rows = recall(boxes, scale, min_px, thresh)
+            rate = 1.0 / (costs[name] + pass_rate * costs["full"])
+            print(f"{csv.name:<22} | {name:<9} | {costs[name] * 1e3:>8.1f} | {pass_rate:>5.0%} | {frames:>6.1%} | "
+                  f"{rows:>6.1%} | {full_rate:>10.1f} | {rate:>13.1f} | {rate / full_rate:>7.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--csv", type=Path, nargs="+", default=DEFAULT_CSVS)
+    parser.add_argument("--min-px", type=float, default=8.0, help="smallest box side the preview pass detects")
+    parser.add_argument("--barcode-vis-thresh", type=float, default=0.7)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--weights", default=None, help="YOLO weights for end-to-end timings (needs ultralytics)")
+    parser.add_argument("--infer-ms", type=float, default=None,
+                        help="without --weights: assumed inference ms per frame at imgsz=1280")
+    args = parser.parse_args()
+    run(args.csv, args.min_px, args.barcode_vis_thresh, args.repeats, args.weights, args.infer_ms)
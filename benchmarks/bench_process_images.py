@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Vectorised pallet ranking vs. the per-image ``process_images`` loop.
+
+Run from the repository root:
+
+    python benchmarks/bench_process_images.py               # 100k rows
+    python benchmarks/bench_process_images.py --rows 1000000
+
+Checks that both paths agree on ``pose_estimation/combined_with_gps.csv``
+and on a synthetic table, then reports the speed-up.  The legacy path needs
+scikit-learn.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "pose_estimation"))
+
+from pallet_ranks import rank_pallet_points, ranks_to_dicts  # noqa: E402
+
+IMAGE_W, IMAGE_H = 4032, 3024
+
+
+def legacy_process_images(df, image_width_px, image_height_px, barcode_vis_thresh=0.7):
+    """Verbatim copy of ``process_images`` from geometry_2d.ipynb."""
+    from sklearn.decomposition import PCA
+
+    def fit_line_2d(pts):
+        pca = PCA(n_components=1)
+        pca.fit(pts)
+        direction = pca.components_[0]
+        direction /= np.linalg.norm(direction)
+        return pca.mean_, direction
+
+    def angle_to_horizontal(direction):
+        cosang = np.clip(np.dot(direction, np.array([1.0, 0.0])), -1.0, 1.0)
+        return np.degrees(np.arccos(abs(cosang)))
+
+    bc_counts = df[df['class'] == 'barcode'].groupby('image').size()
+    max_barcodes = int(bc_counts.max()) if not bc_counts.empty else 0
+    thresh_count = max_barcodes * barcode_vis_thresh
+    optical_center = np.array([image_width_px / 2.0, image_height_px / 2.0], dtype=float)
+
+    sorted_pts, cam_meta = {}, {}
+    for img, grp in df.groupby('image'):
+        if (grp['class'] == 'barcode').sum() < thresh_count:
+            continue
+        cam_meta[img] = {'lat': grp['latitude'].iloc[0], 'lon': grp['longitude'].iloc[0],
+                         'alt': grp['altitude'].iloc[0]}
+        pal = grp[grp['class'] == 'pallets']
+        if pal.shape[0] < 2:
+            continue
+        pts1 = pal[['x1', 'y1']].to_numpy()
+        pts2 = pal[['x2', 'y2']].to_numpy()
+        _, dir1 = fit_line_2d(pts1)
+        if angle_to_horizontal(dir1) >= 45.0:
+            continue
+        d1 = np.linalg.norm(pts1 - optical_center, axis=1).mean()
+        d2 = np.linalg.norm(pts2 - optical_center, axis=1).mean()
+        chosen = pts1 if d1 < d2 else pts2
+        sorted_pts[img] = chosen[np.argsort(chosen[:, 0])].tolist()
+
+    final_list = []
+    if sorted_pts:
+        for rank in range(max(len(p) for p in sorted_pts.values())):
+            entry = {}
+            for img, pts in sorted_pts.items():
+                if rank < len(pts):
+                    x, y = pts[rank]
+                    meta = cam_meta[img]
+                    entry[img] = {"point": (x, y), 'lat': meta['lat'], 'lon': meta['lon'], 'alt': meta['alt']}
+            final_list.append(entry)
+    return final_list
+
+
+def synthetic_detections(n_rows: int, boxes_per_image: int = 20, seed: int = 0) -> pd.DataFrame:
+    """Detection table shaped like ``combined_with_gps.csv``."""
+    rng = np.random.default_rng(seed)
+    n_img = max(1, n_rows // boxes_per_image)
+    img = np.repeat(np.arange(n_img), boxes_per_image)[:n_rows]
+    cls = np.where(rng.random(n_rows) < 0.5, "barcode", "pallets")
+    slope = rng.normal(0, 0.3, n_img)[img]
+    x1 = rng.uniform(0, IMAGE_W - 300, n_rows)
+    y1 = 1000 + slope * x1 + rng.normal(0, 30, n_rows)
+    cam = np.column_stack([49.0993 + rng.normal(0, 1e-4, n_img), 12.181 + rng.normal(0, 1e-4, n_img),
+                           rng.uniform(480, 490, n_img)])[img]
+    return pd.DataFrame({
+        "image": np.char.add("DJI_", img.astype(str).astype("U8")),
+        "class": cls,
+        "x1": x1, "x2": x1 + rng.uniform(100, 300, n_rows),
+        "y1": y1, "y2": y1 + rng.uniform(100, 300, n_rows),
+        "latitude": cam[:, 0], "longitude": cam[:, 1], "altitude": cam[:, 2],
+    })
+
+
+def _same(a: list[dict], b: list[dict]) -> bool:
+    if len(a) != len(b):
+        return False
+    for ra, rb in zip(a, b):
+        if list(ra) != list(rb):
+            return False
+        for img in ra:
+            if not np.allclose(ra[img]["point"], rb[img]["point"]) or \
+                    not np.allclose([ra[img][k] for k in ("lat", "lon", "alt")],
+                                    [rb[img][k] for k in ("lat", "lon", "alt")]):
+                return False
+    return True
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - t0, out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    real = pd.read_csv(ROOT / "pose_estimation" / "combined_with_gps.csv")
+    for vis in (0.0, 0.3, 0.7):
+        ok = _same(ranks_to_dicts(rank_pallet_points(real, IMAGE_W, IMAGE_H, vis)),
+                   legacy_process_images(real, IMAGE_W, IMAGE_H, vis))
+        print(f"combined_with_gps.csv, barcode_vis_thresh={vis}: {'match' if ok else 'MISMATCH'}")
+
+    synth = synthetic_detections(args.rows)
+    t_new, ranked = _timed(rank_pallet_points, synth, IMAGE_W, IMAGE_H, 0.3)
+    t_old, legacy = _timed(legacy_process_images, synth, IMAGE_W, IMAGE_H, 0.3)
+    print(f"synthetic {args.rows:,} rows: {'match' if _same(ranks_to_dicts(ranked), legacy) else 'MISMATCH'}")
+    print(f"  legacy loop : {t_old:8.3f} s")
+    print(f"  vectorised  : {t_new:8.3f} s   ({t_old / t_new:.1f}x faster, {len(ranked):,} ranked points)")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Waypoints/sec of the pre-compiled Placemark renderer vs. string.Template.
+
+Run from the repository root:
+
+    python benchmarks/bench_render.py
+    python benchmarks/bench_render.py --sizes 1000 100000
+
+Three paths are timed for both the KML and the WPML Placemark block:
+
+* ``template``  – one ``string.Template(...).safe_substitute`` per waypoint
+                  (the original writer);
+* ``waypoints`` – compiled renderer fed with ``Waypoint`` objects;
+* ``arrays``    – compiled renderer fed with NumPy columns.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from string import Template
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "kmz_file_generation"))
+logging.disable(logging.INFO)
+
+import render as R  # noqa: E402
+import templates as T  # noqa: E402
+from writer import Waypoint  # noqa: E402
+
+
+def template_kml(wpt: Waypoint, index: int) -> str:
+    return Template(T.WAYPOINT_BLOCK).safe_substitute({
+        "LONGITUDE": wpt.longitude, "LATITUDE": wpt.latitude, "ALTITUDE": wpt.altitude,
+        "INDEX": index, "HEIGHT": wpt.height, "ACTION_GROUP_ID": index,
+        "HEADING": wpt.heading, "PITCH": wpt.pitch,
+    })
+
+
+def template_wpml(wpt: Waypoint, index: int) -> str:
+    return Template(T.WPML_WAYPOINT_BLOCK).safe_substitute({
+        "LONGITUDE": wpt.longitude, "LATITUDE": wpt.latitude, "INDEX": index,
+        "ALTITUDE": wpt.altitude, "HEADING": wpt.heading,
+    })
+
+
+def synthetic_columns(n: int, seed: int = 0) -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    return {
+        "LONGITUDE": 12.181 + rng.uniform(-0.01, 0.01, n),
+        "LATITUDE": 49.099 + rng.uniform(-0.01, 0.01, n),
+        "ALTITUDE": rng.uniform(450, 500, n),
+        "HEIGHT": rng.uniform(5, 40, n),
+        "HEADING": rng.uniform(-180, 180, n),
+        "PITCH": rng.uniform(-90, 0, n),
+        "TURN_MODE": R.turn_modes(np.ones(n)),
+    }
+
+
+def _wps_per_sec(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return n / (time.perf_counter() - t0)
+
+
+def run(sizes: list[int]) -> None:
+    print(f"{'N':>8} | {'doc':<4} | {'template':>12} | {'waypoints':>12} | {'arrays':>12} | {'speed-up':>8}")
+    print("-" * 72)
+    for n in sizes:
+        cols = synthetic_columns(n)
+        wps = [Waypoint(*row) for row in zip(*(cols[k].tolist() for k in R.WAYPOINT_FIELDS))]
+        for doc, legacy, block in (("kml", template_kml, R.KML_PLACEMARK),
+                                   ("wpml", template_wpml, R.WPML_PLACEMARK)):
+            old = _wps_per_sec(lambda: "\n".join(legacy(w, i) for i, w in enumerate(wps)), n)
+            objs = _wps_per_sec(lambda: "\n".join(R.iter_placemarks(block, wps)), n)
+            arrs = _wps_per_sec(lambda: "\n".join(R.iter_placemarks_from_arrays(block, cols)), n)
+            print(f"{n:>8} | {doc:<4} | {old:>12,.0f} | {objs:>12,.0f} | {arrs:>12,.0f} | {arrs / old:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    run(parser.parse_args().sizes)
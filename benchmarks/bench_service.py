@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Mission latency through the local service against a fresh interpreter.
+
+Run from the repository root:
+
+    python benchmarks/bench_service.py
+    python benchmarks/bench_service.py --waypoints 100 10000 --repeats 20
+    python benchmarks/bench_service.py --check
+
+Per mission size the table shows the median time to get the KMZ bytes:
+
+* ``process`` – a fresh interpreter that imports the writer and calls
+  :func:`writer.kmz_bytes` (what a main.py run pays);
+* ``miss``    – :class:`service.MissionClient` request rendered in the pool;
+* ``hit``     – the same request again, answered from the LRU;
+* ``arrow``   – the hit sent as an Arrow stream instead of JSON.
+
+The service runs in this process on a free port; the client keeps one
+connection open for all requests.  Every run first checks the client
+against the service (KMZ round trip, cache hit, Arrow = JSON, 400 on a bad
+take-off point and on non-finite waypoints or corners, worker metrics in
+``/metrics``) and exits with status 1
+when a check fails; ``--check`` runs only the checks.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import logging
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+for _folder in ("pose_estimation", "kmz_file_generation"):
+    sys.path.insert(0, str(ROOT / _folder))
+logging.disable(logging.INFO)
+
+from reader import read_kmz  # noqa: E402
+from service import MissionClient, MissionService, ServiceError  # noqa: E402
+from waypoints import WaypointArray  # noqa: E402
+
+_PROCESS = """
+import sys
+sys.path[:0] = {paths!r}
+import numpy as np
+from writer import WaypointArray, kmz_bytes
+n = {n}
+kmz_bytes(WaypointArray(12.181 + 1e-5 * np.arange(n), np.full(n, 49.099), np.full(n, 470.0), 40, 0, -30))
+"""
+
+
+def make_waypoints(n: int, seed: int) -> WaypointArray:
+    """*n* waypoints along a row; *seed* shifts them so every mission is new."""
+    return WaypointArray(longitude=12.181 + 1e-5 * np.arange(n), latitude=np.full(n, 49.099 + 1e-6 * seed),
+                         altitude=np.full(n, 470.0), height=40, heading=0, pitch=-30)
+
+
+def start_service(workers: int) -> tuple[int, MissionService]:
+    """Run a service on a background event loop; ``(port, service)``."""
+    loop = asyncio.new_event_loop()
+    service = MissionService(workers)
+    server = loop.run_until_complete(service.start("127.0.0.1", 0))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return server.sockets[0].getsockname()[1], service
+
+
+def check(client: MissionClient) -> list[str]:
+    """Round trips through *client*; the failed checks."""
+    failures = []
+    waypoints = make_waypoints(5, -2)
+    kmz = client.mission(waypoints, speed=7)
+    if client.last_headers.get("x-cache") != "miss":
+        failures.append("first request was not a cache miss")
+    mission = read_kmz(io.BytesIO(kmz))
+    if not (np.allclose(mission.waypoints.longitude, waypoints.longitude) and mission.speed == 7):
+        failures.append("KMZ does not hold the sent waypoints and speed")
+    if client.mission_arrow(waypoints, speed=7) != kmz or client.last_headers.get("x-cache") != "hit":
+        failures.append("Arrow request was not answered with the cached KMZ")
+    corners = np.full((1, 4, 3), [49.1, 12.2, 470.0])
+    corners[0, 2, 0] = np.nan
+    bad_latitude = make_waypoints(3, -3)
+    bad_latitude.latitude[1] = np.nan
+    for label, call in (("malformed takeoff_ref_point",
+                         lambda: client.mission(waypoints, takeoff_ref_point="49.1,12.2")),
+                        ("NaN waypoint latitude", lambda: client.mission(bad_latitude)),
+                        ("NaN waypoint latitude over Arrow", lambda: client.mission_arrow(bad_latitude)),
+                        ("NaN pallet corner", lambda: client.mission(corners=corners))):
+        try:
+            call()
+            failures.append(f"{label} was accepted")
+        except ServiceError as exc:
+            if exc.status != 400:
+                failures.append(f"{label} answered {exc.status}, not 400")
+    metrics = client.metrics()
+    for name in ("makeathon_waypoints_rendered_total", 'stage="stream_kmz"'):
+        if name not in metrics:
+            failures.append(f"{name} missing from /metrics")
+    return failures
+
+
+def run(sizes: list[int], repeats: int, workers: int, check_only: bool = False) -> bool:
+    """Check the service, then print the table unless *check_only*; ``False`` when a check failed."""
+    port, service = start_service(workers)
+    with MissionClient(port=port) as client:
+        failures = check(client)
+    for failure in failures:
+        print(f"FAIL  {failure}")
+    if failures or check_only:
+        print("checks passed" if not failures else f"{len(failures)} checks failed")
+        service.close()
+        return not failures
+
+    paths = [str(ROOT / "kmz_file_generation"), str(ROOT / "pose_estimation")]
+    print(f"{'waypoints':>9} | {'process ms':>10} | {'miss ms':>8} | {'hit ms':>7} | {'arrow ms':>8} | {'KMZ kB':>7}")
+    print("-" * 66)
+    with MissionClient(port=port) as client:
+        client.mission(make_waypoints(2, -1))                         # warm the pool
+        for n in sizes:
+            times = {"process": [], "miss": [], "hit": [], "arrow": []}
+            for seed in range(repeats):
+                waypoints = make_waypoints(n, seed)
+                t0 = time.perf_counter()
+                subprocess.run([sys.executable, "-c", _PROCESS.format(paths=paths, n=n)], check=True, cwd=ROOT)
+                times["process"].append(time.perf_counter() - t0)
+                for label, call in (("miss", client.mission), ("hit", client.mission),
+                                    ("arrow", client.mission_arrow)):
+                    t0 = time.perf_counter()
+                    data = call(waypoints)
+                    times[label].append(time.perf_counter() - t0)
+
+            def median_ms(key):
+                return statistics.median(times[key]) * 1e3
+
+            print(f"{n:>9} | {median_ms('process'):>10.1f} | {median_ms('miss'):>8.1f} | "
+                  f"{median_ms('hit'):>7.1f} | {median_ms('arrow'):>8.1f} | {len(data) / 1e3:>7.1f}")
+        print(f"cache: {client.health()['cache']}")
+    service.close()
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--waypoints", type=int, nargs="+", default=[10, 1_000, 10_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--check", action="store_true", help="only check the client against the service")
+    args = parser.parse_args()
+    if not run(args.waypoints, args.repeats, args.workers, args.check):
+        sys.exit(1)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Memory and throughput of WaypointArray vs. one object per waypoint.
+
+Run from the repository root:
+
+    python benchmarks/bench_waypoints.py              # N = 1M
+    python benchmarks/bench_waypoints.py --sizes 10000 1000000
+
+Three containers hold the same mission:
+
+* ``dataclass`` – list of the original ``@dataclass`` Waypoint (no slots);
+* ``slots``     – list of the current ``Waypoint(slots=True)``;
+* ``array``     – one :class:`WaypointArray` (seven float64 columns).
+
+Memory is the tracemalloc peak while building the container from NumPy
+columns (build times include the tracemalloc overhead); throughput is
+waypoints/sec through ``iter_kml`` + ``iter_wpml`` (the full text of both
+KMZ members, without compression).
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import logging
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "kmz_file_generation"))
+logging.disable(logging.INFO)
+
+from waypoints import FIELDS, Waypoint, WaypointArray  # noqa: E402
+from writer import iter_kml, iter_wpml  # noqa: E402
+
+
+@dataclass
+class LegacyWaypoint:
+    longitude: float
+    latitude: float
+    altitude: float
+    height: float = 10
+    heading: float = 0
+    pitch: float = -90
+    stop: float = 1
+
+
+def synthetic_columns(n: int, seed: int = 0) -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    return {
+        "longitude": 12.181 + rng.uniform(-0.01, 0.01, n),
+        "latitude": 49.099 + rng.uniform(-0.01, 0.01, n),
+        "altitude": rng.uniform(450, 500, n),
+        "height": rng.uniform(5, 40, n),
+        "heading": rng.uniform(-180, 180, n),
+        "pitch": rng.uniform(-90, 0, n),
+        "stop": np.ones(n),
+    }
+
+
+def _objects(cls, cols):
+    return [cls(*row) for row in zip(*(cols[f].tolist() for f in FIELDS))]
+
+
+BUILDERS = {
+    "dataclass": lambda cols: _objects(LegacyWaypoint, cols),
+    "slots": lambda cols: _objects(Waypoint, cols),
+    "array": lambda cols: WaypointArray.from_arrays({f: v.copy() for f, v in cols.items()}),
+}
+
+
+def _build_measured(build, cols):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    container = build(cols)
+    seconds = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return container, peak, seconds
+
+
+def _render_chars(waypoints) -> int:
+    return sum(map(len, iter_kml(waypoints))) + sum(map(len, iter_wpml(waypoints)))
+
+
+def run(sizes: list[int]) -> None:
+    print(f"{'N':>9} | {'container':<9} | {'build MiB':>9} | {'build s':>7} | {'render wp/s':>12} | {'speed-up':>8}")
+    print("-" * 70)
+    for n in sizes:
+        cols = synthetic_columns(n)
+        base = None
+        for name, build in BUILDERS.items():
+            container, peak, build_s = _build_measured(build, cols)
+            t0 = time.perf_counter()
+            _render_chars(container)
+            rate = n / (time.perf_counter() - t0)
+            base = base or rate
+            print(f"{n:>9} | {name:<9} | {peak / 2**20:>9.1f} | {build_s:>7.2f} | {rate:>12,.0f} | {rate / base:>7.1f}x")
+            del container
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000])
+    run(parser.parse_args().sizes)
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Synthetic flights with known ground truth, for offline benchmarks.
+
+    python benchmarks/synthetic_flight.py /tmp/flight --pallets 12 --images 200
+
+A flight is one row of pallets (the layout ``rank_pallet_points`` expects)
+photographed the way the README describes: the camera flies along the row
+``distance`` metres in front of and ``height`` metres above it (10 m and
+5 m by default), facing the row with the gimbal pitched so the row sits in
+the lower half of the photo.  The along-track stretch gives the
+triangulation its baseline; it is kept short enough that every pallet
+stays in view and that ``rank_pallet_points`` keeps the same (far) box
+corner in every image – off-centre rows make it switch to the near one.  The
+detections are the exact projections of the pallet footprints through the
+same camera model as :class:`triangulation.Triangulator` (with
+:func:`triangulation.camera_rotation`), with Gaussian pixel noise on every
+box edge and GPS noise on the reported camera position.  The folder written by :meth:`SyntheticFlight.write` holds:
+
+* ``photos/``               – tiny JPEGs carrying only the GPS EXIF tags;
+* ``boxes.csv``             – detections as ``detect.py`` writes them;
+* ``combined_with_gps.csv`` – the same rows with the reported camera GPS;
+* ``truth.csv``             – pallet footprints (centre, NW and SE corner).
+
+Nothing here touches the network or a GPU.
+"""
+from __future__ import annotations
+
+import argparse
+import struct
+import sys
+from dataclasses import dataclass
+from fractions import Fraction
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "pose_estimation"))
+
+from final_navigation.geodesy import enu_to_geodetic  # noqa: E402
+from ground_projection import CAPTURE_DISTANCE_M, CAPTURE_HEIGHT_M  # noqa: E402
+from triangulation import CameraIntrinsics, Triangulator, camera_rotation  # noqa: E402
+
+#: Row centre: 30 m north of the default take-off point, on the ground
+ROW_ORIGIN = np.array([49.099656, 12.181031, 445.5])
+#: Pallet footprint (east × north, m) and gap between neighbours (m)
+PALLET_W, PALLET_D, PALLET_GAP = 1.2, 0.8, 0.3
+#: Barcode labels per pallet and their side length (m)
+BARCODES_PER_PALLET, BARCODE_SIDE = 2, 0.15
+#: Where the row sits between the image centre (0) and the bottom edge (1)
+ROW_IN_LOWER_HALF = 0.7
+#: Lead (px) the far corner line needs over the near one in every photo
+LINE_MARGIN_PX = 20.0
+
+TRUTH_COLUMNS = ["pallet", "lat", "lon", "alt", "nw_lat", "nw_lon", "se_lat", "se_lon"]
+BOX_COLUMNS = ["image", "class", "x1", "x2", "y1", "y2"]
+
+
+@dataclass
+class SyntheticFlight:
+    """
+    One generated flight.
+
+    :param truth:   :data:`TRUTH_COLUMNS`, one row per pallet (west → east).
+    :param cameras: ``image, latitude, longitude, altitude`` as reported by
+                    the (noisy) GPS.
+    :param boxes:   Detections, columns :data:`BOX_COLUMNS`.
+    :param heading: Camera heading of every photo (deg).
+    :param pitch:   Gimbal pitch of every photo (deg).
+    """
+    truth: pd.DataFrame
+    cameras: pd.DataFrame
+    boxes: pd.DataFrame
+    heading: float
+    pitch: float
+
+    @property
+    def combined(self) -> pd.DataFrame:
+        """``combined_with_gps`` rows: boxes joined with the reported camera GPS."""
+        return self.boxes.merge(self.cameras, on="image", how="left", sort=False)
+
+    def write_photos(self, folder: str | Path) -> Path:
+        """One GPS-tagged JPEG per camera position in *folder*."""
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        body = _tiny_jpeg()
+        for image, lat, lon, alt in self.cameras.itertuples(index=False):
+            (folder / image).write_bytes(body[:2] + gps_app1(lat, lon, alt) + body[2:])
+        return folder
+
+    def write(self, folder: str | Path) -> Path:
+        """Photos and the CSV tables (see module docstring) in *folder*."""
+        folder = Path(folder)
+        self.write_photos(folder / "photos")
+        self.boxes.to_csv(folder / "boxes.csv", index=False)
+        self.combined.to_csv(folder / "combined_with_gps.csv", index=False)
+        self.truth.to_csv(folder / "truth.csv", index=False)
+        return folder
+
+
+def make_flight(n_pallets: int = 4,
+                n_images: int = 12,
+                distance: float = CAPTURE_DISTANCE_M,
+                height: float = CAPTURE_HEIGHT_M,
+                baseline: float = 8.0,
+                jitter: float = 1.0,
+                gps_noise_m: float = 0.05,
+                pixel_noise_px: float = 2.0,
+                origin: np.ndarray = ROW_ORIGIN,
+                intrinsics: CameraIntrinsics = CameraIntrinsics(),
+                seed: int = 0) -> SyntheticFlight:
+    """
+    Generate a flight over one east-west row of *n_pallets* pallets.
+
+    :param distance:     Camera track offset north of the row (m).
+    :param height:       Camera height above the pallets (m).
+    :param baseline:     Along-track length of the camera positions (m);
+                         shortened when the row would leave the view.
+    :param jitter:       Uniform cross-track jitter of the camera (± m).
+    :param gps_noise_m:  Std. dev. of the reported GPS position (m, per axis).
+    :param pixel_noise_px: Std. dev. of every box edge (px).
+    :param origin:       ``lat, lon, alt`` of the row centre.
+    """
+    rng = np.random.default_rng(seed)
+    spacing = PALLET_W + PALLET_GAP
+    east = (np.arange(n_pallets) - (n_pallets - 1) / 2) * spacing
+    centres = np.c_[east, np.zeros(n_pallets), np.zeros(n_pallets)]
+    half = np.array([PALLET_W / 2, PALLET_D / 2, 0.0])
+
+    # Footprint NW / SE corners and barcode squares along the south edge
+    corners = np.stack((centres + half * [-1, 1, 0], centres + half * [1, -1, 0]), axis=1)
+    offsets = (np.arange(BARCODES_PER_PALLET) + 0.5) / BARCODES_PER_PALLET - 0.5
+    bc_c = (centres[:, None, :] + np.c_[offsets * PALLET_W, np.full_like(offsets, 0.2 - PALLET_D / 2),
+                                        np.zeros_like(offsets)][None]).reshape(-1, 3)
+    bc_half = np.array([BARCODE_SIDE / 2, BARCODE_SIDE / 2, 0.0])
+    bc_corners = np.stack((bc_c + bc_half * [-1, 1, 0], bc_c + bc_half * [1, -1, 0]), axis=1)
+
+    # Facing south and pitched so that the row sits ROW_IN_LOWER_HALF of the
+    # way from the image centre to the bottom edge
+    below = np.arctan(ROW_IN_LOWER_HALF * intrinsics.sensor_height_mm / (2 * intrinsics.focal_length_mm))
+    heading, pitch = 180.0, float(-np.degrees(np.arctan2(height, distance) - below))
+    tri = Triangulator(intrinsics, camera_rotation(heading, pitch))
+
+    def project(cams, points):                                           # (N, 2, 3) → (I, N, 2, 2)
+        P = intrinsics.K @ tri.projections(cams)                         # (I, 3, 4)
+        hom = np.concatenate((points, np.ones(points.shape[:-1] + (1,))), axis=-1)
+        uvw = np.einsum("iab,nkb->inka", P, hom)
+        return uvw[..., :2] / uvw[..., 2:3]
+
+    fov_e = np.hypot(distance, height) * intrinsics.sensor_width_mm / intrinsics.focal_length_mm
+    along = min(baseline / 2, fov_e / 2 - (east[-1] + PALLET_W / 2) - 1.0)   # 1 m margin to the edge
+    if along < 0:
+        raise ValueError(f"A row of {n_pallets} pallets does not fit the {fov_e:.0f} m wide view "
+                         f"from {distance:g} m – raise the distance")
+
+    # rank_pallet_points keeps the box-corner line nearer the image centre;
+    # shorten the track until that is the far (SE) line from both ends, with
+    # LINE_MARGIN_PX to spare for the jitter and the pixel noise
+    centre = np.array([intrinsics.image_width_px, intrinsics.image_height_px]) / 2
+    for along in np.linspace(along, 0.0, 41):
+        ends = np.array([[-along, distance, height], [along, distance, height]])
+        dist = np.linalg.norm(project(ends, corners) - centre, axis=-1).mean(axis=1)   # (2 ends, 2 lines)
+        if (dist[:, 1] < dist[:, 0] - LINE_MARGIN_PX).all():
+            break
+
+    cams = np.c_[np.linspace(-along, along, n_images),
+                 distance + rng.uniform(-jitter, jitter, n_images),
+                 height + rng.uniform(-0.5, 0.5, n_images)]
+
+    images = np.array([f"DJI_SYNTH_{i:06d}_V.jpeg" for i in range(n_images)])
+    frames = []
+    for cls, pts in (("pallets", corners), ("barcode", bc_corners)):
+        uv = project(cams, pts)
+        uv = uv + rng.normal(0.0, pixel_noise_px, uv.shape)
+        lo, hi = uv.min(axis=2), uv.max(axis=2)                         # (I, N, 2)
+        n = pts.shape[0]
+        frames.append(pd.DataFrame({
+            "image": np.repeat(images, n),
+            "class": cls,
+            "x1": lo[..., 0].ravel(), "x2": hi[..., 0].ravel(),
+            "y1": lo[..., 1].ravel(), "y2": hi[..., 1].ravel(),
+        }))
+    boxes = pd.concat(frames, ignore_index=True)
+    boxes = boxes.iloc[np.lexsort((boxes["class"].to_numpy(), boxes["image"].to_numpy()))]
+
+    reported = enu_to_geodetic(cams + rng.normal(0.0, gps_noise_m, cams.shape), origin)
+    cameras = pd.DataFrame({"image": images, "latitude": reported[:, 0],
+                            "longitude": reported[:, 1], "altitude": reported[:, 2]})
+
+    geo = enu_to_geodetic(np.concatenate((centres, corners[:, 0], corners[:, 1])), origin)
+    c, nw, se = np.split(geo, 3)
+    truth = pd.DataFrame({"pallet": np.arange(n_pallets), "lat": c[:, 0], "lon": c[:, 1], "alt": c[:, 2],
+                          "nw_lat": nw[:, 0], "nw_lon": nw[:, 1], "se_lat": se[:, 0], "se_lon": se[:, 1]})
+    return SyntheticFlight(truth, cameras, boxes.reset_index(drop=True)[BOX_COLUMNS], heading, pitch)
+
+
+# ---------------------------------------------------------------------- #
+#  GPS-tagged JPEGs                                                       #
+# ---------------------------------------------------------------------- #
+def _rational(value: float, denominator: int = 10_000) -> bytes:
+    frac = Fraction(value).limit_denominator(denominator)
+    return struct.pack("<II", frac.numerator, frac.denominator)
+
+
+def _dms(deg: float) -> bytes:
+    deg = abs(deg)
+    d = int(deg)
+    m = int((deg - d) * 60)
+    s = (deg - d - m / 60) * 3600
+    return struct.pack("<IIII", d, 1, m, 1) + _rational(s, 1_000_000)
+
+
+def gps_app1(lat: float, lon: float, alt: float) -> bytes:
+    """APP1 segment: IFD0 with a GPS IFD pointer → latitude, longitude, altitude."""
+    entries = [  # (tag, type, count, payload); payloads > 4 bytes go after the IFD
+        (0x0001, 2, 2, b"S\x00" if lat < 0 else b"N\x00"),
+        (0x0002, 5, 3, _dms(lat)),
+        (0x0003, 2, 2, b"W\x00" if lon < 0 else b"E\x00"),
+        (0x0004, 5, 3, _dms(lon)),
+        (0x0005, 1, 1, b"\x01" if alt < 0 else b"\x00"),
+        (0x0006, 5, 1, _rational(abs(alt), 1000)),
+    ]
+    gps_off = 8 + 2 + 12 + 4
+    data_off = gps_off + 2 + 12 * len(entries) + 4
+    ifd, data = b"", b""
+    for tag, typ, count, payload in entries:
+        if len(payload) > 4:
+            ifd += struct.pack("<HHII", tag, typ, count, data_off + len(data))
+            data += payload
+        else:
+            ifd += struct.pack("<HHI4s", tag, typ, count, payload.ljust(4, b"\x00"))
+    ifd0 = struct.pack("<H", 1) + struct.pack("<HHII", 0x8825, 4, 1, gps_off) + struct.pack("<I", 0)
+    gps = struct.pack("<H", len(entries)) + ifd + struct.pack("<I", 0)
+    payload = b"Exif\x00\x00" + b"II*\x00" + struct.pack("<I", 8) + ifd0 + gps + data
+    return b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+
+
+def _tiny_jpeg() -> bytes:
+    """A 16×12 grey JPEG – the benchmarks only ever read the EXIF header."""
+    import cv2
+
+    return cv2.imencode(".jpg", np.full((12, 16, 3), 128, dtype=np.uint8))[1].tobytes()
+
+
+# ---------------------------------------------------------------------- #
+#  Scoring against the ground truth                                       #
+# ---------------------------------------------------------------------- #
+def score(found: pd.DataFrame, truth: pd.DataFrame, tolerance: float = 1.0) -> dict[str, float]:
+    """
+    Match located pallets to the ground truth.
+
+    Triangulation places a pallet on the NW or SE footprint corner
+    (whichever box corner ``rank_pallet_points`` keeps), ground projection
+    on the centre; every estimate is scored against the nearest of the three
+    reference points of each pallet.
+
+    :param found: Rows with ``lat, lon, alt`` (e.g. :func:`pallet_merge.merge_pallets`).
+    :returns: ``recall`` (share of pallets with an estimate within
+              *tolerance* m), ``median_err_m`` and ``max_err_m`` over those
+              matches, and ``spurious`` (estimates matching no pallet).
+    """
+    from scipy.spatial import cKDTree
+
+    from final_navigation.geodesy import geodetic_to_enu
+
+    origin = truth[["lat", "lon", "alt"]].to_numpy(dtype=float).mean(axis=0)
+    alt = truth["alt"].to_numpy(dtype=float)
+    refs = np.concatenate([np.c_[truth[a].to_numpy(dtype=float), truth[b].to_numpy(dtype=float), alt]
+                           for a, b in (("lat", "lon"), ("nw_lat", "nw_lon"), ("se_lat", "se_lon"))])
+    owner = np.tile(truth["pallet"].to_numpy(), 3)
+    est = found[["lat", "lon", "alt"]].dropna().to_numpy(dtype=float)
+    if not len(est):
+        return {"recall": 0.0, "median_err_m": float("nan"), "max_err_m": float("nan"), "spurious": 0}
+    dist, idx = cKDTree(geodetic_to_enu(refs, origin)).query(geodetic_to_enu(est, origin))
+    ok = dist <= tolerance
+    return {
+        "recall": len(np.unique(owner[idx[ok]])) / len(truth),
+        "median_err_m": float(np.median(dist[ok])) if ok.any() else float("nan"),
+        "max_err_m": float(dist[ok].max()) if ok.any() else float("nan"),
+        "spurious": int((~ok).sum()),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("folder", type=Path)
+    parser.add_argument("--pallets", type=int, default=4)
+    parser.add_argument("--images", type=int, default=12)
+    parser.add_argument("--distance", type=float, default=CAPTURE_DISTANCE_M)
+    parser.add_argument("--height", type=float, default=CAPTURE_HEIGHT_M)
+    parser.add_argument("--gps-noise", type=float, default=0.05)
+    parser.add_argument("--pixel-noise", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    flight = make_flight(args.pallets, args.images, args.distance, args.height, gps_noise_m=args.gps_noise,
+                         pixel_noise_px=args.pixel_noise, seed=args.seed)
+    out = flight.write(args.folder)
+    print(f"🎉  {args.images} photos, {len(flight.boxes)} boxes, {args.pallets} pallets: {out.resolve()}")
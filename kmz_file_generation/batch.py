@@ -0,0 +1,203 @@
+"""
+Nightly batch: many KMZ missions from one target table, in parallel.
+
+    python batch.py targets.csv --out-dir output/nightly --workers 8
+
+The target table (CSV or Parquet) holds one row per waypoint:
+
+    mission_id, latitude, longitude, altitude[, height, heading, pitch]
+               [, takeoff_lat, takeoff_lon, takeoff_alt]
+
+Rows are grouped by ``mission_id`` (row order is kept inside a mission).
+Every mission is built in its own worker process into
+``<out-dir>/<mission_id>.kmz`` with its own take-off reference point
+(first row of the ``takeoff_*`` columns, or ``--takeoff``).  A
+``manifest.json`` with per-mission outputs and timings is written last.
+Empty ids and ids that are not plain file names (``a/b``, ``..``) are
+rejected before anything is built.
+
+With ``--optimize-route`` every mission is reordered by :func:`route.plan_route`
+before it is written.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import AUTHOR, OUTPUT_DIR, TAKEOFF_REF_POINT, configure_logging
+from route import plan_route, wayline_stats
+from writer import WaypointArray, temp_sibling, build_kmz
+
+#: Waypoint attribute → target-table column
+WAYPOINT_COLUMNS = {
+    "longitude": "longitude",
+    "latitude": "latitude",
+    "altitude": "altitude",
+    "height": "height",
+    "heading": "heading",
+    "pitch": "pitch",
+}
+TAKEOFF_COLUMNS = ("takeoff_lat", "takeoff_lon", "takeoff_alt")
+MANIFEST_NAME = "manifest.json"
+
+
+def read_targets(path: str | Path) -> pd.DataFrame:
+    """
+    Load a target table from ``.parquet`` or CSV.
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def format_ref_point(lat: float, lon: float, alt: float) -> str:
+    """
+    ``lat,lon,ellipsoidHeight`` string as used by :data:`config.TAKEOFF_REF_POINT`.
+    """
+    return f"{lat:.6f},{lon:.6f},{alt:.6f}"
+
+
+def mission_output(out_dir: Path, mission_id) -> Path:
+    """
+    ``<out_dir>/<mission_id>.kmz``; :class:`ValueError` unless the id is a plain file name.
+    """
+    name = str(mission_id)
+    if name in ("", ".", "..") or any(sep in name for sep in ("/", "\\", os.sep)):
+        raise ValueError(f"mission_id {name!r} is not a valid file name")
+    return out_dir / f"{name}.kmz"
+
+
+def build_mission(mission_id: str,
+                  columns: dict[str, np.ndarray],
+                  output: Path,
+                  author: str,
+                  takeoff_ref_point: str,
+                  optimize_route: bool = False) -> dict:
+    """
+    Worker: build one KMZ and return its manifest entry.
+
+    :param columns: ``{Waypoint attribute: (N,) array}``.
+    :param optimize_route: Reorder the waypoints with :func:`route.plan_route`.
+    """
+    t0 = time.perf_counter()
+    waypoints = WaypointArray.from_arrays(columns)
+    n = len(waypoints)
+    if optimize_route:
+        route = plan_route(waypoints, takeoff_ref_point)
+        waypoints, distance, duration = route.waypoints, route.distance, route.duration
+    else:
+        distance, duration = wayline_stats(waypoints)
+    kmz_path = build_kmz(waypoints, output=output, author=author, takeoff_ref_point=takeoff_ref_point)
+    return {
+        "mission_id": mission_id,
+        "output": str(kmz_path),
+        "waypoints": n,
+        "distance_m": round(distance, 2),
+        "duration_s": round(duration, 2),
+        "bytes": kmz_path.stat().st_size,
+        "takeoff_ref_point": takeoff_ref_point,
+        "seconds": round(time.perf_counter() - t0, 4),
+    }
+
+
+def _mission_jobs(targets: pd.DataFrame, out_dir: Path, author: str, default_takeoff: str,
+                  optimize_route: bool):
+    """Yield the :func:`build_mission` arguments for every mission."""
+    present = {attr: col for attr, col in WAYPOINT_COLUMNS.items() if col in targets.columns}
+    has_takeoff = all(c in targets.columns for c in TAKEOFF_COLUMNS)
+    for mission_id, grp in targets.groupby("mission_id", sort=False, dropna=False):
+        columns = {attr: grp[col].to_numpy(dtype=float) for attr, col in present.items()}
+        takeoff = default_takeoff
+        if has_takeoff:
+            takeoff = format_ref_point(*grp[list(TAKEOFF_COLUMNS)].iloc[0].astype(float))
+        yield str(mission_id), columns, mission_output(out_dir, mission_id), author, takeoff, optimize_route
+
+
+def run_batch(targets: pd.DataFrame,
+              out_dir: str | Path,
+              workers: int | None = None,
+              author: str = AUTHOR,
+              takeoff_ref_point: str = TAKEOFF_REF_POINT,
+              optimize_route: bool = False) -> Path:
+    """
+    Build one KMZ per ``mission_id`` in a process pool and write the manifest.
+
+    :param targets:   Target table (see module docstring).
+    :param out_dir:   Folder for ``<mission_id>.kmz`` and ``manifest.json``.
+    :param workers:   Pool size (default: CPU count).
+    :param author:    Name inserted into <wpml:author>.
+    :param takeoff_ref_point: Fallback ``lat,lon,alt`` when the table has no
+                      ``takeoff_*`` columns.
+    :param optimize_route: Reorder every mission for the shortest flight.
+    :returns:         Path of the manifest.
+    """
+    missing = {"mission_id", "latitude", "longitude", "altitude"} - set(targets.columns)
+    if missing:
+        raise ValueError(f"Target table is missing columns: {sorted(missing)}")
+    unnamed = int(targets["mission_id"].isna().sum())
+    if unnamed:
+        raise ValueError(f"{unnamed} target rows have no mission_id")
+
+    out_dir = Path(out_dir)
+    for mission_id in targets["mission_id"].unique():
+        mission_output(out_dir, mission_id)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    t0 = time.perf_counter()
+    entries, failures = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(build_mission, *job): job[0]
+            for job in _mission_jobs(targets, out_dir, author, takeoff_ref_point, optimize_route)
+        }
+        for fut in as_completed(futures):
+            mission_id = futures[fut]
+            try:
+                entries.append(fut.result())
+                logging.info("Mission %s done", mission_id)
+            except Exception as exc:
+                logging.error("Mission %s failed: %s", mission_id, exc)
+                failures.append({"mission_id": mission_id, "error": repr(exc)})
+
+    entries.sort(key=lambda e: e["mission_id"])
+    manifest = {
+        "missions": entries,
+        "failures": failures,
+        "total_waypoints": sum(e["waypoints"] for e in entries),
+        "total_seconds": round(time.perf_counter() - t0, 4),
+        "workers": workers or os.cpu_count(),
+    }
+    manifest_path = out_dir / MANIFEST_NAME
+    tmp_path = temp_sibling(manifest_path)
+    tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp_path, manifest_path)
+    return manifest_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build one KMZ mission per mission_id.")
+    parser.add_argument("targets", help="CSV or Parquet target table")
+    parser.add_argument("--out-dir", default=str(OUTPUT_DIR / "batch"))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--author", default=AUTHOR)
+    parser.add_argument("--takeoff", default=TAKEOFF_REF_POINT,
+                        help="fallback lat,lon,alt take-off reference point")
+    parser.add_argument("--optimize-route", action="store_true",
+                        help="reorder waypoints for the shortest flight")
+    args = parser.parse_args()
+    configure_logging()
+
+    manifest_file = run_batch(read_targets(args.targets), args.out_dir, args.workers,
+                              args.author, args.takeoff, args.optimize_route)
+    summary = json.loads(manifest_file.read_text(encoding="utf-8"))
+    print(f"🎉  {len(summary['missions'])} missions, {summary['total_waypoints']} waypoints "
+          f"in {summary['total_seconds']}s – manifest: {manifest_file.resolve()}")
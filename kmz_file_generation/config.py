@@ -1,18 +1,11 @@
 from pathlib import Path
 import logging
 
-# Set logger config
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler()
-    ]
-)
+#: Format of every CLI's log lines
+LOG_FORMAT: str = "%(asctime)s - %(levelname)s - %(message)s"
 
 # General
 ROOT: Path = Path(__file__).parent
-logging.info(f"ROOT directory: {ROOT}")
 
 #: Folder or absolute file where the finished KMZ will be written
 OUTPUT_DIR: Path = Path("output")
@@ -23,8 +16,19 @@ AUTHOR: str = "Peter Schiekofer"
 
 # WGS-84 lon,lat,ellipsoid height of the launch site
 TAKEOFF_REF_POINT: str = "49.099386,12.181031,465.520000"
-logging.info(f"TAKEOFF_REF_POINT: {TAKEOFF_REF_POINT}")
 
 # Default arguments
 SPEED = 10
-logging.info(f"Default speed: {SPEED}")
\ No newline at end of file
+
+
+def configure_logging(level: int = logging.INFO) -> None:
+    """
+    Set up the root logger and log the active settings.
+
+    Called from the ``__main__`` blocks only: importing :mod:`config` (and
+    with it the writer) must not touch the logging setup of the importer.
+    """
+    logging.basicConfig(level=level, format=LOG_FORMAT, handlers=[logging.StreamHandler()])
+    logging.info(f"ROOT directory: {ROOT}")
+    logging.info(f"TAKEOFF_REF_POINT: {TAKEOFF_REF_POINT}")
+    logging.info(f"Default speed: {SPEED}")
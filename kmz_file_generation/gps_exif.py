@@ -0,0 +1,241 @@
+"""
+Header-only GPS extraction from JPEG EXIF – no PIL, no pixel decode.
+
+Only the APP1/Exif segment is read (a bounded read of at most 64 KiB); the
+TIFF structure inside is walked just far enough to reach the GPS IFD.  A
+small SQLite sidecar keyed by *path + mtime + size* makes sure every photo
+is parsed at most once across runs.
+
+This module only depends on the standard library so both the KMZ scripts
+and the pose-estimation pipeline can import it.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import struct
+import threading
+from pathlib import Path
+from typing import BinaryIO
+
+GpsFix = tuple[float, float, float]
+
+_SOI = b"\xff\xd8"
+_APP1 = 0xE1
+_SOS = 0xDA
+_EXIF_HEADER = b"Exif\x00\x00"
+
+_TAG_GPS_IFD = 0x8825
+_GPS_LAT_REF, _GPS_LAT = 0x0001, 0x0002
+_GPS_LON_REF, _GPS_LON = 0x0003, 0x0004
+_GPS_ALT_REF, _GPS_ALT = 0x0005, 0x0006
+_TAG_THUMB_OFFSET, _TAG_THUMB_LENGTH = 0x0201, 0x0202
+
+# TIFF field type → size in bytes of one component
+_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+
+def _read_app1(fh: BinaryIO) -> bytes:
+    """
+    Walk the JPEG marker chain and return the payload of the Exif APP1
+    segment (without the ``Exif\\0\\0`` header).
+    """
+    if fh.read(2) != _SOI:
+        raise ValueError("Not a JPEG file.")
+    while True:
+        marker = fh.read(4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            break
+        kind = marker[1]
+        if kind == _SOS:            # image data follows – no more headers
+            break
+        (length,) = struct.unpack(">H", marker[2:])
+        if kind == _APP1:
+            payload = fh.read(length - 2)
+            if payload.startswith(_EXIF_HEADER):
+                return payload[len(_EXIF_HEADER):]
+        else:
+            fh.seek(length - 2, os.SEEK_CUR)
+    raise ValueError("No EXIF metadata found.")
+
+
+def _parse_ifd(tiff: bytes, offset: int, endian: str) -> dict[int, tuple[int, int, bytes]]:
+    """
+    Parse one IFD into ``{tag: (type, count, raw value bytes)}``.
+    """
+    (n_entries,) = struct.unpack_from(endian + "H", tiff, offset)
+    entries = {}
+    for i in range(n_entries):
+        tag, typ, count, value = struct.unpack_from(endian + "HHI4s", tiff, offset + 2 + 12 * i)
+        size = _TYPE_SIZES.get(typ, 1) * count
+        if size > 4:
+            (ptr,) = struct.unpack(endian + "I", value)
+            value = tiff[ptr:ptr + size]
+        entries[tag] = (typ, count, value[:size])
+    return entries
+
+
+def _rationals(raw: bytes, count: int, endian: str) -> list[float]:
+    """Decode *count* unsigned RATIONALs."""
+    nums = struct.unpack(endian + "I" * (2 * count), raw[:8 * count])
+    return [n / d if d else 0.0 for n, d in zip(nums[::2], nums[1::2])]
+
+
+def _to_degrees(dms: list[float]) -> float:
+    d, m, s = dms
+    return d + m / 60.0 + s / 3600.0
+
+
+def parse_gps(tiff: bytes) -> GpsFix:
+    """
+    Decode ``(latitude, longitude, altitude)`` from a TIFF/EXIF blob.
+
+    :raises ValueError: if the GPS IFD is missing or incomplete.
+    """
+    try:
+        endian = {b"II": "<", b"MM": ">"}[tiff[:2]]
+        (ifd0,) = struct.unpack_from(endian + "I", tiff, 4)
+        root = _parse_ifd(tiff, ifd0, endian)
+        if _TAG_GPS_IFD not in root:
+            raise ValueError("No GPS data found in EXIF metadata.")
+        (gps_off,) = struct.unpack(endian + "I", root[_TAG_GPS_IFD][2])
+        gps = _parse_ifd(tiff, gps_off, endian)
+
+        latitude = _to_degrees(_rationals(gps[_GPS_LAT][2], 3, endian))
+        if gps[_GPS_LAT_REF][2][:1] == b"S":
+            latitude = -latitude
+
+        longitude = _to_degrees(_rationals(gps[_GPS_LON][2], 3, endian))
+        if gps[_GPS_LON_REF][2][:1] == b"W":
+            longitude = -longitude
+
+        altitude = 0.0
+        if _GPS_ALT in gps:
+            altitude = _rationals(gps[_GPS_ALT][2], 1, endian)[0]
+            if _GPS_ALT_REF in gps and gps[_GPS_ALT_REF][2][:1] == b"\x01":
+                altitude = -altitude          # below sea level
+    except (KeyError, struct.error) as e:
+        raise ValueError(f"Error processing GPS data: {e!r}")
+    return latitude, longitude, altitude
+
+
+def read_gps(image_path: str | Path) -> GpsFix:
+    """
+    Read ``(latitude, longitude, altitude)`` from a JPEG without decoding it.
+
+    :param image_path: Path to the JPEG image file.
+    :returns: tuple (latitude: float, longitude: float, altitude: float)
+    :raises ValueError: if the file carries no usable GPS block.
+    """
+    with open(image_path, "rb") as fh:
+        tiff = _read_app1(fh)
+    return parse_gps(tiff)
+
+
+def parse_thumbnail(tiff: bytes) -> bytes | None:
+    """
+    The embedded JPEG thumbnail (IFD1) of a TIFF/EXIF blob, or ``None``.
+    """
+    try:
+        endian = {b"II": "<", b"MM": ">"}[tiff[:2]]
+        (ifd0,) = struct.unpack_from(endian + "I", tiff, 4)
+        (n_entries,) = struct.unpack_from(endian + "H", tiff, ifd0)
+        (ifd1,) = struct.unpack_from(endian + "I", tiff, ifd0 + 2 + 12 * n_entries)
+        if not ifd1:
+            return None
+        entries = _parse_ifd(tiff, ifd1, endian)
+        (offset,) = struct.unpack(endian + "I", entries[_TAG_THUMB_OFFSET][2])
+        (length,) = struct.unpack(endian + "I", entries[_TAG_THUMB_LENGTH][2])
+    except (KeyError, struct.error):
+        return None
+    thumb = tiff[offset:offset + length]
+    return thumb if len(thumb) == length and thumb.startswith(_SOI) else None
+
+
+def read_thumbnail(image_path: str | Path) -> bytes | None:
+    """
+    The EXIF thumbnail JPEG of a photo (typically 160×120), without
+    decoding the photo itself; ``None`` if the camera did not embed one.
+    """
+    with open(image_path, "rb") as fh:
+        try:
+            tiff = _read_app1(fh)
+        except ValueError:
+            return None
+    return parse_thumbnail(tiff)
+
+
+class GpsCache:
+    """
+    Persistent ``path → GPS fix`` cache backed by a SQLite sidecar file.
+
+    An entry is only reused while the file's *mtime* and *size* are
+    unchanged.  Files without GPS are cached too, so they are not re-read on
+    every run.  One instance may be shared between threads.
+
+    :param db_path: SQLite file, created on first use.
+    """
+
+    def __init__(self, db_path: str | Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS gps ("
+            " path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER,"
+            " lat REAL, lon REAL, alt REAL)"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, image_path: str | Path) -> GpsFix:
+        """
+        Cached :func:`read_gps`.
+
+        :raises ValueError: if the file carries no usable GPS block.
+        """
+        key = str(Path(image_path).resolve())
+        st = os.stat(key)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT lat, lon, alt FROM gps WHERE path = ? AND mtime_ns = ? AND size = ?",
+                (key, st.st_mtime_ns, st.st_size),
+            ).fetchone()
+        if row is not None:
+            self.hits += 1
+            if row[0] is None:
+                raise ValueError("No GPS data found in EXIF metadata.")
+            return row
+
+        self.misses += 1
+        try:
+            fix = read_gps(key)
+        except ValueError:
+            self._store(key, st, (None, None, None))
+            raise
+        self._store(key, st, fix)
+        return fix
+
+    def _store(self, key: str, st: os.stat_result, fix: tuple) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO gps VALUES (?, ?, ?, ?, ?, ?)",
+                (key, st.st_mtime_ns, st.st_size, *fix),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        logging.debug("GPS cache %s: %d hits, %d misses", self.db_path, self.hits, self.misses)
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "GpsCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -4,10 +4,11 @@ and prints the resulting path – ready for Google Earth or DJI Pilot 2.
 """
 
 from writer import Waypoint, build_kmz
-from utils import *
-from config import OUTPUT_DIR, ROOT
+from utils import get_exif_location
+from config import ROOT, configure_logging
 
 if __name__ == "__main__":
+    configure_logging()
     # Three quick test points around Munich
     IMAGES_BASE = ["DJI_20250424192950_0001_V.jpeg", "DJI_20250424192951_0003_V.jpeg", "DJI_20250424192952_0004_V.jpeg"]
     IMAGES_PATHS = [f"{str(ROOT)}/dev_data/dev_data/{img}" for img in IMAGES_BASE]
@@ -0,0 +1,341 @@
+"""
+Streaming KMZ reader, plus diff / merge of two missions.
+
+    python reader.py output_kmz/train.kmz                       # summary
+    python reader.py old.kmz new.kmz                            # diff
+    python reader.py old.kmz new.kmz --merge merged.kmz         # merge
+
+``wpmz/template.kml`` and ``wpmz/waylines.wpml`` are parsed straight out of
+the archive with :func:`xml.etree.ElementTree.iterparse`: every
+``<Placemark>`` is read into columns and cleared as soon as it is complete,
+so memory holds the columns, not the XML tree.  Every other ``wpml:`` leaf
+the writer emits (author, takeOffRefPoint, autoFlightSpeed, distance, …)
+is collected into :attr:`Mission.config`.
+
+Missions are compared by waypoint *position*: both are converted to one
+local ENU frame and matched one-to-one with a KD-tree within a tolerance.
+"""
+from __future__ import annotations
+
+import argparse
+import zipfile
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO
+from xml.etree.ElementTree import iterparse
+
+import numpy as np
+
+from config import AUTHOR, SPEED, TAKEOFF_REF_POINT, configure_logging
+from route import waypoints_to_enu
+from waypoints import FIELDS, WaypointArray
+
+TEMPLATE_KML = "wpmz/template.kml"
+WAYLINES_WPML = "wpmz/waylines.wpml"
+
+#: Position tolerance (m) under which two waypoints are the same waypoint
+MATCH_TOLERANCE_M = 0.5
+#: Absolute tolerance for "attribute changed" (m for heights, deg for angles)
+ATTRIBUTE_TOLERANCE = 0.01
+
+#: Column → ElementPath inside a Placemark, per member (``kml:`` / ``wpml:``
+#: prefixes are bound to the document's namespaces)
+_KML_PATHS = {
+    "index": "wpml:index",
+    "height": "wpml:height",
+    "altitude": "wpml:ellipsoidHeight",
+    "heading": ".//wpml:aircraftHeading",
+    "pitch": ".//wpml:gimbalPitchRotateAngle",
+    "stop": "wpml:waypointTurnParam/wpml:waypointTurnMode",
+}
+_WPML_PATHS = {
+    "index": "wpml:index",
+    "altitude": "wpml:executeHeight",
+    "heading": "wpml:waypointHeadingParam/wpml:waypointHeadingAngle",
+    "stop": "wpml:waypointTurnParam/wpml:waypointTurnMode",
+}
+_COORDINATES = "kml:Point/kml:coordinates"
+
+
+def _value(name: str, text: str | None) -> float:
+    """Column value of a Placemark leaf; a missing turn mode (older files) is a stop."""
+    if name == "stop":
+        return 0.0 if text is not None and "Pass" in text else 1.0
+    return float(text) if text is not None else float("nan")
+
+
+def _parse_member(fh: BinaryIO, paths: dict[str, str],
+                  config_only: bool = False) -> tuple[dict[str, np.ndarray], dict[str, str]]:
+    """
+    Incrementally parse one KML/WPML document.
+
+    Only ``end`` events are handled; every finished Placemark is read into
+    the columns and cleared, so the tree never grows beyond one Placemark.
+    Leaves before the first and after the last Placemark become config
+    fields (first occurrence wins).
+
+    :param config_only: Stop at the first Placemark (config fields precede
+                        the waypoints).
+    :returns: ``({column: values}, {config field: text})``
+    """
+    columns = {name: array("d") for name in ("longitude", "latitude", *paths)}
+    config: dict[str, str] = {}
+    leaves = []                         # leaves since the last Placemark (or the start)
+    ns: dict[str, str] = {}
+
+    for _, elem in iterparse(fh, events=("end",)):
+        if not elem.tag.endswith("}Placemark"):
+            if len(elem) == 0:
+                leaves.append(elem)
+            continue
+
+        if not ns:                                  # first Placemark
+            ns = _namespaces(elem)
+            inside = set(elem.iter())
+            for leaf in leaves:
+                if leaf not in inside:
+                    _add_config(config, leaf)
+        leaves.clear()
+        if config_only:
+            break
+
+        lon, lat = elem.findtext(_COORDINATES, "nan,nan", ns).split(",")[:2]
+        columns["longitude"].append(float(lon))
+        columns["latitude"].append(float(lat))
+        for name, path in paths.items():
+            columns[name].append(_value(name, elem.findtext(path, None, ns)))
+        elem.clear()
+
+    for leaf in leaves:
+        _add_config(config, leaf)
+    return {col: np.frombuffer(values, dtype=np.float64) for col, values in columns.items()}, config
+
+
+def _namespaces(placemark) -> dict[str, str]:
+    """``kml`` / ``wpml`` namespace URIs as used by *placemark* (WPML versions differ)."""
+    uri = lambda tag: tag[1:].split("}", 1)[0] if tag.startswith("{") else ""
+    kml = uri(placemark.tag)
+    wpml = next((uri(e.tag) for e in placemark.iter() if uri(e.tag) != kml), kml)
+    return {"kml": kml, "wpml": wpml}
+
+
+def _add_config(config: dict[str, str], leaf) -> None:
+    text = (leaf.text or "").strip()
+    name = leaf.tag.rsplit("}", 1)[-1]
+    if text and name not in config:
+        config[name] = text
+
+
+@dataclass
+class Mission:
+    """
+    A mission read from a KMZ.
+
+    :param waypoints: Waypoints in ``wpml:index`` order.
+    :param config:    ``wpml:`` fields outside the Placemarks, by local tag
+                      name (``author``, ``takeOffRefPoint``, ``distance``, …).
+    """
+    waypoints: WaypointArray
+    config: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def author(self) -> str:
+        return self.config.get("author", AUTHOR)
+
+    @property
+    def takeoff_ref_point(self) -> str:
+        return self.config.get("takeOffRefPoint", TAKEOFF_REF_POINT)
+
+    @property
+    def speed(self) -> float:
+        return float(self.config.get("autoFlightSpeed", SPEED))
+
+
+def _sorted_by_index(columns: dict[str, np.ndarray]) -> WaypointArray:
+    order = np.argsort(columns["index"], kind="stable")
+    return WaypointArray.from_arrays({k: v[order] for k, v in columns.items() if k in FIELDS})
+
+
+def read_kmz(path: str | Path | BinaryIO) -> Mission:
+    """
+    Load a KMZ written by :func:`writer.build_kmz` (or DJI Pilot 2).
+
+    Waypoints come from ``template.kml`` (all seven fields); when the archive
+    has only ``waylines.wpml``, height and pitch get the defaults.  Config
+    fields of both members are merged, ``template.kml`` first; of
+    ``waylines.wpml`` only the part before the first Placemark is parsed.
+    """
+    with zipfile.ZipFile(path) as zf:
+        names = set(zf.namelist())
+        if TEMPLATE_KML not in names and WAYLINES_WPML not in names:
+            raise ValueError(f"{path}: neither {TEMPLATE_KML} nor {WAYLINES_WPML} in archive")
+        config: dict[str, str] = {}
+        waypoints = None
+        for member, paths in ((TEMPLATE_KML, _KML_PATHS), (WAYLINES_WPML, _WPML_PATHS)):
+            if member not in names:
+                continue
+            with zf.open(member) as fh:
+                columns, member_config = _parse_member(fh, paths, config_only=waypoints is not None)
+            for key, value in member_config.items():
+                config.setdefault(key, value)
+            if waypoints is None:
+                waypoints = _sorted_by_index(columns)
+    return Mission(waypoints, config)
+
+
+# --------------------------------------------------------------------------- #
+#  Diff & merge                                                               #
+# --------------------------------------------------------------------------- #
+def match_waypoints(enu_a: np.ndarray, enu_b: np.ndarray,
+                    tolerance: float = MATCH_TOLERANCE_M, k: int = 4) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    One-to-one matching of two ENU point sets within *tolerance* metres.
+
+    Candidate pairs are the *k* nearest neighbours from a KD-tree; pairs that
+    are each other's best remaining candidate are accepted in rounds, so
+    duplicated positions are matched pairwise.
+
+    :returns: ``(index_a, index_b, distance)`` of the matched pairs.
+    """
+    from scipy.spatial import cKDTree
+
+    empty = np.empty(0, dtype=np.int64)
+    if not len(enu_a) or not len(enu_b):
+        return empty, empty, np.empty(0)
+    k = min(k, len(enu_b))
+    dist, ib = cKDTree(enu_b).query(enu_a, k=k, distance_upper_bound=tolerance)
+    dist, ib = dist.reshape(len(enu_a), k), ib.reshape(len(enu_a), k)
+    ia = np.repeat(np.arange(len(enu_a)), k)
+    dist, ib = dist.ravel(), ib.ravel()
+    ok = np.isfinite(dist)
+    ia, ib, dist = ia[ok], ib[ok], dist[ok]
+
+    order = np.argsort(dist, kind="stable")
+    ia, ib, dist = ia[order], ib[order], dist[order]
+    done_a = np.zeros(len(enu_a), dtype=bool)
+    done_b = np.zeros(len(enu_b), dtype=bool)
+    out_a, out_b, out_d = [empty], [empty], [np.empty(0)]
+    while len(ia):
+        # best remaining pair of every a and of every b (pairs are sorted by distance)
+        _, first_a = np.unique(ia, return_index=True)
+        _, first_b = np.unique(ib, return_index=True)
+        take = np.intersect1d(first_a, first_b)
+        out_a.append(ia[take]), out_b.append(ib[take]), out_d.append(dist[take])
+        done_a[ia[take]] = True
+        done_b[ib[take]] = True
+        keep = ~(done_a[ia] | done_b[ib])
+        ia, ib, dist = ia[keep], ib[keep], dist[keep]
+    return np.concatenate(out_a), np.concatenate(out_b), np.concatenate(out_d)
+
+
+@dataclass
+class MissionDiff:
+    """
+    Waypoint-level difference of mission *a* → mission *b*.
+
+    :param matched_a: Indices into *a* of waypoints present in both.
+    :param matched_b: Their counterparts in *b*.
+    :param offset_m:  Position offset of every matched pair (m).
+    :param changed:   Mask over the matched pairs whose altitude, height,
+                      heading, pitch or stop differ.
+    :param removed:   Indices into *a* with no counterpart in *b*.
+    :param added:     Indices into *b* with no counterpart in *a*.
+    """
+    matched_a: np.ndarray
+    matched_b: np.ndarray
+    offset_m: np.ndarray
+    changed: np.ndarray
+    removed: np.ndarray
+    added: np.ndarray
+
+    def summary(self) -> str:
+        return (f"{len(self.matched_a)} matched ({int(self.changed.sum())} changed), "
+                f"{len(self.removed)} removed, {len(self.added)} added")
+
+
+def diff_missions(a: Mission | WaypointArray, b: Mission | WaypointArray,
+                  tolerance: float = MATCH_TOLERANCE_M,
+                  atol: float = ATTRIBUTE_TOLERANCE) -> MissionDiff:
+    """
+    Match the waypoints of *a* and *b* by position and classify them.
+
+    :param tolerance: Match radius (m) in a common ENU frame.
+    :param atol:      Tolerance for the attribute comparison.
+    """
+    wa = a.waypoints if isinstance(a, Mission) else a
+    wb = b.waypoints if isinstance(b, Mission) else b
+    both = np.concatenate((np.column_stack((wa.latitude, wa.longitude, wa.altitude)),
+                           np.column_stack((wb.latitude, wb.longitude, wb.altitude))))
+    origin = both.mean(axis=0) if len(both) else np.zeros(3)
+    ia, ib, offset = match_waypoints(waypoints_to_enu(wa, origin), waypoints_to_enu(wb, origin), tolerance)
+
+    changed = np.zeros(len(ia), dtype=bool)
+    for name in ("altitude", "height", "heading", "pitch", "stop"):
+        changed |= ~np.isclose(getattr(wa, name)[ia], getattr(wb, name)[ib], atol=atol, rtol=0)
+    return MissionDiff(
+        matched_a=ia,
+        matched_b=ib,
+        offset_m=offset,
+        changed=changed,
+        removed=np.setdiff1d(np.arange(len(wa)), ia),
+        added=np.setdiff1d(np.arange(len(wb)), ib),
+    )
+
+
+def merge_missions(base: Mission, update: Mission,
+                   tolerance: float = MATCH_TOLERANCE_M,
+                   drop_removed: bool = False) -> Mission:
+    """
+    Apply *update* to *base* in place of a full rebuild.
+
+    Matched waypoints keep their position in *base*'s order and take
+    *update*'s values; waypoints new in *update* are appended (re-order
+    with :func:`route.plan_route` if needed).  Config fields of *update*
+    override those of *base*.
+
+    :param drop_removed: Also drop *base* waypoints missing from *update*.
+    """
+    diff = diff_missions(base, update, tolerance)
+    cols = {name: col.copy() for name, col in base.waypoints.columns().items()}
+    for name, col in update.waypoints.columns().items():
+        cols[name][diff.matched_a] = col[diff.matched_b]
+
+    keep = np.ones(len(base.waypoints), dtype=bool)
+    if drop_removed:
+        keep[diff.removed] = False
+    added = update.waypoints.take(diff.added).columns()
+    merged = WaypointArray.from_arrays(
+        {name: np.concatenate((cols[name][keep], added[name])) for name in FIELDS}
+    )
+    return Mission(merged, {**base.config, **update.config})
+
+
+def write_mission(mission: Mission, output: str | Path) -> Path:
+    """Write *mission* back to a KMZ with its own author, take-off point and speed."""
+    from writer import build_kmz
+
+    return build_kmz(mission.waypoints, output, author=mission.author,
+                     takeoff_ref_point=mission.takeoff_ref_point, speed=mission.speed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect, diff or merge KMZ missions.")
+    parser.add_argument("kmz")
+    parser.add_argument("other", nargs="?", help="second mission to diff / merge")
+    parser.add_argument("--tolerance", type=float, default=MATCH_TOLERANCE_M)
+    parser.add_argument("--merge", metavar="OUT", help="write base + other merged to OUT")
+    parser.add_argument("--drop-removed", action="store_true")
+    args = parser.parse_args()
+    configure_logging()
+
+    first = read_kmz(args.kmz)
+    print(f"{args.kmz}: {len(first.waypoints)} waypoints, take-off {first.takeoff_ref_point}")
+    if args.other:
+        second = read_kmz(args.other)
+        print(f"{args.other}: {len(second.waypoints)} waypoints")
+        print(diff_missions(first, second, args.tolerance).summary())
+        if args.merge:
+            merged = merge_missions(first, second, args.tolerance, args.drop_removed)
+            out = write_mission(merged, args.merge)
+            print(f"🎉  Merged mission ({len(merged.waypoints)} waypoints): {out.resolve()}")
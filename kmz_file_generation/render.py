@@ -0,0 +1,173 @@
+"""
+Pre-compiled Placemark renderer.
+
+The ``${PLACEHOLDER}`` Placemark blocks from templates.py are split once at
+import into static fragments and slot names, and turned into a single
+``%``-format string.  Rendering then works on *columns*: a chunk of
+waypoints is converted in bulk and every row is produced with one ``%``
+operation – the fixed-precision float formatting happens inside that
+C-level call.  No :class:`string.Template` and no regex per waypoint.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from itertools import islice
+from string import Template
+from typing import Iterable, Iterator, Mapping, Sequence
+
+import numpy as np
+
+import templates as T
+from config import SPEED
+from waypoints import WaypointArray
+
+#: Fixed output precision per placeholder (8 decimals ≈ 1 mm in lon/lat);
+#: any other placeholder is rendered with ``%s``.
+FLOAT_FORMATS: dict[str, str] = {
+    "LONGITUDE": "%.8f",
+    "LATITUDE": "%.8f",
+    "ALTITUDE": "%.3f",
+    "HEIGHT": "%.3f",
+    "HEADING": "%.2f",
+    "PITCH": "%.2f",
+}
+
+#: Placeholder → Waypoint attribute
+WAYPOINT_FIELDS: dict[str, str] = {
+    "LONGITUDE": "longitude",
+    "LATITUDE": "latitude",
+    "ALTITUDE": "altitude",
+    "HEIGHT": "height",
+    "HEADING": "heading",
+    "PITCH": "pitch",
+}
+
+#: Placeholders filled with the zero-based waypoint index
+INDEX_SLOTS = ("INDEX", "ACTION_GROUP_ID")
+
+#: ``stop`` → ``<wpml:waypointTurnMode>``: stop at capture stops, fly
+#: through every other waypoint
+TURN_MODES: dict[bool, str] = {
+    True: "toPointAndStopWithDiscontinuityCurvature",
+    False: "toPointAndPassWithContinuityCurvature",
+}
+
+DEFAULT_CHUNK_SIZE = 4096
+
+
+def _as_list(values: Sequence) -> Sequence:
+    """NumPy columns → Python lists (``tolist`` is one bulk C conversion)."""
+    return values.tolist() if isinstance(values, np.ndarray) else values
+
+
+def turn_modes(stop: Sequence) -> np.ndarray:
+    """``TURN_MODE`` column of a ``stop`` column (see :data:`TURN_MODES`)."""
+    return np.where(np.asarray(stop, dtype=float) != 0, TURN_MODES[True], TURN_MODES[False])
+
+
+class CompiledBlock:
+    """
+    A ``${NAME}`` template compiled into static fragments and slots.
+
+    :param block: Raw XML with ``${PLACEHOLDER}`` markers.
+    """
+
+    def __init__(self, block: str):
+        self.fragments: list[str] = []
+        self.slots: list[str] = []
+        pos = 0
+        for match in Template.pattern.finditer(block):
+            name = match.group("braced") or match.group("named")
+            if name is None:            # "$$" escape or stray "$"
+                continue
+            self.fragments.append(block[pos:match.start()])
+            self.slots.append(name)
+            pos = match.end()
+        self.fragments.append(block[pos:])
+        specs = [FLOAT_FORMATS.get(name, "%s") for name in self.slots] + [""]
+        self._fmt = "".join(f.replace("%", "%%") + spec for f, spec in zip(self.fragments, specs))
+
+    def render_rows(self, columns: Mapping[str, Sequence]) -> list[str]:
+        """
+        Render one block per row.
+
+        :param columns: ``{placeholder: values}`` for every slot; float slots
+                        use the precision from :data:`FLOAT_FORMATS`.
+        :returns:       One rendered string per row.
+        """
+        cols = [_as_list(columns[name]) for name in self.slots]
+        fmt = self._fmt
+        return [fmt % row for row in zip(*cols)]
+
+
+@lru_cache(maxsize=8)
+def wpml_placemark(speed: float = SPEED) -> CompiledBlock:
+    """WPML Placemark block compiled with ``<wpml:waypointSpeed>`` = *speed* (m/s)."""
+    return CompiledBlock(Template(T.WPML_WAYPOINT_BLOCK).safe_substitute(WAYPOINT_SPEED=f"{speed:g}"))
+
+
+KML_PLACEMARK = CompiledBlock(T.WAYPOINT_BLOCK)
+WPML_PLACEMARK = wpml_placemark(SPEED)
+
+
+def _columns_from_arrays(arrays: Mapping[str, np.ndarray], start: int, stop: int) -> dict[str, Sequence]:
+    cols: dict[str, Sequence] = {name: arr[start:stop] for name, arr in arrays.items()}
+    index = range(start, stop)
+    for name in INDEX_SLOTS:
+        cols[name] = index
+    return cols
+
+
+def iter_placemarks_from_arrays(block: CompiledBlock,
+                                arrays: Mapping[str, np.ndarray],
+                                chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Render Placemarks from columnar data, one ``"\\n"``-joined string per chunk.
+
+    :param block:  :data:`KML_PLACEMARK` or :data:`WPML_PLACEMARK`.
+    :param arrays: ``{placeholder: (N,) array}`` for the coordinate and
+                   attitude slots (see :data:`WAYPOINT_FIELDS`) and
+                   ``TURN_MODE`` (see :func:`turn_modes`).
+    :param chunk_size: Rows rendered per chunk.
+    """
+    n = len(next(iter(arrays.values()))) if arrays else 0
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        yield "\n".join(block.render_rows(_columns_from_arrays(arrays, start, stop)))
+
+
+def iter_placemarks(block: CompiledBlock,
+                    waypoints: Iterable,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Render Placemarks from :class:`writer.Waypoint` objects or a
+    :class:`waypoints.WaypointArray`.
+
+    A :class:`~waypoints.WaypointArray` is rendered straight from its
+    columns.  Other iterables are consumed lazily, *chunk_size* objects at a
+    time; each chunk is transposed into columns and rendered in bulk.
+    """
+    if isinstance(waypoints, WaypointArray):
+        arrays = {name: getattr(waypoints, attr) for name, attr in WAYPOINT_FIELDS.items()
+                  if name in block.slots}
+        if "TURN_MODE" in block.slots:
+            arrays["TURN_MODE"] = turn_modes(waypoints.stop)
+        yield from iter_placemarks_from_arrays(block, arrays, chunk_size)
+        return
+    it = iter(waypoints)
+    start = 0
+    fields = [(name, attr) for name, attr in WAYPOINT_FIELDS.items() if name in block.slots]
+    while True:
+        batch = list(islice(it, chunk_size))
+        if not batch:
+            return
+        cols: dict[str, Sequence] = {
+            name: [getattr(wpt, attr) for wpt in batch] for name, attr in fields
+        }
+        if "TURN_MODE" in block.slots:
+            cols["TURN_MODE"] = turn_modes([getattr(wpt, "stop", 1) for wpt in batch])
+        index = range(start, start + len(batch))
+        for name in INDEX_SLOTS:
+            cols[name] = index
+        yield "\n".join(block.render_rows(cols))
+        start += len(batch)
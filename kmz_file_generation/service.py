@@ -0,0 +1,488 @@
+"""
+Local mission-generation service: KMZ bytes over HTTP.
+
+    python service.py --port 8765 --workers 4
+
+    curl -X POST localhost:8765/mission -H 'Content-Type: application/json' \\
+         -d '{"waypoints": {"latitude": [49.0995], "longitude": [12.1812], "altitude": [470]}}' \\
+         -o mission.kmz
+
+A long-running asyncio server around :func:`writer.kmz_bytes` and
+:func:`final_navigation.compute_target_coordinates`: a mission costs one
+HTTP round trip instead of an interpreter start-up and a config.py edit.
+
+``POST /mission`` takes a JSON or Arrow body and answers with the KMZ:
+
+* JSON – ``{"waypoints": …}`` as columns (``{"latitude": [...], …}``) or
+  records (``[{"latitude": …}, …]``) with the :class:`waypoints.WaypointArray`
+  field names, or ``{"corners": [[[lat, lon, alt] × 4], …]}`` pallet corners
+  that become hover targets.  Optional parameters: ``author``,
+  ``takeoff_ref_point``, ``speed``; for corners also ``back``, ``up``,
+  ``height``, ``heading``, ``pitch``.
+* Arrow – ``Content-Type: application/vnd.apache.arrow.stream``, an IPC
+  stream of a waypoint table; parameters go into the query string (which
+  JSON requests may use as well).
+
+``GET /health`` reports the cache, ``GET /metrics`` is the Prometheus text
+of :mod:`final_navigation.metrics`.
+
+Rendering runs in a process pool; every render returns the worker's
+counters and stage timers with the KMZ, which are merged into this
+process's registry, so ``/metrics`` covers the writer as well.  Rendered
+missions are kept in an LRU keyed by the SHA-256 of the input arrays and
+the parameters: identical requests are answered from memory (``X-Cache:
+hit``, or ``304`` for a matching ``If-None-Match``) and concurrent
+identical requests share one render.  Connections are HTTP/1.1
+keep-alive; :class:`MissionClient` keeps one open.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import http.client
+import io
+import json
+import logging
+import sys
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from config import AUTHOR, KMZ_NAME, SPEED, TAKEOFF_REF_POINT, configure_logging
+from route import parse_ref_point, valid_geodetic
+from waypoints import FIELDS, WaypointArray
+from writer import kmz_bytes
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "pose_estimation"))
+from final_navigation import compute_target_coordinates  # noqa: E402
+from final_navigation.geometry import BACK_DISTANCE_METRES, UP_DISTANCE_METRES  # noqa: E402
+from final_navigation.metrics import METRICS, inc  # noqa: E402
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+KMZ_TYPE = "application/vnd.google-earth.kmz"
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+
+#: Size bound of the rendered-mission LRU
+CACHE_BYTES = 256 * 2**20
+#: Largest accepted request body
+MAX_BODY_BYTES = 64 * 2**20
+#: Idle time (s) before a keep-alive connection is closed
+KEEP_ALIVE_S = 30.0
+
+#: Request parameters → type and default
+PARAMS: dict[str, tuple[type, object]] = {
+    "author": (str, AUTHOR),
+    "takeoff_ref_point": (str, TAKEOFF_REF_POINT),
+    "speed": (float, float(SPEED)),
+    "back": (float, BACK_DISTANCE_METRES),
+    "up": (float, UP_DISTANCE_METRES),
+    "height": (float, 10.0),
+    "heading": (float, 0.0),
+    "pitch": (float, -90.0),
+}
+#: Parameters that affect a mission, per input kind
+KIND_PARAMS = {
+    "waypoints": ("author", "takeoff_ref_point", "speed"),
+    "corners": ("author", "takeoff_ref_point", "speed", "back", "up", "height", "heading", "pitch"),
+}
+
+REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ServiceError(RuntimeError):
+    """Non-200 answer of the service; :attr:`status` is the HTTP status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+# ---------------------------------------------------------------------- #
+#  Requests → arrays                                                      #
+# ---------------------------------------------------------------------- #
+def parse_params(kind: str, *sources: dict) -> dict:
+    """
+    Typed parameters of *kind* from *sources* (later ones win), defaults filled in.
+
+    :raises ValueError: on a value of the wrong type, a non-finite number
+                        or a malformed ``takeoff_ref_point``.
+    """
+    merged = {}
+    for source in sources:
+        merged.update({k: v for k, v in source.items() if k in PARAMS})
+    params = {name: PARAMS[name][0](merged.get(name, PARAMS[name][1])) for name in KIND_PARAMS[kind]}
+    bad = [name for name, value in params.items() if isinstance(value, float) and not np.isfinite(value)]
+    if bad:
+        raise ValueError(f"Parameters must be finite: {', '.join(bad)}")
+    parse_ref_point(params["takeoff_ref_point"])
+    return params
+
+
+def check_waypoints(columns: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """
+    *columns* of a :class:`WaypointArray` if every waypoint is flyable.
+
+    :raises ValueError: on a non-finite value or a latitude / longitude out
+                        of range.
+    """
+    geo = np.column_stack([columns[name] for name in ("latitude", "longitude", "altitude")])
+    bad = ~valid_geodetic(geo)
+    for values in columns.values():
+        bad |= ~np.isfinite(values)
+    if bad.any():
+        raise ValueError(f"{int(bad.sum())} waypoints have a missing, non-finite or out-of-range value "
+                         f"(first: #{int(np.argmax(bad))})")
+    return columns
+
+
+def parse_mission(content_type: str, body: bytes, query: dict) -> tuple[str, dict[str, np.ndarray], dict]:
+    """
+    ``(kind, arrays, params)`` of a ``POST /mission`` body.
+
+    :raises ValueError: on malformed input.
+    """
+    if content_type.split(";")[0].strip() == ARROW_TYPE:
+        import pyarrow as pa
+
+        frame = pa.ipc.open_stream(body).read_pandas()
+        return "waypoints", check_waypoints(WaypointArray.from_frame(frame).columns()), \
+            parse_params("waypoints", query)
+
+    doc = json.loads(body)
+    if not isinstance(doc, dict):
+        raise ValueError("Expected a JSON object")
+    if "corners" in doc:
+        corners = np.asarray(doc["corners"], dtype=float)
+        if corners.ndim != 3 or corners.shape[1:] != (4, 3):
+            raise ValueError(f"corners must be (M, 4, 3) [lat, lon, alt], got shape {corners.shape}")
+        bad = ~valid_geodetic(corners).all(axis=1)
+        if bad.any():
+            raise ValueError(f"{int(bad.sum())} pallets have a missing, non-finite or out-of-range corner "
+                             f"(first: #{int(np.argmax(bad))})")
+        return "corners", {"corners": corners}, parse_params("corners", query, doc)
+    if "waypoints" in doc:
+        frame = pd.DataFrame(doc["waypoints"])
+        return "waypoints", check_waypoints(WaypointArray.from_frame(frame).columns()), \
+            parse_params("waypoints", query, doc)
+    raise ValueError("Body needs a 'waypoints' or 'corners' field")
+
+
+def cache_key(kind: str, arrays: dict[str, np.ndarray], params: dict) -> str:
+    """SHA-256 of the input arrays (values and shapes) and the parameters."""
+    h = hashlib.sha256(kind.encode())
+    for name in sorted(arrays):
+        values = np.ascontiguousarray(arrays[name], dtype=np.float64)
+        h.update(f"{name}{values.shape}".encode())
+        h.update(values.tobytes())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def render_mission(kind: str, arrays: dict[str, np.ndarray], params: dict) -> bytes:
+    """Worker: KMZ bytes of one request."""
+    if kind == "corners":
+        targets = compute_target_coordinates(arrays["corners"], params["back"], params["up"])
+        waypoints = WaypointArray(longitude=targets[:, 1], latitude=targets[:, 0], altitude=targets[:, 2],
+                                  height=params["height"], heading=params["heading"], pitch=params["pitch"])
+    else:
+        waypoints = WaypointArray.from_arrays(arrays)
+    return kmz_bytes(waypoints, params["author"], params["takeoff_ref_point"], params["speed"])
+
+
+def render_in_worker(kind: str, arrays: dict[str, np.ndarray], params: dict) -> tuple[bytes, dict]:
+    """Pool worker: :func:`render_mission` plus the metrics it recorded (see :meth:`Metrics.drain`)."""
+    METRICS.drain()                                     # anything left from pool start-up
+    data = render_mission(kind, arrays, params)
+    return data, METRICS.drain()
+
+
+# ---------------------------------------------------------------------- #
+#  Server                                                                 #
+# ---------------------------------------------------------------------- #
+class MissionCache:
+    """
+    In-memory LRU of rendered missions, bounded by total size.
+
+    :param max_bytes: Size bound; the least recently used entries go first.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> bytes | None:
+        data = self._entries.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        self.size += len(data) - (len(old) if old is not None else 0)
+        self._entries[key] = data
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def stats(self) -> dict:
+        return {"entries": len(self), "bytes": self.size, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
+
+
+class MissionService:
+    """
+    The HTTP service; :meth:`start` binds it to a port.
+
+    :param workers:   Render processes (default: CPU count).
+    :param cache_bytes: Size bound of the :class:`MissionCache`.
+    :param pool:      Executor to render in instead of a new process pool.
+    """
+
+    def __init__(self, workers: int | None = None, cache_bytes: int = CACHE_BYTES, pool: Executor | None = None):
+        self.pool = pool if pool is not None else ProcessPoolExecutor(max_workers=workers)
+        #: Workers keep their own metrics only in separate processes
+        self.merge_metrics = isinstance(self.pool, ProcessPoolExecutor)
+        self.cache = MissionCache(cache_bytes)
+        self._pending: dict[str, asyncio.Future] = {}
+
+    async def render(self, kind: str, arrays: dict[str, np.ndarray], params: dict) -> tuple[str, bytes, bool]:
+        """``(key, KMZ bytes, cache hit)``; identical concurrent renders are shared."""
+        key = cache_key(kind, arrays, params)
+        data = self.cache.get(key)
+        if data is not None:
+            inc("service_cache_hits")
+            return key, data, True
+        inc("service_cache_misses")
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if self.merge_metrics:
+                future = asyncio.ensure_future(self._render_in_pool(loop, kind, arrays, params))
+            else:
+                future = loop.run_in_executor(self.pool, render_mission, kind, arrays, params)
+            self._pending[key] = future
+            future.add_done_callback(lambda f: self._finish(key, f))
+        return key, await asyncio.shield(future), False
+
+    async def _render_in_pool(self, loop: asyncio.AbstractEventLoop, kind: str,
+                              arrays: dict[str, np.ndarray], params: dict) -> bytes:
+        data, metrics = await loop.run_in_executor(self.pool, render_in_worker, kind, arrays, params)
+        METRICS.merge(metrics)
+        return data
+
+    def _finish(self, key: str, future: asyncio.Future) -> None:
+        self._pending.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            self.cache.put(key, future.result())
+
+    async def dispatch(self, method: str, target: str, headers: dict[str, str],
+                       body: bytes) -> tuple[int, dict[str, str], bytes]:
+        """``(status, headers, body)`` of one request."""
+        url = urlsplit(target)
+        query = dict(parse_qsl(url.query))
+        if url.path == "/health":
+            if method != "GET":
+                return _error(405, "use GET")
+            return 200, {"Content-Type": "application/json"}, json.dumps(
+                {"status": "ok", "cache": self.cache.stats(), "rendering": len(self._pending)}).encode()
+        if url.path == "/metrics":
+            if method != "GET":
+                return _error(405, "use GET")
+            return 200, {"Content-Type": "text/plain; version=0.0.4"}, METRICS.to_prometheus().encode()
+        if url.path != "/mission":
+            return _error(404, f"no route {url.path}")
+        if method != "POST":
+            return _error(405, "use POST")
+
+        try:
+            kind, arrays, params = parse_mission(headers.get("content-type", ""), body, query)
+            key, data, hit = await self.render(kind, arrays, params)
+        except (ValueError, KeyError, TypeError) as exc:
+            return _error(400, str(exc))
+        except Exception as exc:
+            logging.exception("Render failed")
+            return _error(500, repr(exc))
+        etag = f'"{key[:32]}"'
+        if headers.get("if-none-match") == etag:
+            return 304, {"ETag": etag}, b""
+        return 200, {"Content-Type": KMZ_TYPE, "ETag": etag, "X-Cache": "hit" if hit else "miss",
+                     "Content-Disposition": f'attachment; filename="{KMZ_NAME}"'}, data
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve requests on one connection until it closes or idles out."""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_S)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError,
+                        ConnectionError):
+                    return
+                request_line, *lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ", 2)
+                    headers = {k.strip().lower(): v.strip() for k, v in (line.split(":", 1) for line in lines if line)}
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    await _respond(writer, *_error(400, "malformed request"), keep_alive=False)
+                    return
+                if "chunked" in headers.get("transfer-encoding", ""):
+                    await _respond(writer, *_error(411, "send a Content-Length"), keep_alive=False)
+                    return
+                if length > MAX_BODY_BYTES:
+                    await _respond(writer, *_error(413, f"body above {MAX_BODY_BYTES} bytes"), keep_alive=False)
+                    return
+                body = await reader.readexactly(length) if length else b""
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+                inc("service_requests")
+                await _respond(writer, *await self.dispatch(method, target, headers, body), keep_alive=keep_alive)
+                if not keep_alive:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+        finally:
+            writer.close()
+
+    async def start(self, host: str = HOST, port: int = PORT) -> asyncio.AbstractServer:
+        """Listen on *host*:*port* (``0`` picks a free port)."""
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _error(status: int, message: str) -> tuple[int, dict[str, str], bytes]:
+    return status, {"Content-Type": "application/json"}, json.dumps({"error": message}).encode()
+
+
+async def _respond(writer: asyncio.StreamWriter, status: int, headers: dict[str, str], body: bytes,
+                   keep_alive: bool) -> None:
+    head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    head += [f"{name}: {value}" for name, value in headers.items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def serve(host: str = HOST, port: int = PORT, workers: int | None = None,
+                cache_bytes: int = CACHE_BYTES) -> None:
+    """Run a :class:`MissionService` until cancelled."""
+    service = MissionService(workers, cache_bytes)
+    server = await service.start(host, port)
+    bound = server.sockets[0].getsockname()
+    print(f"🎉  Serving missions on http://{bound[0]}:{bound[1]}/mission")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+# ---------------------------------------------------------------------- #
+#  Client                                                                 #
+# ---------------------------------------------------------------------- #
+class MissionClient:
+    """
+    Blocking client that reuses one keep-alive connection.
+
+        with MissionClient(port=8765) as client:
+            kmz = client.mission(waypoints, author="Inspection")
+    """
+
+    def __init__(self, host: str = HOST, port: int = PORT, timeout: float = 60.0):
+        self.conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        self.last_headers: dict[str, str] = {}
+
+    def request(self, method: str, path: str, body: bytes | None = None,
+                headers: dict[str, str] | None = None) -> bytes:
+        """Body of a 200 answer; :raises ServiceError: on any other status."""
+        self.conn.request(method, path, body=body, headers=headers or {})
+        response = self.conn.getresponse()
+        data = response.read()
+        self.last_headers = {k.lower(): v for k, v in response.getheaders()}
+        if response.status != 200:
+            raise ServiceError(response.status, data.decode("utf-8", "replace"))
+        return data
+
+    def mission(self, waypoints=None, corners=None, **params) -> bytes:
+        """
+        KMZ bytes of *waypoints* (:class:`WaypointArray`, DataFrame or
+        sequence of :class:`Waypoint`) or of pallet *corners* (M, 4, 3),
+        sent as JSON.
+        """
+        doc = dict(params)
+        if corners is not None:
+            doc["corners"] = np.asarray(corners, dtype=float).tolist()
+        else:
+            doc["waypoints"] = {name: col.tolist() for name, col in _as_columns(waypoints).items()}
+        return self.request("POST", "/mission", json.dumps(doc).encode(), {"Content-Type": "application/json"})
+
+    def mission_arrow(self, waypoints, **params) -> bytes:
+        """KMZ bytes of *waypoints*, sent as an Arrow IPC stream."""
+        import pyarrow as pa
+
+        table = pa.table(_as_columns(waypoints))
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as stream:
+            stream.write_table(table)
+        path = "/mission" + (f"?{urlencode(params)}" if params else "")
+        return self.request("POST", path, sink.getvalue(), {"Content-Type": ARROW_TYPE})
+
+    def health(self) -> dict:
+        return json.loads(self.request("GET", "/health"))
+
+    def metrics(self) -> str:
+        return self.request("GET", "/metrics").decode()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "MissionClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _as_columns(waypoints) -> dict[str, np.ndarray]:
+    if isinstance(waypoints, pd.DataFrame):
+        return WaypointArray.from_frame(waypoints).columns()
+    if not isinstance(waypoints, WaypointArray):
+        waypoints = WaypointArray.from_waypoints(waypoints)
+    return {name: getattr(waypoints, name) for name in FIELDS}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve KMZ missions over HTTP.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("--cache-mb", type=float, default=CACHE_BYTES / 2**20)
+    args = parser.parse_args()
+    configure_logging()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, int(args.cache_mb * 2**20)))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,236 @@
+"""
+Path simplification and densification ahead of the writer.
+
+    path = simplify_path(waypoints, tolerance=0.5, max_leg=50)
+    build_kmz(path.waypoints)
+
+Every waypoint used to be a stop-and-turn Placemark, so hover targets
+along a straight pallet row cost one stop each although the aircraft flies
+the same line.  :func:`simplify_path` works in a local ENU frame (metres)
+and collapses straight runs into one stop-to-stop leg:
+
+1.  Waypoints whose actions differ from the previous waypoint's (yaw or
+    gimbal pitch changes by more than *angle_tolerance*) are anchors and
+    stay stops, so every attitude change still happens at a standstill.
+2.  Between anchors, Douglas-Peucker picks the stops: every other
+    waypoint stays within *tolerance* of the stop-to-stop path.  All open
+    segments of one recursion level are split together, so a level is a
+    handful of array operations over the whole mission.
+3.  Every other waypoint stays in the mission with its actions, as a
+    fly-through waypoint (``stop`` = 0,
+    ``toPointAndPassWithContinuityCurvature``): the aircraft no longer
+    halts there.  No waypoint is dropped – every Placemark carries the
+    yaw / gimbal actions of a capture point, and simplifying a simplified
+    mission again changes nothing.
+4.  Optionally, legs longer than *max_leg* are split evenly; inserted
+    waypoints are fly-through, lie on the leg and keep the attitude of its
+    first waypoint.
+
+Input waypoints are copied unchanged apart from ``stop``; only inserted
+ones are converted back from ENU.
+"""
+from __future__ import annotations
+
+import logging
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+from route import waypoints_to_enu
+from waypoints import WaypointArray, as_waypoint_array
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "pose_estimation"))
+from final_navigation.geodesy import enu_to_geodetic  # noqa: E402
+from final_navigation.metrics import inc, timed  # noqa: E402
+
+#: Largest allowed distance (m) of a fly-through waypoint from the stop-to-stop path
+SIMPLIFY_TOLERANCE_M = 0.5
+#: Heading / gimbal-pitch change (deg) that makes a waypoint an anchor
+ANGLE_TOLERANCE_DEG = 0.5
+
+
+@dataclass
+class SimplifiedPath:
+    """
+    Simplified (and densified) mission.
+
+    :param waypoints: Waypoints to fly, as a :class:`WaypointArray`; its
+                      ``stop`` column marks the remaining stops.
+    :param source:    Input index of every waypoint; inserted waypoints carry
+                      the index of their leg's first waypoint.
+    :param inserted:  ``True`` for waypoints added by densification.
+    :param max_deviation: Largest distance (m) of a fly-through input
+                      waypoint from the stop-to-stop path – never above the
+                      tolerance.
+    """
+    waypoints: WaypointArray
+    source: np.ndarray
+    inserted: np.ndarray
+    max_deviation: float
+
+
+def segment_distance(points: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Distance of every row of *points* to the segment ``a[k] → b[k]``."""
+    ab = b - a
+    length2 = np.einsum("ij,ij->i", ab, ab)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.einsum("ij,ij->i", points - a, ab) / length2
+    t = np.clip(np.nan_to_num(t), 0.0, 1.0)
+    return np.linalg.norm(points - (a + t[:, None] * ab), axis=1)
+
+
+def _interior(lo: np.ndarray, hi: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """``(segment, index)`` of every point strictly between ``lo[k]`` and ``hi[k]``."""
+    inner = hi - lo - 1
+    seg = np.repeat(np.arange(len(lo)), inner)
+    index = np.arange(len(seg)) - np.repeat(np.cumsum(inner) - inner, inner) + lo[seg] + 1
+    return seg, index
+
+
+def douglas_peucker(points: np.ndarray, tolerance: float, keep: np.ndarray | None = None) -> np.ndarray:
+    """
+    Douglas-Peucker over a (N, D) polyline, one recursion level at a time.
+
+    :param tolerance: Largest allowed distance of a dropped point from the
+                      segment that replaces it.
+    :param keep:      Optional (N,) mask of points that must stay.
+    :returns:         (N,) mask of the kept points (first and last included).
+    """
+    n = len(points)
+    mask = np.zeros(n, dtype=bool) if keep is None else np.asarray(keep, dtype=bool).copy()
+    if n == 0:
+        return mask
+    mask[[0, -1]] = True
+    anchors = np.flatnonzero(mask)
+    lo, hi = anchors[:-1], anchors[1:]
+    while True:
+        open_ = hi - lo > 1
+        lo, hi = lo[open_], hi[open_]
+        if not len(lo):
+            return mask
+        seg, index = _interior(lo, hi)
+        dist = segment_distance(points[index], points[lo[seg]], points[hi[seg]])
+        starts = np.cumsum(hi - lo - 1) - (hi - lo - 1)
+        worst = np.maximum.reduceat(dist, starts)
+        hits = np.flatnonzero(dist == worst[seg])
+        first = hits[np.r_[True, seg[hits][1:] != seg[hits][:-1]]]     # first maximum per segment
+        split = worst > tolerance
+        pivot = index[first][split]
+        mask[pivot] = True
+        lo, hi = np.r_[lo[split], pivot], np.r_[pivot, hi[split]]
+
+
+def attitude_anchors(waypoints: WaypointArray, angle_tolerance: float = ANGLE_TOLERANCE_DEG) -> np.ndarray:
+    """(N,) mask of waypoints whose heading or gimbal pitch differs from the previous waypoint's."""
+    turn = np.abs((np.diff(waypoints.heading) + 180.0) % 360.0 - 180.0)
+    tilt = np.abs(np.diff(waypoints.pitch))
+    return np.r_[True, (turn > angle_tolerance) | (tilt > angle_tolerance)]
+
+
+def densify(points: np.ndarray, max_leg: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Split every leg of *points* longer than *max_leg* evenly.
+
+    :returns: ``(leg, fraction)`` per output point: the index of the leg's
+              first point and the position along the leg (0 = that point).
+    """
+    length = np.linalg.norm(np.diff(points, axis=0), axis=1)
+    pieces = np.maximum(np.ceil(length / max_leg), 1).astype(np.int64)
+    pieces = np.r_[pieces, 1]                                           # last point: no leg
+    leg = np.repeat(np.arange(len(points)), pieces)
+    step = np.arange(len(leg)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    return leg, step / pieces[leg]
+
+
+@timed("simplify_path")
+def simplify_path(waypoints: Sequence,
+                  tolerance: float = SIMPLIFY_TOLERANCE_M,
+                  max_leg: float | None = None,
+                  keep: np.ndarray | None = None,
+                  angle_tolerance: float = ANGLE_TOLERANCE_DEG) -> SimplifiedPath:
+    """
+    Fly through the stops of straight runs, then split long legs.
+
+    :param waypoints: Sequence of :class:`Waypoint` or a :class:`WaypointArray`,
+                      in flight order.
+    :param tolerance: Maximum deviation (m) of the stop-to-stop path from
+                      every other waypoint; ``0`` only merges exactly
+                      collinear ones.
+    :param max_leg:   Split legs longer than this (m); ``None`` never splits.
+    :param keep:      Optional (N,) mask of further waypoints that must stay
+                      stops.
+    :param angle_tolerance: Yaw / pitch change (deg) that anchors a waypoint.
+    :returns:         :class:`SimplifiedPath`.
+    """
+    waypoints = as_waypoint_array(waypoints)
+    n = len(waypoints)
+    if n == 0:
+        return SimplifiedPath(waypoints, np.empty(0, np.int64), np.empty(0, bool), 0.0)
+
+    origin = np.array([waypoints.latitude[0], waypoints.longitude[0], waypoints.altitude[0]])
+    enu = waypoints_to_enu(waypoints, origin)
+    anchors = attitude_anchors(waypoints, angle_tolerance)
+    if keep is not None:
+        anchors |= np.asarray(keep, dtype=bool)
+    stops = douglas_peucker(enu, tolerance, anchors)
+
+    # Deviation of every other waypoint from the stop-to-stop leg covering it
+    stop_idx = np.flatnonzero(stops)
+    passed = np.flatnonzero(~stops)
+    deviation = 0.0
+    if len(passed):
+        leg = np.searchsorted(stop_idx, passed)
+        deviation = float(segment_distance(enu[passed], enu[stop_idx[leg - 1]], enu[stop_idx[leg]]).max())
+
+    source, inserted = np.arange(n), np.zeros(n, dtype=bool)
+    simplified = waypoints.take(source)
+    simplified.stop = stops.astype(np.float64)
+    if max_leg is not None and n > 1:
+        leg, fraction = densify(enu, max_leg)
+        start, end = leg, np.minimum(leg + 1, n - 1)
+        source, inserted = start, fraction > 0
+        if inserted.any():
+            f = fraction[inserted]
+            a, b = enu[start[inserted]], enu[end[inserted]]
+            geo = enu_to_geodetic(a + f[:, None] * (b - a), origin)
+            columns = {name: col.copy() for name, col in waypoints.take(start).columns().items()}
+            columns["latitude"][inserted], columns["longitude"][inserted], columns["altitude"][inserted] = geo.T
+            h0, h1 = waypoints.height[start[inserted]], waypoints.height[end[inserted]]
+            columns["height"][inserted] = h0 + f * (h1 - h0)
+            columns["stop"] = np.where(inserted, 0.0, simplified.stop[leg])
+            simplified = WaypointArray(**columns)
+
+    n_stops = int(np.count_nonzero(waypoints.stop))
+    inc("stops_flown_through", max(n_stops - int(stops.sum()), 0))
+    inc("waypoints_inserted", int(inserted.sum()))
+    logging.info("Simplified %d → %d stops over %d → %d waypoints (%d inserted, max deviation %.3f m)",
+                 n_stops, int(stops.sum()), n, len(simplified), int(inserted.sum()), deviation)
+    return SimplifiedPath(simplified, source, inserted, deviation)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from config import configure_logging
+    from reader import read_kmz
+    from writer import build_kmz
+
+    parser = argparse.ArgumentParser(description="Simplify (and densify) the wayline of a KMZ mission.")
+    parser.add_argument("kmz")
+    parser.add_argument("output")
+    parser.add_argument("--tolerance", type=float, default=SIMPLIFY_TOLERANCE_M,
+                        help="maximum deviation of the flown path from a fly-through waypoint (m)")
+    parser.add_argument("--max-leg", type=float, default=None, help="split legs longer than this (m)")
+    parser.add_argument("--angle-tolerance", type=float, default=ANGLE_TOLERANCE_DEG)
+    args = parser.parse_args()
+    configure_logging()
+
+    mission = read_kmz(args.kmz)
+    path = simplify_path(mission.waypoints, args.tolerance, args.max_leg,
+                         angle_tolerance=args.angle_tolerance)
+    out = build_kmz(path.waypoints, args.output, mission.author, mission.takeoff_ref_point, mission.speed)
+    print(f"🎉  KMZ ready: {out.resolve()} ({len(mission.waypoints)} → {len(path.waypoints)} waypoints, "
+          f"{int(np.count_nonzero(mission.waypoints.stop))} → {int(np.count_nonzero(path.waypoints.stop))} stops)")
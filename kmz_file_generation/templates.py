@@ -42,7 +42,7 @@ COORD_SYS_BLOCK = """
         <wpml:coordinateMode>WGS84</wpml:coordinateMode>
         <wpml:heightMode>aboveGroundLevel</wpml:heightMode>
       </wpml:waylineCoordinateSysParam>
-      <wpml:autoFlightSpeed>10</wpml:autoFlightSpeed>
+      <wpml:autoFlightSpeed>${AUTO_FLIGHT_SPEED}</wpml:autoFlightSpeed>
       <wpml:globalHeight>10</wpml:globalHeight>
 """
 
@@ -58,6 +58,11 @@ WAYPOINT_BLOCK = """
         <wpml:index>${INDEX}</wpml:index>
         <wpml:height>${HEIGHT}</wpml:height>
         <wpml:ellipsoidHeight>${ALTITUDE}</wpml:ellipsoidHeight>
+        <wpml:useGlobalTurnParam>0</wpml:useGlobalTurnParam>
+        <wpml:waypointTurnParam>
+          <wpml:waypointTurnMode>${TURN_MODE}</wpml:waypointTurnMode>
+          <wpml:waypointTurnDampingDist>0</wpml:waypointTurnDampingDist>
+        </wpml:waypointTurnParam>
 
         <wpml:actionGroup>
           <wpml:actionGroupId>${ACTION_GROUP_ID}</wpml:actionGroupId>
@@ -145,7 +150,7 @@ WPML_WAYPOINT_BLOCK = """
 
         <wpml:index>${INDEX}</wpml:index>
         <wpml:executeHeight>${ALTITUDE}</wpml:executeHeight>
-        <wpml:waypointSpeed>10</wpml:waypointSpeed>
+        <wpml:waypointSpeed>${WAYPOINT_SPEED}</wpml:waypointSpeed>
 
         <wpml:waypointHeadingParam>
           <wpml:waypointHeadingMode>followWayline</wpml:waypointHeadingMode>
@@ -157,7 +162,7 @@ WPML_WAYPOINT_BLOCK = """
         </wpml:waypointHeadingParam>
 
         <wpml:waypointTurnParam>
-          <wpml:waypointTurnMode>toPointAndStopWithDiscontinuityCurvature</wpml:waypointTurnMode>
+          <wpml:waypointTurnMode>${TURN_MODE}</wpml:waypointTurnMode>
           <wpml:waypointTurnDampingDist>0</wpml:waypointTurnDampingDist>
         </wpml:waypointTurnParam>
         <wpml:useStraightLine>1</wpml:useStraightLine>
@@ -172,9 +177,9 @@ ${MISSION_CONFIG_BLOCK}
       <wpml:templateId>0</wpml:templateId>
       <wpml:executeHeightMode>WGS84</wpml:executeHeightMode>
       <wpml:waylineId>0</wpml:waylineId>
-      <wpml:distance>0</wpml:distance>         <!-- dummy – Pilot recalculates -->
-      <wpml:duration>0</wpml:duration>         <!-- dummy – Pilot recalculates -->
-      <wpml:autoFlightSpeed>10</wpml:autoFlightSpeed>
+      <wpml:distance>${DISTANCE}</wpml:distance>         <!-- metres along the wayline -->
+      <wpml:duration>${DURATION}</wpml:duration>         <!-- seconds at autoFlightSpeed -->
+      <wpml:autoFlightSpeed>${AUTO_FLIGHT_SPEED}</wpml:autoFlightSpeed>
 
 ${WAYPOINTS}
     </Folder>
@@ -0,0 +1,169 @@
+"""
+Waypoint containers.
+
+:class:`Waypoint` is one waypoint as a small object; :class:`WaypointArray`
+holds a whole mission as contiguous NumPy columns (struct of arrays).
+Every writer entry point accepts either a sequence of :class:`Waypoint`
+or a :class:`WaypointArray`; the latter is rendered straight from its
+columns without creating a Python object per waypoint.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, fields
+from typing import Iterable, Iterator, Mapping
+
+import numpy as np
+
+
+@dataclass(slots=True)
+class Waypoint:
+    """
+    Container for waypoint data.
+
+    :param longitude:   WGS-84 longitude  (decimal degrees)
+    :param latitude:   WGS-84 latitude   (decimal degrees)
+    :param altitude:   WGS-84 altitude   (ellipsoid height, metres)
+    :param height: Height above ground (metres)
+    :param heading: Aircraft yaw at that point (deg, 0° = North)
+    :param pitch:  Gimbal pitch     (deg, –90° = straight down)
+    :param stop:   1 = stop at the waypoint (capture stop), 0 = fly through
+                   it without stopping
+    """
+    longitude: float
+    latitude: float
+    altitude: float
+    height: float = 10
+    heading: float = 0
+    pitch: float = -90
+    stop: float = 1
+
+
+#: Column order of :class:`WaypointArray` (same as :class:`Waypoint`)
+FIELDS: tuple[str, ...] = tuple(f.name for f in fields(Waypoint))
+DEFAULTS: dict[str, float] = {f.name: f.default for f in fields(Waypoint) if f.name not in FIELDS[:3]}
+
+#: Accepted DataFrame column names per field
+COLUMN_ALIASES: dict[str, tuple[str, ...]] = {
+    "longitude": ("longitude", "lon"),
+    "latitude": ("latitude", "lat"),
+    "altitude": ("altitude", "alt"),
+    "height": ("height",),
+    "heading": ("heading",),
+    "pitch": ("pitch",),
+    "stop": ("stop",),
+}
+
+
+class WaypointArray:
+    """
+    A mission as seven contiguous ``float64`` columns.
+
+    Indexing with an int returns a :class:`Waypoint`; slices, index arrays
+    and boolean masks return a new :class:`WaypointArray`.
+
+    :param longitude: (N,) longitudes.
+    :param latitude:  (N,) latitudes.
+    :param altitude:  (N,) ellipsoid heights.
+    :param height:    (N,) heights above ground, or a scalar for all.
+    :param heading:   (N,) aircraft yaw, or a scalar for all.
+    :param pitch:     (N,) gimbal pitch, or a scalar for all.
+    :param stop:      (N,) 1 = stop, 0 = fly through, or a scalar for all.
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, longitude, latitude, altitude,
+                 height=DEFAULTS["height"], heading=DEFAULTS["heading"], pitch=DEFAULTS["pitch"],
+                 stop=DEFAULTS["stop"]):
+        n = np.size(longitude)
+        for name, values in zip(FIELDS, (longitude, latitude, altitude, height, heading, pitch, stop)):
+            col = np.asarray(values, dtype=np.float64)
+            if col.ndim == 0:
+                col = np.full(n, col)
+            col = np.ascontiguousarray(col.reshape(-1))
+            if len(col) != n:
+                raise ValueError(f"Column {name!r} has {len(col)} values, expected {n}")
+            setattr(self, name, col)
+
+    # ------------------------------------------------------------------ #
+    #  Constructors                                                       #
+    # ------------------------------------------------------------------ #
+    @classmethod
+    def from_waypoints(cls, waypoints: Iterable[Waypoint]) -> WaypointArray:
+        """Pack :class:`Waypoint` objects into columns."""
+        rows = np.array([[getattr(w, f) for f in FIELDS] for w in waypoints], dtype=np.float64)
+        return cls(*rows.reshape(-1, len(FIELDS)).T)
+
+    @classmethod
+    def from_frame(cls, df, **overrides) -> WaypointArray:
+        """
+        Build from a DataFrame with ``longitude/lon``, ``latitude/lat``,
+        ``altitude/alt`` and optional ``height``, ``heading``, ``pitch``,
+        ``stop`` columns (e.g. the merged pallet targets).
+
+        :param overrides: Per-field scalars or arrays that replace / fill
+                          missing columns, e.g. ``height=40``.
+        """
+        cols = {}
+        for name in FIELDS:
+            if name in overrides:
+                cols[name] = overrides[name]
+                continue
+            col = next((c for c in COLUMN_ALIASES[name] if c in df.columns), None)
+            if col is not None:
+                cols[name] = df[col].to_numpy(dtype=np.float64)
+            elif name in DEFAULTS:
+                cols[name] = DEFAULTS[name]
+            else:
+                raise ValueError(f"DataFrame has no {' / '.join(COLUMN_ALIASES[name])} column")
+        return cls(**cols)
+
+    @classmethod
+    def from_arrays(cls, arrays: Mapping[str, np.ndarray]) -> WaypointArray:
+        """Build from ``{field: values}`` (missing optional fields get the defaults)."""
+        return cls(**{name: arrays[name] for name in FIELDS if name in arrays})
+
+    # ------------------------------------------------------------------ #
+    #  Sequence protocol                                                  #
+    # ------------------------------------------------------------------ #
+    def __len__(self) -> int:
+        return len(self.longitude)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return Waypoint(*(getattr(self, f)[index].item() for f in FIELDS))
+        return WaypointArray(*(getattr(self, f)[index] for f in FIELDS))
+
+    def __iter__(self) -> Iterator[Waypoint]:
+        for row in zip(*(getattr(self, f).tolist() for f in FIELDS)):
+            yield Waypoint(*row)
+
+    def __repr__(self) -> str:
+        return f"WaypointArray(n={len(self)})"
+
+    def take(self, order: np.ndarray) -> WaypointArray:
+        """Waypoints reordered / selected by an index array."""
+        return self[np.asarray(order)]
+
+    # ------------------------------------------------------------------ #
+    #  Export                                                             #
+    # ------------------------------------------------------------------ #
+    def columns(self) -> dict[str, np.ndarray]:
+        """``{field: column}`` (no copies)."""
+        return {f: getattr(self, f) for f in FIELDS}
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame(self.columns())
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, f).nbytes for f in FIELDS)
+
+
+def as_waypoint_array(waypoints: Iterable[Waypoint] | WaypointArray) -> WaypointArray:
+    """*waypoints* as a :class:`WaypointArray` (no copy if it already is one)."""
+    if isinstance(waypoints, WaypointArray):
+        return waypoints
+    return WaypointArray.from_waypoints(waypoints)
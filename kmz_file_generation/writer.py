@@ -1,18 +1,34 @@
 """
 Functions that turn Python data → KML text → file on disk.
+
+Every entry point takes either a sequence of :class:`Waypoint` objects or a
+:class:`WaypointArray` (see waypoints.py, both re-exported here).
 """
 
 from __future__ import annotations
 
+import io
+import logging
+import os
+import sys
 import time
-from dataclasses import dataclass
+import uuid
 from pathlib import Path
 from string import Template
-from typing import List
+from typing import TYPE_CHECKING, BinaryIO, Iterable, Iterator, List
 import zipfile
 
 from config import *
 import templates as T
+import render as R
+from route import wayline_stats
+from waypoints import Waypoint, WaypointArray
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "pose_estimation"))
+from final_navigation.metrics import inc, timer  # noqa: E402
+
+if TYPE_CHECKING:
+    from geofence import Geofence
 
 
 def _epoch_ms() -> str:
@@ -33,26 +49,6 @@ def _substitute(block: str, mapping: dict[str, str]) -> str:
     return Template(block).safe_substitute(mapping)
 
 
-@dataclass
-class Waypoint:
-    """
-    Container for waypoint data.
-
-    :param longitude:   WGS-84 longitude  (decimal degrees)
-    :param latitude:   WGS-84 latitude   (decimal degrees)
-    :param altitude:   WGS-84 altitude   (ellipsoid height, metres)
-    :param height: Height above ground (metres)
-    :param heading: Aircraft yaw at that point (deg, 0° = North)
-    :param pitch:  Gimbal pitch     (deg, –90° = straight down)
-    """
-    longitude: float
-    latitude: float
-    altitude: float
-    height: float = 10
-    heading: float = 0
-    pitch: float = -90
-
-
 def build_template_kml(waypoint: Waypoint, index: int) -> str:
     """
     Render a single ``<Placemark>…`` block.
@@ -62,31 +58,33 @@ def build_template_kml(waypoint: Waypoint, index: int) -> str:
     :returns:        XML string.
     """
     mapping = {
-        "LONGITUDE": waypoint.longitude,
-        "LATITUDE": waypoint.latitude,
-        "ALTITUDE": waypoint.altitude,
-        "INDEX": index,
-        "HEIGHT": waypoint.height,
-        "ACTION_GROUP_ID": index,          # keep id == index for clarity
-        "HEADING": waypoint.heading,
-        "PITCH": waypoint.pitch,
+        "LONGITUDE": [waypoint.longitude],
+        "LATITUDE": [waypoint.latitude],
+        "ALTITUDE": [waypoint.altitude],
+        "INDEX": [index],
+        "HEIGHT": [waypoint.height],
+        "ACTION_GROUP_ID": [index],          # keep id == index for clarity
+        "HEADING": [waypoint.heading],
+        "PITCH": [waypoint.pitch],
+        "TURN_MODE": R.turn_modes([getattr(waypoint, "stop", 1)]),
     }
-    return _substitute(T.WAYPOINT_BLOCK, mapping)
+    return R.KML_PLACEMARK.render_rows(mapping)[0]
 
-def build_wpml_waypoint_xml(waypoint: Waypoint, index: int) -> str:
+def build_wpml_waypoint_xml(waypoint: Waypoint, index: int, speed: float = SPEED) -> str:
     """
     Render one WPML Placemark (the WPML schema calls this “waypoint node”).
 
     executeHeight is approximated as *take-off ellipsoid height + AGL*.
     """
     mapping = {
-        "LONGITUDE": waypoint.longitude,
-        "LATITUDE": waypoint.latitude,
-        "INDEX": index,
-        "ALTITUDE": waypoint.altitude,
-        "HEADING": waypoint.heading,
+        "LONGITUDE": [waypoint.longitude],
+        "LATITUDE": [waypoint.latitude],
+        "INDEX": [index],
+        "ALTITUDE": [waypoint.altitude],
+        "HEADING": [waypoint.heading],
+        "TURN_MODE": R.turn_modes([getattr(waypoint, "stop", 1)]),
     }
-    return _substitute(T.WPML_WAYPOINT_BLOCK, mapping)
+    return R.wpml_placemark(speed).render_rows(mapping)[0]
 
 def decimal_to_dms(decimal: float, is_lat: bool = True) -> str:
     """
@@ -125,102 +123,229 @@ def floats_to_dms(lon: float, lat: float) -> str:
     return f"Lon: {lon_dms}, Lat: {lat_dms}"
 
 
-def build_kml(waypoints: List[Waypoint],
-              output: Path | str,
-              author: str = AUTHOR,
-              takeoff_ref_point: str = TAKEOFF_REF_POINT) -> Path:
+def _split_skeleton(skeleton: str) -> tuple[str, str]:
     """
-    Create a full DJI-Pilot-compatible KML and write it to *output*.
+    Split a filled-in skeleton at its ``${WAYPOINTS}`` marker.
+    """
+    head, tail = skeleton.split("${WAYPOINTS}")
+    return head, tail
 
-    :param waypoints:  Sequence of :class:`Waypoint` objects.
-    :param output:     Where to write the finished file.
+
+def _iter_placemarks(head: str, placemarks: Iterator[str], tail: str) -> Iterator[str]:
+    """
+    Yield *head*, the newline-separated *placemarks* (single blocks or
+    pre-joined chunks), then *tail*.
+    """
+    yield head
+    for idx, block in enumerate(placemarks):
+        if idx:
+            yield "\n"
+        yield block
+    yield tail
+
+
+def iter_kml(waypoints: Iterable[Waypoint] | WaypointArray,
+             author: str = AUTHOR,
+             takeoff_ref_point: str = TAKEOFF_REF_POINT,
+             speed: float = SPEED) -> Iterator[str]:
+    """
+    Lazily render *template.kml* as a sequence of text chunks.
+
+    Placemarks are rendered in chunks (see :mod:`render`) as *waypoints* is
+    consumed, so the document never exists as one string.
+
+    :param waypoints:  Iterable of :class:`Waypoint` objects or a :class:`WaypointArray`.
     :param author:     Name inserted into <wpml:author>.
-    :param takeoff_ref_point:  ``lon,lat,ellipsoidHeight`` (comma separated).
-    :returns:          Path to the written file.
+    :param takeoff_ref_point:  ``lat,lon,ellipsoidHeight`` (comma separated).
+    :param speed:      Auto flight speed (m/s).
+    :returns:          Iterator of XML text chunks.
     """
-    # 1) Substitute header + missionConfig blocks
     common_xml_block = _substitute(T.COMMON_BLOCK,
-                             {"AUTHOR": author,
-                              "CREATE_TIME": _epoch_ms(),
-                              "UPDATE_TIME": _epoch_ms(),
-                                "TAKEOFF_REF_POINT": takeoff_ref_point})
-
-    # 2) Build every waypoint’s XML
-    wpt_xml_list = []
-    for idx, wpt in enumerate(waypoints):
-        dms_coord = floats_to_dms(wpt.longitude, wpt.latitude)
-        print(f"Waypoint {idx} DMS coordinates: {dms_coord}")
-        print(f"Waypoint altitude: {wpt.altitude}m")
-        wpt_xml_list.append(build_template_kml(wpt, idx))
-    wpt_xml = "\n".join(wpt_xml_list)
-
-    # 3) Assemble the full KML skeleton
-    full_kml = _substitute(
+                                   {"AUTHOR": author,
+                                    "CREATE_TIME": _epoch_ms(),
+                                    "UPDATE_TIME": _epoch_ms(),
+                                    "TAKEOFF_REF_POINT": takeoff_ref_point})
+    head, tail = _split_skeleton(_substitute(
         T.KML_TEMPLATE,
         {
             "COMMON_BLOCK": common_xml_block,
-            "COORD_SYS_BLOCK": T.COORD_SYS_BLOCK,
-            "WAYPOINTS": wpt_xml
+            "COORD_SYS_BLOCK": _substitute(T.COORD_SYS_BLOCK, {"AUTO_FLIGHT_SPEED": f"{speed:g}"}),
         }
-    )
+    ))
+    return _iter_placemarks(head, R.iter_placemarks(R.KML_PLACEMARK, waypoints), tail)
+
+
+def iter_wpml(waypoints: Iterable[Waypoint] | WaypointArray, speed: float = SPEED) -> Iterator[str]:
+    """
+    Lazily render *waylines.wpml* as a sequence of text chunks.
+
+    ``<wpml:distance>`` / ``<wpml:duration>`` are the real wayline length
+    and flight time at *speed* (see :func:`route.wayline_stats`), which is
+    also every ``<wpml:waypointSpeed>``; *waypoints* is materialised into a
+    list if it is a one-shot iterator.
+    """
+    if iter(waypoints) is waypoints:
+        waypoints = list(waypoints)
+    distance, duration = wayline_stats(waypoints, speed)
+    head, tail = _split_skeleton(_substitute(
+        T.WPML_TEMPLATE,
+        {"MISSION_CONFIG_BLOCK": T.WPML_MISSION_CONFIG_BLOCK,
+         "DISTANCE": f"{distance:.2f}",
+         "DURATION": f"{duration:.2f}",
+         "AUTO_FLIGHT_SPEED": f"{speed:g}"}
+    ))
+    return _iter_placemarks(head, R.iter_placemarks(R.wpml_placemark(speed), waypoints), tail)
+
+
+def build_kml(waypoints: List[Waypoint] | WaypointArray,
+              output: Path | str,
+              author: str = AUTHOR,
+              takeoff_ref_point: str = TAKEOFF_REF_POINT,
+              speed: float = SPEED) -> Path:
+    """
+    Create a full DJI-Pilot-compatible KML and write it to *output*.
 
-    # 4) Write to disk
+    :param waypoints:  Sequence of :class:`Waypoint` objects or a :class:`WaypointArray`.
+    :param output:     Where to write the finished file.
+    :param author:     Name inserted into <wpml:author>.
+    :param takeoff_ref_point:  ``lat,lon,ellipsoidHeight`` (comma separated).
+    :param speed:      Auto flight speed (m/s).
+    :returns:          Path to the written file.
+    """
+    # 1) Log every waypoint – DEBUG only, the loop is skipped otherwise
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        for idx, wpt in enumerate(waypoints):
+            logging.debug("Waypoint %d DMS coordinates: %s, altitude: %sm",
+                          idx, floats_to_dms(wpt.longitude, wpt.latitude), wpt.altitude)
+
+    # 2) Stream the KML skeleton + Placemarks to disk
     output_path = Path(output)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(full_kml, encoding="utf-8")
+    with timer("build_kml"), output_path.open("w", encoding="utf-8") as fh:
+        fh.writelines(iter_kml(waypoints, author, takeoff_ref_point, speed))
+    inc("waypoints_rendered", len(waypoints))
+    inc("bytes_written", output_path.stat().st_size)
 
     return output_path
 
-def build_wpml(waypoints: List[Waypoint], folder: Path) -> Path:
+def build_wpml(waypoints: List[Waypoint] | WaypointArray, folder: Path, speed: float = SPEED) -> Path:
     """
     Create *waylines.wpml* inside *folder* and return its path.
     """
-    wpml_wpts = "\n".join(
-        build_wpml_waypoint_xml(wpt, idx) for idx, wpt in enumerate(waypoints)
-    )
-
-    full_wpml = _substitute(
-        T.WPML_TEMPLATE,
-        {
-            "MISSION_CONFIG_BLOCK": T.WPML_MISSION_CONFIG_BLOCK,
-            "WAYPOINTS": wpml_wpts,
-        }
-    )
-
     wpml_path = folder / "waylines.wpml"
-    wpml_path.write_text(full_wpml, encoding="utf-8")
+    with wpml_path.open("w", encoding="utf-8") as fh:
+        fh.writelines(iter_wpml(waypoints, speed))
     return wpml_path
 
-def build_kmz(waypoints: List[Waypoint]) -> Path:
+def temp_sibling(path: Path) -> Path:
+    """
+    Unique hidden temp path in the same folder as *path* (same filesystem,
+    so :func:`os.replace` is atomic).
+    """
+    return path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+
+
+def build_kmz(waypoints: Iterable[Waypoint] | WaypointArray,
+              output: Path | str | None = None,
+              author: str = AUTHOR,
+              takeoff_ref_point: str = TAKEOFF_REF_POINT,
+              speed: float = SPEED,
+              geofence: Geofence | None = None) -> Path:
     """
     Generate *template.kml* + *waylines.wpml*, zip them, and return
     the path of the resulting KMZ archive.
 
-    The output layout is:
-        OUTPUT_DIR / KMZ_NAME(zip archive → .kmz)
-        OUTPUT_DIR / wpmz / template.kml
-        OUTPUT_DIR / wpmz / waylines.wpml
+    The archive is streamed (see :func:`stream_kmz`) into a temporary file
+    next to *output* and renamed into place, so no shared ``wpmz/`` working
+    folder is used and concurrent runs never see each other's half-written
+    files.
+
+    :param waypoints:  Iterable of :class:`Waypoint` objects or a :class:`WaypointArray`.
+    :param output:     KMZ path; defaults to ``OUTPUT_DIR / KMZ_NAME``.
+    :param author:     Name inserted into <wpml:author>.
+    :param takeoff_ref_point:  ``lat,lon,ellipsoidHeight`` of the launch site.
+    :param speed:      Auto flight speed (m/s).
+    :param geofence:   Validate the mission against this :class:`geofence.Geofence`
+                       first; nothing is written when it fails.
+    :returns:          Path to the written KMZ.
+    :raises geofence.GeofenceError: if *geofence* is violated.
+    """
+    kmz_path = Path(output) if output is not None else OUTPUT_DIR / KMZ_NAME
+    kmz_path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = temp_sibling(kmz_path)
+    try:
+        with tmp_path.open("xb") as fh:
+            stream_kmz(waypoints, fh, author, takeoff_ref_point, speed, geofence)
+        size = tmp_path.stat().st_size
+        os.replace(tmp_path, kmz_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    inc("bytes_written", size)
+
+    return kmz_path
+
+
+def _write_entry(zf: zipfile.ZipFile, arcname: str, chunks: Iterable[str]) -> None:
+    """
+    Stream text *chunks* into a new archive member, UTF-8 encoded.
     """
-    # 1) Prepare working folder
-    work_dir = OUTPUT_DIR / "wpmz"
-    work_dir.mkdir(parents=True, exist_ok=True)
+    with zf.open(arcname, "w") as raw, \
+            io.TextIOWrapper(raw, encoding="utf-8", newline="") as fh:
+        fh.writelines(chunks)
 
-    # 2) Build the template.kml (same logic as before, just new name)
-    kml_path = build_kml(
-        waypoints,
-        output=work_dir / "template.kml",
-        author=AUTHOR,
-        takeoff_ref_point=TAKEOFF_REF_POINT,
-    )
 
-    # 3) Build waylines.wpml
-    wpml_path = build_wpml(waypoints, work_dir)
+def stream_kmz(waypoints: Iterable[Waypoint] | WaypointArray,
+               dest: Path | str | BinaryIO,
+               author: str = AUTHOR,
+               takeoff_ref_point: str = TAKEOFF_REF_POINT,
+               speed: float = SPEED,
+               geofence: Geofence | None = None) -> Path | str | BinaryIO:
+    """
+    Write a KMZ straight into *dest* without touching the filesystem for
+    intermediate files.
 
-    # 4) Zip → KMZ
-    kmz_path = OUTPUT_DIR / KMZ_NAME
-    with zipfile.ZipFile(kmz_path, "w", zipfile.ZIP_DEFLATED) as zf:
-        zf.write(kml_path, arcname="wpmz/template.kml")
-        zf.write(wpml_path, arcname="wpmz/waylines.wpml")
+    Placemarks are rendered lazily and streamed into the zip members, so
+    memory stays bounded for large missions.  Both members are rendered from
+    *waypoints*, so it must be re-iterable; a one-shot iterator is
+    materialised into a list first.
 
-    return kmz_path
+    :param waypoints:  Iterable of :class:`Waypoint` objects or a :class:`WaypointArray`.
+    :param dest:       Output path or writable binary file-like object
+                       (e.g. :class:`io.BytesIO`, an HTTP response body).
+    :param author:     Name inserted into <wpml:author>.
+    :param takeoff_ref_point:  ``lat,lon,ellipsoidHeight`` (comma separated).
+    :param speed:      Auto flight speed (m/s).
+    :param geofence:   Validate the mission against this :class:`geofence.Geofence`
+                       before the first byte is written.
+    :returns:          *dest*
+    :raises geofence.GeofenceError: if *geofence* is violated.
+    """
+    if iter(waypoints) is waypoints:
+        waypoints = list(waypoints)
+    if geofence is not None:
+        from geofence import validate_mission
+
+        validate_mission(waypoints, geofence, takeoff_ref_point).raise_for_violations()
+    if isinstance(dest, (str, Path)):
+        Path(dest).parent.mkdir(parents=True, exist_ok=True)
+
+    with timer("stream_kmz"), zipfile.ZipFile(dest, "w", zipfile.ZIP_DEFLATED) as zf:
+        _write_entry(zf, "wpmz/template.kml", iter_kml(waypoints, author, takeoff_ref_point, speed))
+        _write_entry(zf, "wpmz/waylines.wpml", iter_wpml(waypoints, speed))
+    inc("waypoints_rendered", len(waypoints))
+    inc("kmz_written")
+    return dest
 
+
+def kmz_bytes(waypoints: Iterable[Waypoint] | WaypointArray,
+              author: str = AUTHOR,
+              takeoff_ref_point: str = TAKEOFF_REF_POINT,
+              speed: float = SPEED) -> bytes:
+    """
+    Render a KMZ fully in memory and return the archive bytes.
+    """
+    buf = io.BytesIO()
+    stream_kmz(waypoints, buf, author, takeoff_ref_point, speed)
+    return buf.getvalue()
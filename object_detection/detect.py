@@ -0,0 +1,271 @@
+"""
+Streaming YOLO detection stage.
+
+    python detect.py runs/detect/train/weights/best.pt dataSetDrone/valid/images \\
+        --store detections --flight 2025-04-24 --subset valid --batch 8
+
+Replaces the ``model.predict(source=folder)`` cells of objectDetection.ipynb:
+
+* images are listed lazily and decoded by a thread pool one batch ahead of
+  the model, so inference never waits on JPEG decoding;
+* every result's boxes are converted as whole tensors (``xyxy``, ``cls``,
+  ``conf`` → NumPy), not box by box;
+* rows are buffered and appended to the detection store in chunks
+  (``object_detection/detection_store.py``), so memory stays flat;
+* a ``_progress.jsonl`` ledger next to the written parts records which
+  images every part covers – an interrupted run resumes where it stopped;
+* with ``--prefilter draft|thumbnail`` every batch first goes through a
+  cheap preview pass that drops frames without a usable pallet row
+  (``object_detection/prefilter.py``); rejected frames are recorded in
+  the ledger as soon as their batch is done.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+
+from detection_store import BOXES, DetectionStore
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+PROGRESS_FILE = "_progress.jsonl"
+PART_PREFIX = "detect-"
+
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_DECODE_WORKERS = 4
+DEFAULT_CHUNK_ROWS = 20_000
+
+
+def list_images(folder: str | Path) -> list[Path]:
+    """Image files of *folder*, sorted by name."""
+    return sorted(p for p in Path(folder).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def _decode(path: Path) -> np.ndarray:
+    import cv2                          # ships with ultralytics
+
+    img = cv2.imread(str(path))
+    if img is None:
+        raise ValueError(f"Cannot decode image {path}")
+    return img
+
+
+def iter_batches(paths: Sequence[Path],
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 decode_workers: int = DEFAULT_DECODE_WORKERS,
+                 decode: Callable[[Path], np.ndarray] = _decode) -> Iterator[tuple[list[Path], list[np.ndarray]]]:
+    """
+    Yield ``(paths, BGR images)`` batches; the next batch is already being
+    decoded while the caller works on the current one.
+
+    :param decode: Path → BGR image (default: full-resolution decode).
+    """
+    batches = [list(paths[i:i + batch_size]) for i in range(0, len(paths), batch_size)]
+    if not batches:
+        return
+    with ThreadPoolExecutor(max_workers=decode_workers) as pool:
+        def submit(batch: list[Path]) -> list[Future]:
+            return [pool.submit(decode, p) for p in batch]
+
+        pending = submit(batches[0])
+        for i, batch in enumerate(batches):
+            current = pending
+            if i + 1 < len(batches):
+                pending = submit(batches[i + 1])
+            yield batch, [f.result() for f in current]
+
+
+def results_to_frame(results, names: Sequence[str], class_names: dict[int, str]) -> pd.DataFrame:
+    """
+    Convert one batch of ultralytics results to a detection DataFrame.
+
+    Each result's boxes are moved to NumPy in three tensor copies.
+    """
+    frames = []
+    for name, res in zip(names, results):
+        boxes = res.boxes
+        n = len(boxes)
+        if n == 0:
+            continue
+        xyxy = boxes.xyxy.cpu().numpy().astype(np.float32, copy=False)
+        cls = boxes.cls.cpu().numpy().astype(np.int64)
+        frames.append(pd.DataFrame({
+            "image": np.repeat(name, n),
+            "class_id": cls,
+            "confidence": boxes.conf.cpu().numpy().astype(np.float32, copy=False),
+            "x1": xyxy[:, 0], "y1": xyxy[:, 1], "x2": xyxy[:, 2], "y2": xyxy[:, 3],
+        }))
+    if not frames:
+        return pd.DataFrame(columns=["image", "class", "confidence", "x1", "y1", "x2", "y2"])
+    df = pd.concat(frames, ignore_index=True)
+    lookup = np.array([class_names.get(i, str(i)) for i in range(max(class_names) + 1)], dtype=object)
+    df.insert(1, "class", lookup[df.pop("class_id").to_numpy()])
+    return df
+
+
+class _Ledger:
+    """
+    Append-only record of which images each written part covers; images
+    rejected by the prefilter are recorded with ``part: null``.
+    """
+
+    def __init__(self, folder: Path):
+        self.path = folder / PROGRESS_FILE
+        self.done: set[str] = set()
+        self.parts: set[str] = set()
+        if self.path.exists():
+            for line in self.path.read_text(encoding="utf-8").splitlines():
+                entry = json.loads(line)
+                if entry["part"] is not None:
+                    self.parts.add(entry["part"])
+                self.done.update(entry["images"])
+
+    def discard_orphans(self, folder: Path) -> None:
+        """Remove parts written by a crashed run but never recorded."""
+        for p in folder.glob(f"{PART_PREFIX}*.parquet"):
+            if p.stem not in self.parts:
+                logging.warning("Removing unrecorded part %s", p.name)
+                p.unlink()
+
+    def record(self, part: str | None, images: list[str]) -> None:
+        with self.path.open("a", encoding="utf-8") as fh:
+            fh.write(json.dumps({"part": part, "images": images}) + "\n")
+        if part is not None:
+            self.parts.add(part)
+        self.done.update(images)
+
+
+def run_detection(weights: str | Path,
+                  folder: str | Path,
+                  store_root: str | Path,
+                  flight: str,
+                  subset: str | None = None,
+                  batch_size: int = DEFAULT_BATCH_SIZE,
+                  decode_workers: int = DEFAULT_DECODE_WORKERS,
+                  chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                  conf: float = 0.25,
+                  imgsz: int = 1280,
+                  device: str | None = None,
+                  resume: bool = True,
+                  prefilter: str | None = None,
+                  prefilter_scale: int = 8) -> int:
+    """
+    Run YOLO over *folder* and append the boxes to the detection store.
+
+    :param weights:     YOLO weights file.
+    :param folder:      Image folder.
+    :param store_root:  Detection store root.
+    :param flight:      Flight id of the partition to write.
+    :param subset:      Subset of the partition (``train``/``valid``/``test``).
+    :param batch_size:  Images per ``predict`` call.
+    :param decode_workers: JPEG decoding threads.
+    :param chunk_rows:  Boxes buffered before a part is written.
+    :param conf:        Confidence threshold.
+    :param imgsz:       Inference size.
+    :param device:      e.g. ``"cpu"``, ``"cuda:0"``; ultralytics picks by default.
+    :param resume:      Skip images already recorded by an earlier run;
+                        otherwise the partition is cleared first.
+    :param prefilter:   ``"draft"`` or ``"thumbnail"``: run the model on a
+                        preview first and detect at full resolution only on
+                        frames with a usable pallet row (see prefilter.py).
+                        Runs per batch; rejected frames are recorded as
+                        done without boxes right after their batch.
+    :param prefilter_scale: Draft decode scale (2, 4 or 8), also used for
+                        photos without an EXIF thumbnail.
+    :returns:           Number of boxes written by this run.
+    """
+    from ultralytics import YOLO
+
+    store = DetectionStore(store_root)
+    part_dir = store.partition(flight, subset, BOXES)
+    part_dir.mkdir(parents=True, exist_ok=True)
+    if not resume:
+        for p in list(part_dir.glob(f"{PART_PREFIX}*.parquet")) + [part_dir / PROGRESS_FILE]:
+            p.unlink(missing_ok=True)
+    ledger = _Ledger(part_dir)
+    ledger.discard_orphans(part_dir)
+
+    paths = [p for p in list_images(folder) if p.name not in ledger.done]
+    logging.info("%d images to process (%d already done)", len(paths), len(ledger.done))
+
+    model = YOLO(str(weights))
+    class_names = dict(model.names)
+    buffer: list[pd.DataFrame] = []
+    buffered_rows = 0
+    buffered_images: list[str] = []
+    written = 0
+    part_no = len(ledger.parts)
+    t0 = time.perf_counter()
+    stages: Iterator[tuple[list[Path], list[Path]]] = iter([(paths, [])])
+    if prefilter is not None:
+        from prefilter import iter_prefiltered
+
+        stages = iter_prefiltered(model, paths, prefilter, prefilter_scale,
+                                  batch_size, decode_workers, device=device)
+
+    def flush() -> None:
+        nonlocal buffer, buffered_rows, buffered_images, written, part_no
+        if not buffered_images:
+            return
+        part = f"{PART_PREFIX}{part_no:06d}"
+        chunk = pd.concat(buffer, ignore_index=True) if buffer else results_to_frame([], [], class_names)
+        if len(chunk):
+            store.append(chunk, flight=flight, subset=subset, table=BOXES, part=part)
+        ledger.record(part, buffered_images)
+        written += len(chunk)
+        part_no += 1
+        buffer, buffered_rows, buffered_images = [], 0, []
+
+    n_images = 0
+    for passed, rejected in stages:
+        if rejected:
+            ledger.record(None, [p.name for p in rejected])
+            n_images += len(rejected)
+        for batch_paths, images in iter_batches(passed, batch_size, decode_workers):
+            results = model.predict(source=images, conf=conf, imgsz=imgsz, device=device, verbose=False)
+            names = [p.name for p in batch_paths]
+            df = results_to_frame(results, names, class_names)
+            if len(df):
+                buffer.append(df)
+                buffered_rows += len(df)
+            buffered_images.extend(names)
+            n_images += len(names)
+            if buffered_rows >= chunk_rows:
+                flush()
+    flush()
+
+    elapsed = time.perf_counter() - t0
+    logging.info("Detected %d boxes in %d images in %.1fs (%.2f images/sec)",
+                 written, n_images, elapsed, n_images / elapsed if elapsed else float("inf"))
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Stream YOLO detections into the detection store.")
+    parser.add_argument("weights")
+    parser.add_argument("folder")
+    parser.add_argument("--store", dest="store_root", required=True)
+    parser.add_argument("--flight", required=True)
+    parser.add_argument("--subset", default=None)
+    parser.add_argument("--batch", dest="batch_size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--decode-workers", type=int, default=DEFAULT_DECODE_WORKERS)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--imgsz", type=int, default=1280)
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--no-resume", dest="resume", action="store_false")
+    parser.add_argument("--prefilter", choices=["draft", "thumbnail"], default=None)
+    parser.add_argument("--prefilter-scale", type=int, choices=[2, 4, 8], default=8)
+    args = parser.parse_args()
+
+    boxes = run_detection(**vars(args))
+    print(f"Saved {boxes} detections to {args.store_root} (flight={args.flight})")
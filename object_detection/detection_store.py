@@ -0,0 +1,228 @@
+"""
+Columnar detection store (Parquet, hive-partitioned by flight / subset).
+
+Replaces the CSV hand-offs between the stages
+(``all_bounding_boxes.csv`` → ``combined_with_gps.csv`` → pose estimation):
+
+    <root>/<table>/flight=<flight>/subset=<subset>/part-*.parquet
+
+* ``image`` and ``class`` are dictionary-encoded (pandas ``category``),
+  box coordinates and confidence are ``float32``; camera GPS stays
+  ``float64`` (float32 would lose ~1 m in lat/lon).
+* ``image`` is normalised to the original photo name once, on write; the
+  raw export name is kept in ``source_image``.
+* Rows are sorted by ``class, image`` so ``class == 'pallets'`` filters
+  prune row groups; ``flight`` / ``subset`` filters prune whole folders.
+* Reads are memory-mapped (``pyarrow.parquet.read_table(memory_map=True)``).
+
+Tables used by the pipeline: :data:`BOXES` (detector output) and
+:data:`COMBINED` (boxes + camera GPS).
+"""
+from __future__ import annotations
+
+import os
+import shutil
+from pathlib import Path
+from typing import Iterable, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+BOXES = "boxes"
+COMBINED = "combined"
+
+PARTITION_COLS = ["flight", "subset"]
+DEFAULT_SUBSET = "all"
+#: Partition keys are always strings – inferred hive types would turn
+#: ``flight=2025`` into an int32 that no longer matches ``str(flight)``
+PARTITIONING = ds.partitioning(pa.schema([(col, pa.string()) for col in PARTITION_COLS]), flavor="hive")
+
+_DICT = pa.dictionary(pa.int32(), pa.string())
+
+#: Arrow type of every known column; unknown columns keep their inferred type.
+SCHEMA_TYPES: dict[str, pa.DataType] = {
+    "image": _DICT,
+    "source_image": pa.string(),
+    "class": _DICT,
+    "confidence": pa.float32(),
+    "x1": pa.float32(),
+    "y1": pa.float32(),
+    "x2": pa.float32(),
+    "y2": pa.float32(),
+    "latitude": pa.float64(),
+    "longitude": pa.float64(),
+    "altitude": pa.float64(),
+}
+
+
+def normalize_image_names(images: pd.Series) -> pd.Series:
+    """
+    Map Roboflow export names back to the original photo name, vectorised.
+
+    ``DJI_..._V_jpeg.rf.<hash>.jpg`` → ``DJI_..._V.jpeg``; names that are
+    already original photo names are returned unchanged.
+    """
+    images = images.astype(str)
+    exported = images.str.contains(".rf", regex=False) | images.str.contains("_jpeg", regex=False)
+    fixed = images.str.split(".rf", n=1).str[0].str.replace("_jpeg", "", regex=False) + ".jpeg"
+    return fixed.where(exported, images)
+
+
+def _with_image_names(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of *df* with normalised ``image`` and the raw ``source_image``."""
+    df = df.copy()
+    if "source_image" not in df.columns:
+        df["source_image"] = df["image"].astype(str)
+    df["image"] = normalize_image_names(df["source_image"])
+    return df
+
+
+def _to_arrow(df: pd.DataFrame) -> pa.Table:
+    """Cast known columns to the store schema."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    fields = [
+        pa.field(name, SCHEMA_TYPES.get(name, table.schema.field(name).type))
+        for name in table.column_names
+    ]
+    return table.cast(pa.schema(fields))
+
+
+class DetectionStore:
+    """
+    Typed, partitioned detection tables under one root folder.
+
+    :param root: Store folder (created on first write).
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def path(self, table: str = BOXES) -> Path:
+        return self.root / table
+
+    def write(self,
+              df: pd.DataFrame,
+              flight: str,
+              subset: str | None = None,
+              table: str = BOXES) -> None:
+        """
+        Replace the data of *flight* in *table* with *df*.
+
+        With an explicit *subset* only that partition is replaced.  With
+        ``subset=None`` the whole flight is replaced; rows are partitioned by
+        *df*'s ``subset`` column if it has one, else go to
+        :data:`DEFAULT_SUBSET`.
+
+        :param df:     Detections; must contain ``image``.
+        :param flight: Flight / survey id.
+        :param subset: e.g. ``train`` / ``valid`` / ``test``.
+        :param table:  :data:`BOXES`, :data:`COMBINED` or any other name.
+        """
+        df = _with_image_names(df)
+        if subset is not None or "subset" not in df.columns:
+            df["subset"] = subset or DEFAULT_SUBSET
+        df["flight"] = str(flight)
+        if subset is None:
+            shutil.rmtree(self.path(table) / f"flight={flight}", ignore_errors=True)
+        sort_cols = [c for c in ("class", "image") if c in df.columns]
+        df = df.sort_values(sort_cols, kind="stable")
+
+        pq.write_to_dataset(
+            _to_arrow(df),
+            root_path=str(self.path(table)),
+            partition_cols=PARTITION_COLS,
+            existing_data_behavior="delete_matching",
+            basename_template="part-{i}.parquet",
+        )
+
+    def partition(self, flight: str, subset: str | None = None, table: str = BOXES) -> Path:
+        """Folder holding one flight / subset partition of *table*."""
+        return self.path(table) / f"flight={flight}" / f"subset={subset or DEFAULT_SUBSET}"
+
+    def append(self, df: pd.DataFrame, flight: str, subset: str | None = None,
+               table: str = BOXES, part: str | None = None) -> Path:
+        """
+        Add *df* as one more file to a partition without touching existing ones
+        (used by streaming writers).  The file appears atomically.
+
+        :param part: File stem; defaults to a counter.
+        :returns:    Path of the written file.
+        """
+        df = _with_image_names(df)
+        folder = self.partition(flight, subset, table)
+        folder.mkdir(parents=True, exist_ok=True)
+        if part is None:
+            part = f"part-{len(list(folder.glob('*.parquet'))):06d}"
+        out = folder / f"{part}.parquet"
+        tmp = folder / f".{part}.parquet.tmp"
+        pq.write_table(_to_arrow(df.drop(columns=PARTITION_COLS, errors="ignore")), tmp)
+        os.replace(tmp, out)
+        return out
+
+    def read(self,
+             flight: str | None = None,
+             subset: str | Sequence[str] | None = None,
+             classes: str | Iterable[str] | None = None,
+             columns: Sequence[str] | None = None,
+             table: str = BOXES) -> pd.DataFrame:
+        """
+        Memory-mapped, filtered read of *table*.
+
+        Partition filters (*flight*, *subset*) skip whole folders; the
+        *classes* filter is pushed down to Parquet row groups.
+
+        :returns: DataFrame with ``category`` ``image``/``class`` columns.
+        """
+        filters = []
+        if flight is not None:
+            filters.append(("flight", "=", str(flight)))
+        if subset is not None:
+            filters.append(("subset", "in", [subset] if isinstance(subset, str) else list(subset)))
+        if classes is not None:
+            filters.append(("class", "in", [classes] if isinstance(classes, str) else list(classes)))
+
+        path = self.path(table)
+        if not any(path.rglob("*.parquet")):
+            raise FileNotFoundError(f"No '{table}' table in detection store {self.root}")
+        arrow = pq.read_table(
+            path,
+            columns=list(columns) if columns is not None else None,
+            filters=filters or None,
+            memory_map=True,
+            partitioning=PARTITIONING,
+        )
+        return arrow.to_pandas()
+
+    def flights(self, table: str = BOXES) -> list[str]:
+        """Flight ids present in *table*."""
+        return sorted(p.name.split("=", 1)[1] for p in self.path(table).glob("flight=*"))
+
+
+def import_csv(store: DetectionStore, csv_path: str | Path, flight: str,
+               table: str = BOXES, subset: str | None = None) -> int:
+    """
+    Load one of the legacy CSVs (``all_bounding_boxes.csv``,
+    ``test_boundingBox.csv``, ``combined_with_gps.csv``) into *store*.
+
+    :returns: Number of rows written.
+    """
+    df = pd.read_csv(csv_path)
+    store.write(df, flight=flight, subset=subset, table=table)
+    return len(df)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import a detection CSV into the Parquet store.")
+    parser.add_argument("csv_path")
+    parser.add_argument("store_root")
+    parser.add_argument("--flight", required=True)
+    parser.add_argument("--subset", default=None)
+    parser.add_argument("--table", default=BOXES, choices=[BOXES, COMBINED])
+    args = parser.parse_args()
+
+    rows = import_csv(DetectionStore(args.store_root), args.csv_path, args.flight, args.table, args.subset)
+    print(f"Imported {rows} rows into {args.store_root}/{args.table} (flight={args.flight})")
@@ -0,0 +1,149 @@
+"""
+Cheap first pass ahead of full-resolution detection.
+
+Only frames that show a usable pallet row survive ``rank_pallet_points``
+(see ``pose_estimation/pallet_ranks.py``), yet every 4032×3024 frame is
+decoded and run through YOLO at ``imgsz=1280``.  The prefilter runs the
+same model on a small preview of every frame and forwards only frames
+that could pass the row test:
+
+* ``"draft"``     – libjpeg DCT-domain downscaling while decoding
+  (``cv2.IMREAD_REDUCED_COLOR_<scale>``, the OpenCV equivalent of PIL's
+  ``Image.draft``).  The default 1/8 scale gives a 504×378 preview,
+  inferred at ``imgsz=512`` – about 1/6 of the pixels of the full pass.
+* ``"thumbnail"`` – the JPEG thumbnail embedded in the EXIF header
+  (typically 160×120, see ``kmz_file_generation/gps_exif.py``); falls back
+  to ``"draft"`` when a photo has none.
+
+A frame passes when the preview shows at least :data:`MIN_ROW_PALLETS`
+pallets whose ``(x1, y1)`` line is within ``MAX_LINE_ANGLE_DEG +
+ANGLE_SLACK_DEG`` of horizontal.  The barcode-visibility test is left to
+the full pass: barcodes are ~35 px wide at full resolution and mostly
+vanish in a preview.  ``benchmarks/bench_prefilter.py`` reports the
+throughput gain and the recall lost on the existing detection CSVs.
+"""
+from __future__ import annotations
+
+import logging
+import sys
+import time
+from functools import partial
+from pathlib import Path
+from typing import Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+
+from detect import DEFAULT_BATCH_SIZE, DEFAULT_DECODE_WORKERS, iter_batches, results_to_frame
+
+_REPO = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(_REPO / "kmz_file_generation"))
+sys.path.insert(0, str(_REPO / "pose_estimation"))
+from gps_exif import read_thumbnail  # noqa: E402
+from pallet_ranks import MAX_LINE_ANGLE_DEG, line_angles_to_horizontal  # noqa: E402
+
+SOURCES = ("draft", "thumbnail")
+#: DCT scaling factors libjpeg can decode at
+DRAFT_SCALES = (2, 4, 8)
+DEFAULT_SCALE = 8
+#: Previews are never inferred at a larger size than the full pass
+MAX_PREVIEW_IMGSZ = 1280
+
+MIN_ROW_PALLETS = 2
+#: Preview boxes are coarse – allow a steeper row than the full pass does
+ANGLE_SLACK_DEG = 10.0
+#: Low threshold: a missed frame is lost, a false alarm only costs one full pass
+PREFILTER_CONF = 0.1
+
+
+def decode_draft(path: Path, scale: int = DEFAULT_SCALE) -> np.ndarray:
+    """BGR image decoded at 1/*scale* resolution."""
+    import cv2
+
+    if scale not in DRAFT_SCALES:
+        raise ValueError(f"scale must be one of {DRAFT_SCALES}, got {scale}")
+    img = cv2.imread(str(path), getattr(cv2, f"IMREAD_REDUCED_COLOR_{scale}"))
+    if img is None:
+        raise ValueError(f"Cannot decode image {path}")
+    return img
+
+
+def decode_thumbnail(path: Path, fallback_scale: int = DEFAULT_SCALE) -> np.ndarray:
+    """BGR EXIF thumbnail, or a 1/*fallback_scale* draft decode without one."""
+    import cv2
+
+    thumb = read_thumbnail(path)
+    if thumb is not None:
+        img = cv2.imdecode(np.frombuffer(thumb, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is not None:
+            return img
+    return decode_draft(path, fallback_scale)
+
+
+def preview_decoder(source: str = "draft", scale: int = DEFAULT_SCALE):
+    """Path → BGR preview function for :func:`detect.iter_batches`."""
+    if source == "draft":
+        return partial(decode_draft, scale=scale)
+    if source == "thumbnail":
+        return partial(decode_thumbnail, fallback_scale=scale)
+    raise ValueError(f"source must be one of {SOURCES}, got {source!r}")
+
+
+def select_frames(boxes: pd.DataFrame,
+                  min_pallets: int = MIN_ROW_PALLETS,
+                  max_angle_deg: float = MAX_LINE_ANGLE_DEG + ANGLE_SLACK_DEG) -> set[str]:
+    """
+    Images whose preview detections show a usable pallet row.
+
+    The test is scale-free (a box count and a line angle), so *boxes* may be
+    in preview or full-resolution pixels.
+
+    :param boxes: Rows ``image, class, x1, y1, x2, y2``.
+    :returns: Names of the images that pass.
+    """
+    pal = boxes[boxes["class"] == "pallets"]
+    if pal.empty:
+        return set()
+    codes, images = pd.factorize(pal["image"].astype(str))
+    counts = np.bincount(codes, minlength=len(images))
+    angles = line_angles_to_horizontal(codes, pal["x1"].to_numpy(dtype=float),
+                                       pal["y1"].to_numpy(dtype=float), len(images))
+    with np.errstate(invalid="ignore"):
+        ok = (counts >= min_pallets) & (angles < max_angle_deg)
+    return set(images[ok])
+
+
+def iter_prefiltered(model,
+                     paths: Sequence[Path],
+                     source: str = "draft",
+                     scale: int = DEFAULT_SCALE,
+                     batch_size: int = DEFAULT_BATCH_SIZE,
+                     decode_workers: int = DEFAULT_DECODE_WORKERS,
+                     conf: float = PREFILTER_CONF,
+                     device: str | None = None) -> Iterator[tuple[list[Path], list[Path]]]:
+    """
+    Run *model* on previews of *paths* one batch at a time and split every
+    batch by :func:`select_frames`.
+
+    Only the current batch's preview boxes are held.  The inference size is
+    the preview's longer side rounded up to the model stride (at most
+    :data:`MAX_PREVIEW_IMGSZ`), so previews are not upscaled again.
+
+    :returns: Iterator of ``(passed, rejected)`` paths per batch, each in
+              input order.
+    """
+    decode = preview_decoder(source, scale)
+    class_names = dict(model.names)
+    n_seen = n_passed = 0
+    t0 = time.perf_counter()
+    for batch_paths, images in iter_batches(paths, batch_size, decode_workers, decode=decode):
+        imgsz = min(MAX_PREVIEW_IMGSZ, 32 * -(-max(max(img.shape[:2]) for img in images) // 32))
+        results = model.predict(source=images, conf=conf, imgsz=imgsz, device=device, verbose=False)
+        keep = select_frames(results_to_frame(results, [p.name for p in batch_paths], class_names))
+        passed = [p for p in batch_paths if p.name in keep]
+        n_seen += len(batch_paths)
+        n_passed += len(passed)
+        yield passed, [p for p in batch_paths if p.name not in keep]
+    elapsed = time.perf_counter() - t0
+    logging.info("Prefilter (%s) passed %d of %d images in %.1fs (%.1f images/sec, incl. full pass)",
+                 source, n_passed, n_seen, elapsed, n_seen / elapsed if elapsed else float("inf"))
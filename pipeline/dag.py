@@ -0,0 +1,186 @@
+"""
+Minimal DAG runner on top of :class:`stage_cache.StageCache`.
+
+    pipeline = Pipeline(StageCache(".pipeline_cache"))
+    pipeline.add(Stage("boxes", load_boxes, inputs={"csv": fingerprint_path(csv)}))
+    pipeline.add(Stage("ranked", rank, deps=("boxes",), params={"barcode_vis_thresh": 0.7}))
+    result = pipeline.run(["ranked"])
+
+A stage is ``fn(*upstream outputs, **params)``.  Its cache key is computed
+from its name, parameters, external input fingerprints and the *keys* of
+its upstream stages (:func:`stage_cache.stage_key`), so all keys are known
+before anything runs.  Evaluation is demand-driven from the targets: a
+stage whose output is cached is loaded and its upstream stages are never
+touched, so changing only a downstream parameter reruns only the stages
+below it.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Sequence
+
+from stage_cache import StageCache, stage_key
+
+#: :attr:`StageRecord.status` values
+HIT, RUN = "hit", "run"
+
+
+@dataclass
+class Stage:
+    """
+    One node of the pipeline.
+
+    :param name:    Unique stage name.
+    :param fn:      ``fn(*dep_outputs, **params)`` → output.
+    :param deps:    Upstream stage names, in the order *fn* receives them.
+    :param params:  Keyword arguments of *fn*; all of them are hashed.
+    :param inputs:  ``{name: fingerprint}`` of external inputs *fn* reads
+                    (files, folders) – see :func:`stage_cache.fingerprint_path`.
+    :param cache:   Store the output.  Cheap sinks (e.g. writing the KMZ)
+                    set this to ``False`` and always run.
+    :param version: Bump after a change to *fn* to invalidate old outputs.
+    """
+    name: str
+    fn: Callable[..., Any]
+    deps: tuple[str, ...] = ()
+    params: dict[str, Any] = field(default_factory=dict)
+    inputs: dict[str, str] = field(default_factory=dict)
+    cache: bool = True
+    version: str = "1"
+
+
+@dataclass
+class StageRecord:
+    """
+    What happened to one stage during :meth:`Pipeline.run`.
+
+    :param stage:   Stage name.
+    :param key:     Cache key.
+    :param status:  :data:`HIT` (loaded from the cache) or :data:`RUN`.
+    :param seconds: Load or compute time.
+    """
+    stage: str
+    key: str
+    status: str
+    seconds: float
+
+
+@dataclass
+class PipelineRun:
+    """
+    Result of :meth:`Pipeline.run`.
+
+    :param outputs: ``{stage: output}`` of every stage that was evaluated.
+    :param records: One :class:`StageRecord` per evaluated stage, in
+                    evaluation order; stages skipped thanks to a cached
+                    downstream output are absent.
+    """
+    outputs: dict[str, Any]
+    records: list[StageRecord]
+
+    def summary(self) -> str:
+        return "\n".join(f"{r.stage:<12} {r.status:<4} {r.seconds:8.2f}s  {r.key[:12]}" for r in self.records)
+
+
+class Pipeline:
+    """
+    Stages in a DAG, evaluated lazily with cached outputs.
+
+    :param cache: Output cache; ``None`` runs every stage every time.
+    """
+
+    def __init__(self, cache: StageCache | None = None, stages: Sequence[Stage] = ()):
+        self.cache = cache
+        self.stages: dict[str, Stage] = {}
+        for stage in stages:
+            self.add(stage)
+
+    def add(self, stage: Stage) -> Stage:
+        if stage.name in self.stages:
+            raise ValueError(f"Duplicate stage {stage.name!r}")
+        self.stages[stage.name] = stage
+        return stage
+
+    def order(self) -> list[str]:
+        """
+        Stage names in topological order.
+
+        :raises ValueError: on an unknown dependency or a cycle.
+        """
+        for stage in self.stages.values():
+            missing = [d for d in stage.deps if d not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name!r} depends on unknown stage(s) {missing}")
+        indegree = {name: len(stage.deps) for name, stage in self.stages.items()}
+        ready = [name for name, n in indegree.items() if n == 0]
+        order = []
+        while ready:
+            name = ready.pop(0)
+            order.append(name)
+            for other in self.stages.values():
+                if name in other.deps:
+                    indegree[other.name] -= other.deps.count(name)
+                    if indegree[other.name] == 0:
+                        ready.append(other.name)
+        if len(order) != len(self.stages):
+            raise ValueError(f"Cycle between stages {sorted(set(self.stages) - set(order))}")
+        return order
+
+    def keys(self) -> dict[str, str]:
+        """``{stage: cache key}`` for every stage."""
+        keys: dict[str, str] = {}
+        for name in self.order():
+            stage = self.stages[name]
+            keys[name] = stage_key(name, stage.params, stage.inputs,
+                                   {d: keys[d] for d in stage.deps}, stage.version)
+        return keys
+
+    def run(self, targets: Sequence[str] | None = None) -> PipelineRun:
+        """
+        Evaluate *targets* (default: every stage without dependants).
+
+        Cached outputs are loaded instead of recomputed; new outputs are
+        stored and the cache is trimmed to its size bound afterwards.
+        """
+        keys = self.keys()
+        if targets is None:
+            used = {d for stage in self.stages.values() for d in stage.deps}
+            targets = [name for name in self.stages if name not in used]
+        outputs: dict[str, Any] = {}
+        records: list[StageRecord] = []
+
+        def evaluate(name: str) -> Any:
+            if name in outputs:
+                return outputs[name]
+            stage, key = self.stages[name], keys[name]
+            if stage.cache and self.cache is not None and key in self.cache:
+                t0 = time.perf_counter()
+                value = self.cache.get(key)
+                records.append(StageRecord(name, key, HIT, time.perf_counter() - t0))
+                logging.info("Stage %s: cached (%s)", name, key[:12])
+            else:
+                args = [evaluate(d) for d in stage.deps]
+                t0 = time.perf_counter()
+                value = stage.fn(*args, **stage.params)
+                elapsed = time.perf_counter() - t0
+                records.append(StageRecord(name, key, RUN, elapsed))
+                logging.info("Stage %s: ran in %.2fs (%s)", name, elapsed, key[:12])
+                if stage.cache and self.cache is not None:
+                    self.cache.put(key, value, {"stage": name, "params": stage.params,
+                                                "inputs": stage.inputs, "seconds": elapsed})
+            outputs[name] = value
+            return value
+
+        for name in targets:
+            evaluate(name)
+        if self.cache is not None:
+            self.cache.evict(keep=[keys[r.stage] for r in records])
+        return PipelineRun(outputs=outputs, records=records)
+
+    def describe(self) -> str:
+        """One line per stage: name, dependencies and key prefix."""
+        keys = self.keys()
+        return "\n".join(f"{name:<12} <- {', '.join(self.stages[name].deps) or '-':<24} {keys[name][:12]}"
+                         for name in self.order())
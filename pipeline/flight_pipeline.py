@@ -0,0 +1,393 @@
+"""
+End-to-end flight pipeline with cached stages.
+
+    python pipeline/flight_pipeline.py --photos flight/DJI --boxes all_bounding_boxes.csv \\
+        --output output_kmz/flight.kmz --back 10 --up 4 --speed 8
+
+Stages (see :mod:`dag`)::
+
+    boxes ─► camera ─► ranked ─► triangulated ─► pallets ─► hover ─► [route] ─► [simplify] ─► [validate] ─► kmz
+                  └──────────── (--pose mono) ────────────┘
+
+=============  ==========================================  =====================================
+stage          does                                        hashed
+=============  ==========================================  =====================================
+boxes          YOLO (``--weights``) or ``--boxes`` CSV     weights + image bytes, conf, imgsz,
+                                                           prefilter / CSV bytes
+camera         camera GPS join (:mod:`camera_position`)    image bytes
+ranked         :func:`pallet_ranks.rank_pallet_points`     ``barcode_vis_thresh``, image size
+triangulated   :class:`triangulation.Triangulator`         :class:`CameraIntrinsics`, camera
+                                                           heading / pitch
+pallets        :func:`pallet_merge.merge_pallets`          merge radius
+               (``--pose mono``: :func:`ground_projection   + intrinsics, heading / pitch,
+                                                           plane, refine
+               .locate_pallets` straight from ``camera``)
+hover          hover point per pallet                      BACK / UP distances
+route          :func:`route.plan_route` (optional)         take-off point
+simplify       :func:`simplify.simplify_path` (optional;   tolerance, max leg
+               mid-row hover targets are flown through)
+validate       :func:`geofence.validate_mission` of the    (never cached)
+               mission + ``pallets`` (``--geofence``)
+kmz            :func:`writer.build_kmz` (never cached)     author, take-off point, speed
+=============  ==========================================  =====================================
+
+``--combined combined_with_gps.csv`` replaces the first two stages.  Paths
+are not hashed – only file contents are – so a moved photo folder or
+output path still hits the cache.  When only the mission parameters
+(author, take-off point, speed) change, every stage up to ``hover`` is a
+cache hit and only the KMZ is rewritten.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import sys
+import tempfile
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+_REPO = Path(__file__).resolve().parents[1]
+for _folder in ("pose_estimation", "kmz_file_generation", "object_detection"):
+    sys.path.insert(0, str(_REPO / _folder))
+
+from camera_position import join_camera_positions  # noqa: E402
+from config import AUTHOR, SPEED, TAKEOFF_REF_POINT, configure_logging  # noqa: E402
+from dag import Pipeline, PipelineRun, Stage  # noqa: E402
+from detect import IMAGE_SUFFIXES  # noqa: E402
+from final_navigation.geodesy import enu_to_geodetic, geodetic_to_enu  # noqa: E402
+from final_navigation.geometry import BACK_DISTANCE_METRES, UP_DISTANCE_METRES  # noqa: E402
+from geofence import Geofence, validate_mission  # noqa: E402
+from ground_projection import CAPTURE_HEIGHT_M, CAPTURE_PITCH_DEG, GroundProjector, locate_pallets  # noqa: E402
+from pallet_merge import MERGE_RADIUS_M, merge_pallets  # noqa: E402
+from pallet_ranks import rank_pallet_points  # noqa: E402
+from route import plan_route  # noqa: E402
+from simplify import SIMPLIFY_TOLERANCE_M, simplify_path  # noqa: E402
+from stage_cache import HASH_DB_NAME, DEFAULT_MAX_BYTES, FileHashMemo, StageCache, fingerprint_path  # noqa: E402
+from triangulation import NADIR_ROTATION, CameraIntrinsics, Triangulator, camera_rotation  # noqa: E402
+from writer import WaypointArray, build_kmz  # noqa: E402
+
+DEFAULT_CACHE_DIR = _REPO / ".pipeline_cache"
+GPS_CACHE_NAME = "gps.sqlite"
+
+POSES = ("triangulate", "mono")
+
+HOVER_COLUMNS = ["rank", "latitude", "longitude", "altitude", "heading", "pitch"]
+
+
+# ---------------------------------------------------------------------- #
+#  Stage functions                                                        #
+# ---------------------------------------------------------------------- #
+def detect_boxes(weights: Path, photo_dir: Path, conf: float, imgsz: int,
+                 prefilter: str | None = None, device: str | None = None) -> pd.DataFrame:
+    """
+    Run YOLO over *photo_dir* into a scratch detection store and return the
+    boxes; *prefilter* is passed to :func:`detect.run_detection`.
+    """
+    from detect import run_detection
+    from detection_store import DetectionStore
+
+    with tempfile.TemporaryDirectory() as store_root:
+        run_detection(weights, photo_dir, store_root, flight="pipeline",
+                      conf=conf, imgsz=imgsz, device=device, resume=False, prefilter=prefilter)
+        boxes = DetectionStore(store_root).read("pipeline")
+    return boxes.drop(columns=["flight", "subset"], errors="ignore")
+
+
+def triangulate(ranked: pd.DataFrame, intrinsics: CameraIntrinsics, heading: float | None,
+                pitch: float) -> pd.DataFrame:
+    """Triangulated ranks; nadir views unless the camera *heading* is known."""
+    rotation = NADIR_ROTATION if heading is None else camera_rotation(heading, pitch)
+    return Triangulator(intrinsics, rotation).triangulate(ranked)
+
+
+def project_pallets(camera: pd.DataFrame, intrinsics: CameraIntrinsics, heading: float, pitch: float,
+                    plane_alt: float | None, camera_height: float, radius: float, refine: bool) -> pd.DataFrame:
+    projector = GroundProjector(intrinsics, heading, pitch, plane_alt=plane_alt, camera_height=camera_height)
+    return locate_pallets(camera, projector, radius, refine)
+
+
+def hover_waypoints(pallets: pd.DataFrame, back: float, up: float) -> pd.DataFrame:
+    """
+    One hover waypoint per merged pallet, facing the pallet row.
+
+    The row direction is the principal horizontal axis of all pallets (one
+    SVD in a local ENU frame); every pallet is approached along the row's
+    horizontal normal – flipped to the South like
+    :func:`final_navigation.geometry.fit_plane_normals` – *back* metres off
+    the row and *up* metres above the pallet.  The aircraft heads towards
+    the row and the gimbal pitches down at the pallet.
+
+    :param pallets: ``rank, lat, lon, alt`` rows (:func:`pallet_merge.merge_pallets`).
+    :returns: DataFrame ``rank, latitude, longitude, altitude, heading, pitch``.
+    """
+    if pallets.empty:
+        return pd.DataFrame(columns=HOVER_COLUMNS)
+    geo = pallets[["lat", "lon", "alt"]].to_numpy(dtype=float)
+    origin = geo.mean(axis=0)
+    enu = geodetic_to_enu(geo, origin)
+
+    direction = np.array([1.0, 0.0])
+    if len(enu) >= 2:
+        _, _, vt = np.linalg.svd(enu[:, :2] - enu[:, :2].mean(axis=0))
+        direction = vt[0]
+    normal = np.array([-direction[1], direction[0], 0.0])
+    if normal[1] > 0:
+        normal *= -1
+
+    target = enu - back * normal
+    target[:, 2] += up
+    out_geo = enu_to_geodetic(target, origin)
+    return pd.DataFrame({
+        "rank": pallets["rank"].to_numpy(),
+        "latitude": out_geo[:, 0],
+        "longitude": out_geo[:, 1],
+        "altitude": out_geo[:, 2],
+        "heading": math.degrees(math.atan2(normal[0], normal[1])),
+        "pitch": -math.degrees(math.atan2(up, back)),
+    })
+
+
+def order_route(hover: pd.DataFrame, takeoff_ref_point: str) -> pd.DataFrame:
+    """Hover waypoints in :func:`route.plan_route` order."""
+    route = plan_route(WaypointArray.from_frame(hover), takeoff_ref_point)
+    return hover.iloc[route.order].reset_index(drop=True)
+
+
+def simplify_mission(mission: pd.DataFrame, tolerance: float, max_leg: float | None) -> pd.DataFrame:
+    """
+    *mission* after :func:`simplify.simplify_path`, with a ``stop`` column;
+    waypoints inserted on long legs get no ``rank``.
+
+    Every hover target is a capture stop and stays in the mission; targets
+    in the middle of a straight run become fly-through waypoints, the same
+    rule as ``simplify.py`` on a KMZ.
+    """
+    path = simplify_path(WaypointArray.from_frame(mission), tolerance, max_leg)
+    frame = path.waypoints.to_frame()
+    rank = mission["rank"].to_numpy(dtype=float)[path.source] if len(mission) else np.empty(0)
+    frame.insert(0, "rank", np.where(path.inserted, np.nan, rank))
+    return frame
+
+
+def check_geofence(mission: pd.DataFrame, pallets: pd.DataFrame, fence: Geofence,
+                   takeoff_ref_point: str) -> pd.DataFrame:
+    """
+    Pass *mission* through unchanged if it satisfies *fence*, clearance to
+    the located pallets included.
+
+    :raises geofence.GeofenceError: on any violation.
+    """
+    report = validate_mission(WaypointArray.from_frame(mission), fence, takeoff_ref_point,
+                              pallets=pallets[["lat", "lon", "alt"]].to_numpy(dtype=float))
+    report.raise_for_violations()
+    logging.info(report.summary())
+    return mission
+
+
+def write_kmz(hover: pd.DataFrame, output: Path, author: str, takeoff_ref_point: str, speed: float) -> Path:
+    return build_kmz(WaypointArray.from_frame(hover), output=output, author=author,
+                     takeoff_ref_point=takeoff_ref_point, speed=speed)
+
+
+# ---------------------------------------------------------------------- #
+#  Pipeline                                                               #
+# ---------------------------------------------------------------------- #
+def build_flight_pipeline(output: str | Path,
+                          cache: StageCache | None,
+                          photo_dir: str | Path | None = None,
+                          boxes_csv: str | Path | None = None,
+                          combined_csv: str | Path | None = None,
+                          weights: str | Path | None = None,
+                          conf: float = 0.25,
+                          imgsz: int = 1280,
+                          device: str | None = None,
+                          prefilter: str | None = None,
+                          barcode_vis_thresh: float = 0.7,
+                          intrinsics: CameraIntrinsics = CameraIntrinsics(),
+                          merge_radius: float = MERGE_RADIUS_M,
+                          pose: str = "triangulate",
+                          camera_heading: float | None = None,
+                          camera_pitch: float = CAPTURE_PITCH_DEG,
+                          plane_alt: float | None = None,
+                          camera_height: float = CAPTURE_HEIGHT_M,
+                          refine: bool = False,
+                          back: float = BACK_DISTANCE_METRES,
+                          up: float = UP_DISTANCE_METRES,
+                          author: str = AUTHOR,
+                          takeoff_ref_point: str = TAKEOFF_REF_POINT,
+                          speed: float = SPEED,
+                          optimize_route: bool = False,
+                          simplify: float | None = None,
+                          max_leg: float | None = None,
+                          geofence: Geofence | None = None) -> Pipeline:
+    """
+    Assemble the stages for one flight.
+
+    The detections come from exactly one of *combined_csv* (boxes with
+    camera GPS), *boxes_csv* or *weights* (YOLO); the latter two need
+    *photo_dir* for the camera GPS.
+
+    :param output: KMZ to write.
+    :param cache: Stage output cache (``None`` disables caching).
+    :param pose: ``"triangulate"`` (rank matching + multi-view) or ``"mono"``
+                 (single-view ground projection, see :mod:`ground_projection`;
+                 *plane_alt*, *camera_height* and *refine* apply to it).
+    :param camera_heading: Heading (deg) the photos were taken at – required
+                 for ``"mono"``; without it triangulation assumes nadir views.
+    :param camera_pitch: Gimbal pitch (deg) of the photos, with *camera_heading*.
+    :param simplify: Fly through the hover targets of straight runs instead
+                     of stopping, with this tolerance (m), see
+                     :mod:`simplify`; *max_leg* (m) also splits longer
+                     legs.  No hover target is dropped.
+    :param geofence: Validate the mission against it before the KMZ is
+                     written (see :mod:`geofence`).
+    :returns: :class:`dag.Pipeline` whose sink stage is ``kmz``.
+    """
+    if sum(x is not None for x in (combined_csv, boxes_csv, weights)) != 1:
+        raise ValueError("Pass exactly one of combined_csv, boxes_csv or weights")
+    if combined_csv is None and photo_dir is None:
+        raise ValueError("photo_dir is required to join camera GPS")
+    if pose not in POSES:
+        raise ValueError(f"pose must be one of {POSES}, got {pose!r}")
+    if pose == "mono" and camera_heading is None:
+        raise ValueError("pose='mono' needs the camera_heading the photos were taken at")
+    attitude = {"heading": None if camera_heading is None else float(camera_heading),
+                "pitch": float(camera_pitch)}
+
+    memo = FileHashMemo(cache.root / HASH_DB_NAME) if cache is not None else None
+    try:
+        fingerprint = partial(fingerprint_path, memo=memo)
+        pipeline = Pipeline(cache)
+        if combined_csv is not None:
+            pipeline.add(Stage("camera", partial(pd.read_csv, combined_csv),
+                               inputs={"combined_csv": fingerprint(combined_csv)}))
+        else:
+            images = fingerprint(photo_dir, suffixes=IMAGE_SUFFIXES)
+            if weights is not None:
+                pipeline.add(Stage("boxes", partial(detect_boxes, Path(weights), Path(photo_dir), device=device),
+                                   params={"conf": float(conf), "imgsz": int(imgsz), "prefilter": prefilter},
+                                   inputs={"weights": fingerprint(weights), "images": images}))
+            else:
+                pipeline.add(Stage("boxes", partial(pd.read_csv, boxes_csv),
+                                   inputs={"boxes_csv": fingerprint(boxes_csv)}))
+            gps_cache = cache.root / GPS_CACHE_NAME if cache is not None else None
+            pipeline.add(Stage("camera", partial(join_camera_positions, photo_dir=photo_dir, cache_path=gps_cache),
+                               deps=("boxes",), inputs={"images": images}))
+    finally:
+        if memo is not None:
+            memo.close()
+
+    if pose == "mono":
+        pipeline.add(Stage("pallets", project_pallets, deps=("camera",),
+                           params={"intrinsics": intrinsics, **attitude,
+                                   "plane_alt": None if plane_alt is None else float(plane_alt),
+                                   "camera_height": float(camera_height),
+                                   "radius": float(merge_radius), "refine": bool(refine)}))
+    else:
+        pipeline.add(Stage("ranked", rank_pallet_points, deps=("camera",),
+                           params={"image_width_px": int(intrinsics.image_width_px),
+                                   "image_height_px": int(intrinsics.image_height_px),
+                                   "barcode_vis_thresh": float(barcode_vis_thresh)}))
+        pipeline.add(Stage("triangulated", triangulate, deps=("ranked",),
+                           params={"intrinsics": intrinsics, **attitude}))
+        pipeline.add(Stage("pallets", merge_pallets, deps=("triangulated",),
+                           params={"radius": float(merge_radius)}))
+    pipeline.add(Stage("hover", hover_waypoints, deps=("pallets",),
+                       params={"back": float(back), "up": float(up)}))
+    mission = "hover"
+    if optimize_route:
+        pipeline.add(Stage("route", order_route, deps=("hover",),
+                           params={"takeoff_ref_point": takeoff_ref_point}))
+        mission = "route"
+    if simplify is not None or max_leg is not None:
+        pipeline.add(Stage("simplify", simplify_mission, deps=(mission,),
+                           params={"tolerance": float(SIMPLIFY_TOLERANCE_M if simplify is None else simplify),
+                                   "max_leg": None if max_leg is None else float(max_leg)}))
+        mission = "simplify"
+    if geofence is not None:
+        pipeline.add(Stage("validate", check_geofence, deps=(mission, "pallets"), cache=False,
+                           params={"fence": geofence, "takeoff_ref_point": takeoff_ref_point}))
+        mission = "validate"
+    pipeline.add(Stage("kmz", partial(write_kmz, output=Path(output)), deps=(mission,), cache=False,
+                       params={"author": author, "takeoff_ref_point": takeoff_ref_point, "speed": float(speed)}))
+    return pipeline
+
+
+def run_flight(output: str | Path,
+               cache_dir: str | Path | None = DEFAULT_CACHE_DIR,
+               max_cache_bytes: int = DEFAULT_MAX_BYTES,
+               **kwargs) -> PipelineRun:
+    """
+    Build and run :func:`build_flight_pipeline`; *kwargs* go through to it.
+
+    :param cache_dir: Stage cache folder; ``None`` recomputes everything.
+    :param max_cache_bytes: LRU size bound of the cache.
+    """
+    cache = StageCache(cache_dir, max_cache_bytes) if cache_dir is not None else None
+    return build_flight_pipeline(output, cache, **kwargs).run()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Detections → pallet hover points → KMZ, with cached stages.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--combined", dest="combined_csv", help="combined_with_gps.csv (boxes + camera GPS)")
+    source.add_argument("--boxes", dest="boxes_csv", help="bounding-box CSV (needs --photos)")
+    source.add_argument("--weights", help="YOLO weights; detect on --photos")
+    parser.add_argument("--photos", dest="photo_dir", help="folder with the original JPEGs")
+    parser.add_argument("--output", required=True, help="KMZ to write")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR))
+    parser.add_argument("--no-cache", dest="cache_dir", action="store_const", const=None)
+    parser.add_argument("--max-cache-mb", type=float, default=DEFAULT_MAX_BYTES / 2**20)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--imgsz", type=int, default=1280)
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--prefilter", choices=["draft", "thumbnail"], default=None,
+                        help="preview pass before full-resolution detection (--weights only)")
+    parser.add_argument("--barcode-vis-thresh", type=float, default=0.7)
+    parser.add_argument("--focal-length-mm", type=float, default=CameraIntrinsics.focal_length_mm)
+    parser.add_argument("--sensor-mm", type=float, nargs=2, metavar=("W", "H"),
+                        default=(CameraIntrinsics.sensor_width_mm, CameraIntrinsics.sensor_height_mm))
+    parser.add_argument("--image-px", type=int, nargs=2, metavar=("W", "H"),
+                        default=(CameraIntrinsics.image_width_px, CameraIntrinsics.image_height_px))
+    parser.add_argument("--merge-radius", type=float, default=MERGE_RADIUS_M)
+    parser.add_argument("--pose", choices=POSES, default="triangulate",
+                        help="mono: single-view ground projection instead of rank matching + triangulation")
+    parser.add_argument("--camera-heading", type=float, default=None,
+                        help="heading the photos were taken at (deg from north); required for --pose mono")
+    parser.add_argument("--camera-pitch", type=float, default=CAPTURE_PITCH_DEG,
+                        help="gimbal pitch of the photos (deg), with --camera-heading")
+    parser.add_argument("--plane-alt", type=float, default=None,
+                        help="--pose mono: ellipsoid altitude of the pallet plane (default: --camera-height below)")
+    parser.add_argument("--camera-height", type=float, default=CAPTURE_HEIGHT_M)
+    parser.add_argument("--refine", action="store_true",
+                        help="--pose mono: triangulate pallets seen from two or more images")
+    parser.add_argument("--back", type=float, default=BACK_DISTANCE_METRES)
+    parser.add_argument("--up", type=float, default=UP_DISTANCE_METRES)
+    parser.add_argument("--author", default=AUTHOR)
+    parser.add_argument("--takeoff", dest="takeoff_ref_point", default=TAKEOFF_REF_POINT)
+    parser.add_argument("--speed", type=float, default=SPEED)
+    parser.add_argument("--optimize-route", action="store_true")
+    parser.add_argument("--simplify", type=float, nargs="?", const=SIMPLIFY_TOLERANCE_M, default=None,
+                        metavar="TOLERANCE",
+                        help="fly through the hover targets of straight runs without stopping (max deviation, m)")
+    parser.add_argument("--max-leg", type=float, default=None, help="split legs longer than this (m)")
+    parser.add_argument("--geofence", help="geofence JSON to validate the mission against (see geofence.py)")
+    args = vars(parser.parse_args())
+    configure_logging()
+
+    if args["geofence"] is not None:
+        args["geofence"] = Geofence.from_json(args["geofence"])
+
+    sensor, image = args.pop("sensor_mm"), args.pop("image_px")
+    args["intrinsics"] = CameraIntrinsics(sensor_width_mm=sensor[0], sensor_height_mm=sensor[1],
+                                          focal_length_mm=args.pop("focal_length_mm"),
+                                          image_width_px=image[0], image_height_px=image[1])
+    args["max_cache_bytes"] = int(args.pop("max_cache_mb") * 2**20)
+    run = run_flight(**args)
+    print(run.summary())
+    print(f"🎉  KMZ ready: {Path(run.outputs['kmz']).resolve()}")
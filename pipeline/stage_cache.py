@@ -0,0 +1,341 @@
+"""
+Content-addressed cache for pipeline stage outputs.
+
+Every stage output is stored under the hash of everything that produced it
+(see :func:`stage_key`):
+
+    <root>/<key[:2]>/<key>/meta.json
+                          /value.parquet   (DataFrame outputs)
+                          /value.pkl       (anything else)
+
+* Inputs are fingerprinted by content – BLAKE2b of the file bytes – so a
+  renamed or re-copied photo folder still hits.  Digests are memoised in a
+  SQLite sidecar keyed by ``(path, mtime_ns, size)`` (like
+  ``kmz_file_generation/gps_exif.py``'s :class:`GpsCache`), so unchanged
+  files are only ``stat``-ed on a rerun.
+* Parameters are hashed as canonical JSON; dataclasses (e.g.
+  :class:`triangulation.CameraIntrinsics`) hash by their fields.
+* Entries are written to a temporary folder and renamed into place, so
+  concurrent runs never read a half-written entry.
+* The cache is bounded by size: reading an entry bumps its ``meta.json``
+  mtime and :meth:`StageCache.evict` drops least-recently-used entries
+  until the total is below ``max_bytes``.
+"""
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+import pandas as pd
+
+META_NAME = "meta.json"
+PARQUET_NAME = "value.parquet"
+PICKLE_NAME = "value.pkl"
+HASH_DB_NAME = "file_hashes.sqlite"
+
+DEFAULT_MAX_BYTES = 2 * 2**30
+HASH_CHUNK = 1 << 20
+DIGEST_SIZE = 20
+
+
+def _hasher():
+    return hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+
+def hash_file(path: str | Path) -> str:
+    """Hex digest of the bytes of *path*."""
+    h = _hasher()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(HASH_CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class FileHashMemo:
+    """
+    Persistent ``path → content digest`` memo backed by a SQLite file.
+
+    A digest is reused while the file's *mtime* and *size* are unchanged.
+
+    :param db_path: SQLite file, created on first use.
+    """
+
+    def __init__(self, db_path: str | Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS digests ("
+            " path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, digest TEXT)"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def digest(self, path: str | Path) -> str:
+        """Cached :func:`hash_file`."""
+        key = str(Path(path).resolve())
+        st = os.stat(key)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM digests WHERE path = ? AND mtime_ns = ? AND size = ?",
+                (key, st.st_mtime_ns, st.st_size),
+            ).fetchone()
+        if row is not None:
+            self.hits += 1
+            return row[0]
+
+        self.misses += 1
+        digest = hash_file(key)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?)",
+                (key, st.st_mtime_ns, st.st_size, digest),
+            )
+            self._conn.commit()
+        return digest
+
+    def close(self) -> None:
+        logging.debug("File hash memo %s: %d hits, %d misses", self.db_path, self.hits, self.misses)
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "FileHashMemo":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def fingerprint_path(path: str | Path,
+                     memo: FileHashMemo | None = None,
+                     suffixes: Iterable[str] | None = None) -> str:
+    """
+    Content fingerprint of a file, or of every file in a folder.
+
+    A folder hashes the sorted ``(relative name, file digest)`` pairs of its
+    files, so the fingerprint changes when a file is added, removed, renamed
+    or edited – and for nothing else.
+
+    :param path: File or folder.
+    :param memo: Optional :class:`FileHashMemo` to skip unchanged files.
+    :param suffixes: Only hash folder files with these (lower-case) suffixes,
+                     e.g. ``{".jpg", ".jpeg"}``.
+    """
+    path = Path(path)
+    digest = memo.digest if memo is not None else hash_file
+    if path.is_file():
+        return digest(path)
+    if not path.is_dir():
+        raise FileNotFoundError(f"No such file or folder: {path}")
+
+    wanted = {s.lower() for s in suffixes} if suffixes is not None else None
+    h = _hasher()
+    n = 0
+    for file in sorted(p for p in path.rglob("*") if p.is_file()):
+        if wanted is not None and file.suffix.lower() not in wanted:
+            continue
+        h.update(file.relative_to(path).as_posix().encode())
+        h.update(b"\0")
+        h.update(digest(file).encode())
+        n += 1
+    logging.debug("Fingerprinted %d files under %s", n, path)
+    return h.hexdigest()
+
+
+def _to_jsonable(value: Any) -> Any:
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {"__dataclass__": type(value).__name__, **dataclasses.asdict(value)}
+    if isinstance(value, Path):
+        return str(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Cannot hash parameter of type {type(value).__name__}")
+
+
+def hash_params(params: Mapping[str, Any]) -> str:
+    """
+    Digest of *params* as canonical JSON (sorted keys, no whitespace).
+
+    Floats hash by their ``repr``, so ``0.7`` and ``0.70`` agree but
+    ``1`` and ``1.0`` do not – pass parameters with a consistent type.
+    """
+    text = json.dumps(params, sort_keys=True, separators=(",", ":"), default=_to_jsonable)
+    h = _hasher()
+    h.update(text.encode())
+    return h.hexdigest()
+
+
+def stage_key(name: str,
+              params: Mapping[str, Any],
+              inputs: Mapping[str, str],
+              dep_keys: Mapping[str, str],
+              version: str = "1") -> str:
+    """
+    Cache key of one stage run.
+
+    Upstream stages contribute their *keys*, not their outputs, so the key
+    of every stage is known before anything is computed (Merkle-style) and
+    a cached stage never has to load its inputs.
+
+    :param name: Stage name.
+    :param params: Stage parameters.
+    :param inputs: ``{input name: fingerprint}`` of external inputs.
+    :param dep_keys: ``{upstream stage: key}``.
+    :param version: Bump to invalidate outputs after a code change.
+    """
+    return hash_params({
+        "stage": name,
+        "version": version,
+        "params": hash_params(params),
+        "inputs": dict(inputs),
+        "deps": dict(dep_keys),
+    })
+
+
+def _dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+class StageCache:
+    """
+    Size-bounded, content-addressed store of stage outputs.
+
+    DataFrames are stored as Parquet, every other value is pickled.
+
+    :param root: Cache folder (created on first use).
+    :param max_bytes: Size bound enforced by :meth:`evict`.
+    """
+
+    def __init__(self, root: str | Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def __contains__(self, key: str) -> bool:
+        return (self.path(key) / META_NAME).is_file()
+
+    def get(self, key: str) -> Any:
+        """
+        Load the value stored under *key* and mark it as recently used.
+
+        :raises KeyError: if there is no such entry.
+        """
+        entry = self.path(key)
+        meta = entry / META_NAME
+        if not meta.is_file():
+            raise KeyError(key)
+        if (entry / PARQUET_NAME).is_file():
+            value = pd.read_parquet(entry / PARQUET_NAME)
+        else:
+            with open(entry / PICKLE_NAME, "rb") as fh:
+                value = pickle.load(fh)
+        os.utime(meta)
+        return value
+
+    def meta(self, key: str) -> dict:
+        with open(self.path(key) / META_NAME, encoding="utf-8") as fh:
+            return json.load(fh)
+
+    def put(self, key: str, value: Any, meta: Mapping[str, Any] | None = None) -> Path:
+        """
+        Store *value* under *key* (atomic; an existing entry is kept).
+
+        :param meta: Extra JSON-serialisable fields for ``meta.json``.
+        :returns: Entry folder.
+        """
+        entry = self.path(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_name(f".{key}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+        tmp.mkdir()
+        try:
+            if isinstance(value, pd.DataFrame):
+                value.to_parquet(tmp / PARQUET_NAME, index=False)
+            else:
+                with open(tmp / PICKLE_NAME, "wb") as fh:
+                    pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            record = {"key": key, "created": time.time(), "bytes": _dir_size(tmp), **(meta or {})}
+            with open(tmp / META_NAME, "w", encoding="utf-8") as fh:
+                json.dump(record, fh, indent=2, default=_to_jsonable)
+            try:
+                os.rename(tmp, entry)
+            except OSError:
+                if key not in self:         # lost a race to an identical entry otherwise
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        return entry
+
+    def entries(self) -> list[tuple[str, float, int]]:
+        """``(key, last use, bytes)`` of every entry, least recently used first."""
+        out = []
+        for meta in self.root.glob(f"*/*/{META_NAME}"):
+            key = meta.parent.name
+            if key.startswith("."):
+                continue
+            try:
+                size = json.loads(meta.read_text(encoding="utf-8"))["bytes"]
+                out.append((key, meta.stat().st_mtime, size))
+            except (OSError, ValueError, KeyError):
+                continue
+        return sorted(out, key=lambda e: e[1])
+
+    def size(self) -> int:
+        return sum(size for _, _, size in self.entries())
+
+    def evict(self, keep: Iterable[str] = ()) -> list[str]:
+        """
+        Remove least-recently-used entries until the cache fits ``max_bytes``.
+
+        :param keep: Keys that must survive (e.g. the outputs of this run).
+        :returns: Evicted keys.
+        """
+        keep = set(keep)
+        entries = self.entries()
+        total = sum(size for _, _, size in entries)
+        evicted = []
+        for key, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            if key in keep:
+                continue
+            self._remove(key)
+            total -= size
+            evicted.append(key)
+        if evicted:
+            logging.info("Evicted %d cache entries from %s (%.1f MiB left)",
+                         len(evicted), self.root, total / 2**20)
+        return evicted
+
+    def clear(self) -> None:
+        for key, _, _ in self.entries():
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        entry = self.path(key)
+        shutil.rmtree(entry, ignore_errors=True)
+        try:
+            entry.parent.rmdir()            # only succeeds once the prefix folder is empty
+        except OSError:
+            pass
@@ -0,0 +1,376 @@
+"""
+Live mode: update the inspection mission while the survey photos land.
+
+    python pipeline/watch.py /media/DJI_001 --weights best.pt --output output_kmz/live.kmz \\
+        --exit-after-idle 10
+
+An asyncio loop polls *folder* for new JPEGs and feeds every finished file
+(size and mtime unchanged for one poll) through:
+
+1.  Detection in a worker pool – YOLO in worker processes that load the
+    model once, or ``--replay`` of an existing detection CSV (for dry runs
+    and tests).
+2.  Camera GPS from the EXIF header (``kmz_file_generation/gps_exif.py``),
+    unless the replayed CSV already carries it.
+3.  :class:`LiveTargets`: the image is ranked on its own, its views are
+    added to an :class:`triangulation.IncrementalTriangulator` (4×4 normal
+    matrices per rank – nothing is re-solved from scratch) and the merged
+    hover targets are recomputed from the current estimates.
+4.  The KMZ is rewritten atomically (:func:`writer.build_kmz`) whenever the
+    targets moved, at most every ``--debounce`` seconds – so a finished
+    mission is on disk well within a second of the last photo.
+
+The barcode-visibility threshold is relative to the best image seen so
+far; when a better image arrives, images that fall below the new
+threshold are removed from the triangulation again.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+_REPO = Path(__file__).resolve().parents[1]
+for _folder in ("pose_estimation", "kmz_file_generation", "object_detection"):
+    sys.path.insert(0, str(_REPO / _folder))
+
+from config import AUTHOR, SPEED, TAKEOFF_REF_POINT  # noqa: E402
+from detect import IMAGE_SUFFIXES  # noqa: E402
+from detection_store import normalize_image_names  # noqa: E402
+from final_navigation.geometry import BACK_DISTANCE_METRES, UP_DISTANCE_METRES  # noqa: E402
+from flight_pipeline import HOVER_COLUMNS, hover_waypoints  # noqa: E402
+from gps_exif import read_gps  # noqa: E402
+from pallet_merge import MERGE_RADIUS_M, merge_pallets  # noqa: E402
+from pallet_ranks import rank_pallet_points  # noqa: E402
+from triangulation import CameraIntrinsics, IncrementalTriangulator  # noqa: E402
+from writer import WaypointArray, build_kmz  # noqa: E402
+
+GPS_COLUMNS = ["latitude", "longitude", "altitude"]
+
+POLL_INTERVAL = 0.25
+DEBOUNCE = 0.5
+#: Targets that moved less than this (m, roughly) count as unchanged
+MOVE_TOLERANCE_M = 0.05
+
+
+class LiveTargets:
+    """
+    Hover targets of a flight, updated one image at a time.
+
+    Equivalent to ``rank_pallet_points`` → ``Triangulator.triangulate`` →
+    ``merge_pallets`` → ``hover_waypoints`` over all images added so far.
+
+    :param intrinsics: Camera model (also gives the image size).
+    :param barcode_vis_thresh: Fraction of the best image's barcode count
+                               an image needs.
+    """
+
+    def __init__(self,
+                 intrinsics: CameraIntrinsics = CameraIntrinsics(),
+                 barcode_vis_thresh: float = 0.7,
+                 merge_radius: float = MERGE_RADIUS_M,
+                 back: float = BACK_DISTANCE_METRES,
+                 up: float = UP_DISTANCE_METRES):
+        self.intrinsics = intrinsics
+        self.barcode_vis_thresh = barcode_vis_thresh
+        self.merge_radius = merge_radius
+        self.back = back
+        self.up = up
+        self.triangulator = IncrementalTriangulator(intrinsics)
+        self.max_barcodes = 0
+        self._barcodes: dict[str, int] = {}
+        self._ranked: dict[str, pd.DataFrame] = {}
+
+    def __len__(self) -> int:
+        return len(self._barcodes)
+
+    def _usable(self, image: str) -> bool:
+        return (self._barcodes[image] >= self.max_barcodes * self.barcode_vis_thresh
+                and not self._ranked[image].empty)
+
+    def add_image(self, image: str, boxes: pd.DataFrame) -> set[int]:
+        """
+        Add one image's detections (with ``latitude/longitude/altitude``).
+
+        :returns: Ranks whose triangulation changed.
+        """
+        self._barcodes[image] = int((boxes["class"] == "barcode").sum())
+        self._ranked[image] = rank_pallet_points(boxes, self.intrinsics.image_width_px,
+                                                 self.intrinsics.image_height_px, barcode_vis_thresh=0.0)
+        touched: set[int] = set()
+        if self._barcodes[image] > self.max_barcodes:
+            self.max_barcodes = self._barcodes[image]
+            for other in self.triangulator.images:
+                if not self._usable(other):
+                    touched |= self.triangulator.remove(other)
+        if self._usable(image):
+            touched |= self.triangulator.add(image, self._ranked[image])
+        return touched
+
+    def targets(self) -> pd.DataFrame:
+        """Current hover waypoints (:data:`flight_pipeline.HOVER_COLUMNS`)."""
+        pallets = merge_pallets(self.triangulator.solve(), self.merge_radius)
+        return hover_waypoints(pallets, self.back, self.up)
+
+
+def targets_changed(old: pd.DataFrame | None, new: pd.DataFrame, tolerance: float = MOVE_TOLERANCE_M) -> bool:
+    """Whether *new* differs from *old* by a target or by more than *tolerance* metres."""
+    if old is None or len(old) != len(new):
+        return True
+    deg = tolerance / 111_320.0
+    a = old[["latitude", "longitude"]].to_numpy(dtype=float)
+    b = new[["latitude", "longitude"]].to_numpy(dtype=float)
+    return bool(np.any(np.abs(a - b) > deg)
+                or np.any(np.abs(old["altitude"].to_numpy(dtype=float) - new["altitude"].to_numpy(dtype=float)) > tolerance))
+
+
+# ---------------------------------------------------------------------- #
+#  Detectors                                                              #
+# ---------------------------------------------------------------------- #
+_WORKER_MODEL = None
+
+
+def _init_yolo_worker(weights: str) -> None:
+    global _WORKER_MODEL
+    from ultralytics import YOLO
+
+    _WORKER_MODEL = YOLO(weights)
+
+
+def _yolo_detect(path: str, conf: float, imgsz: int) -> pd.DataFrame:
+    from detect import _decode, results_to_frame
+
+    results = _WORKER_MODEL.predict(source=[_decode(Path(path))], conf=conf, imgsz=imgsz, verbose=False)
+    return results_to_frame(results, [Path(path).name], dict(_WORKER_MODEL.names))
+
+
+class _Replay:
+    """Detections of an existing CSV, looked up by photo name."""
+
+    def __init__(self, csv_path: str | Path):
+        df = pd.read_csv(csv_path)
+        df["image"] = normalize_image_names(df["image"])
+        self._groups = {name: grp.reset_index(drop=True) for name, grp in df.groupby("image", sort=False)}
+        self._empty = df.iloc[:0]
+
+    def __call__(self, path: str) -> pd.DataFrame:
+        return self._groups.get(Path(path).name, self._empty)
+
+
+def make_detector(weights: str | Path | None = None,
+                  replay_csv: str | Path | None = None,
+                  workers: int = 1,
+                  conf: float = 0.25,
+                  imgsz: int = 1280) -> tuple[Executor, Callable[[str], pd.DataFrame]]:
+    """
+    Pool + ``path → boxes`` function: YOLO in *workers* processes, or a
+    thread that replays *replay_csv*.
+    """
+    if (weights is None) == (replay_csv is None):
+        raise ValueError("Pass exactly one of weights or replay_csv")
+    if weights is not None:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_yolo_worker, initargs=(str(weights),))
+        return pool, partial(_yolo_detect, conf=conf, imgsz=imgsz)
+    return ThreadPoolExecutor(max_workers=workers), _Replay(replay_csv)
+
+
+# ---------------------------------------------------------------------- #
+#  Watcher                                                                #
+# ---------------------------------------------------------------------- #
+class FlightWatcher:
+    """
+    Asyncio loop from a photo folder to a continuously updated KMZ.
+
+    :param folder:   Folder the photos land in.
+    :param output:   KMZ to (re)write.
+    :param targets:  Target state, e.g. ``LiveTargets(barcode_vis_thresh=0.6)``.
+    :param pool:     Detection pool (see :func:`make_detector`).
+    :param detect:   ``path → boxes`` run in *pool*.
+    :param workers:  Images in flight at once.
+    :param poll_interval: Folder scan period (s).
+    :param debounce: Minimum time (s) between two KMZ writes.
+    """
+
+    def __init__(self,
+                 folder: str | Path,
+                 output: str | Path,
+                 targets: LiveTargets,
+                 pool: Executor,
+                 detect: Callable[[str], pd.DataFrame],
+                 workers: int = 1,
+                 poll_interval: float = POLL_INTERVAL,
+                 debounce: float = DEBOUNCE,
+                 author: str = AUTHOR,
+                 takeoff_ref_point: str = TAKEOFF_REF_POINT,
+                 speed: float = SPEED):
+        self.folder = Path(folder)
+        self.output = Path(output)
+        self.targets = targets
+        self.pool = pool
+        self.detect = detect
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.mission = {"author": author, "takeoff_ref_point": takeoff_ref_point, "speed": speed}
+        self.current: pd.DataFrame | None = None
+        self.writes = 0
+        self.last_write: float | None = None
+        self._seen: set[str] = set()
+        self._pending: dict[str, tuple[int, int]] = {}
+        self._queue: asyncio.Queue[Path] = asyncio.Queue()
+        self._dirty = asyncio.Event()
+        self._busy = 0
+        self._last_activity = time.monotonic()
+
+    # -- stages -------------------------------------------------------- #
+    def _scan(self) -> None:
+        """Queue photos whose size and mtime did not change since the last scan."""
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                name = entry.name
+                if name in self._seen or os.path.splitext(name)[1].lower() not in IMAGE_SUFFIXES:
+                    continue
+                st = entry.stat()
+                sig = (st.st_size, st.st_mtime_ns)
+                if st.st_size and self._pending.get(name) == sig:
+                    del self._pending[name]
+                    self._seen.add(name)
+                    self._queue.put_nowait(Path(entry.path))
+                    self._last_activity = time.monotonic()
+                else:
+                    self._pending[name] = sig
+
+    async def _scanner(self) -> None:
+        while True:
+            self._scan()
+            await asyncio.sleep(self.poll_interval)
+
+    async def _process(self, path: Path) -> None:
+        loop = asyncio.get_running_loop()
+        boxes = await loop.run_in_executor(self.pool, self.detect, str(path))
+        boxes = boxes.copy()
+        if not set(GPS_COLUMNS) <= set(boxes.columns) or boxes[GPS_COLUMNS].isna().any().any():
+            try:
+                fix = await asyncio.to_thread(read_gps, path)
+            except (ValueError, OSError) as e:
+                logging.warning("GPS extraction error for %s: %s", path, e)
+                return
+            boxes[GPS_COLUMNS] = fix
+        boxes["image"] = path.name
+        touched = self.targets.add_image(path.name, boxes)
+        logging.debug("%s: %d boxes, %d ranks updated", path.name, len(boxes), len(touched))
+        if touched:
+            self._dirty.set()
+
+    async def _worker(self) -> None:
+        while True:
+            path = await self._queue.get()
+            self._busy += 1
+            try:
+                await self._process(path)
+            except Exception:
+                logging.exception("Failed to process %s", path)
+            finally:
+                self._busy -= 1
+                self._last_activity = time.monotonic()
+                self._queue.task_done()
+
+    async def write_if_changed(self) -> bool:
+        """Recompute the targets and rewrite the KMZ if they moved."""
+        self._dirty.clear()
+        new = self.targets.targets()
+        if not targets_changed(self.current, new):
+            return False
+        if new.empty:
+            self.current = new
+            return False
+        await asyncio.to_thread(build_kmz, WaypointArray.from_frame(new), self.output, **self.mission)
+        self.current = new
+        self.writes += 1
+        self.last_write = time.monotonic()
+        logging.info("KMZ updated: %d targets from %d images → %s", len(new), len(self.targets), self.output)
+        return True
+
+    async def _writer(self) -> None:
+        while True:
+            await self._dirty.wait()
+            await asyncio.sleep(self.debounce)
+            await self.write_if_changed()
+
+    @property
+    def idle(self) -> bool:
+        return self._queue.empty() and not self._busy and not self._pending
+
+    # -- entry point --------------------------------------------------- #
+    async def run(self, exit_after_idle: float | None = None) -> pd.DataFrame:
+        """
+        Watch until cancelled, or until nothing arrived for *exit_after_idle*
+        seconds; the KMZ is brought up to date before returning.
+
+        :returns: The final hover targets (:data:`flight_pipeline.HOVER_COLUMNS`).
+        """
+        tasks = [asyncio.create_task(self._scanner()), asyncio.create_task(self._writer())]
+        tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                if (exit_after_idle is not None and self.idle
+                        and time.monotonic() - self._last_activity >= exit_after_idle):
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.write_if_changed()
+        return self.current if self.current is not None else pd.DataFrame(columns=HOVER_COLUMNS)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Update the inspection KMZ while survey photos arrive.")
+    parser.add_argument("folder", help="folder the photos land in")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--weights", help="YOLO weights")
+    source.add_argument("--replay", dest="replay_csv", help="detection CSV to replay instead of running YOLO")
+    parser.add_argument("--output", required=True, help="KMZ to keep up to date")
+    parser.add_argument("--workers", type=int, default=1, help="detection worker processes")
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--imgsz", type=int, default=1280)
+    parser.add_argument("--barcode-vis-thresh", type=float, default=0.7)
+    parser.add_argument("--back", type=float, default=BACK_DISTANCE_METRES)
+    parser.add_argument("--up", type=float, default=UP_DISTANCE_METRES)
+    parser.add_argument("--author", default=AUTHOR)
+    parser.add_argument("--takeoff", dest="takeoff_ref_point", default=TAKEOFF_REF_POINT)
+    parser.add_argument("--speed", type=float, default=SPEED)
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE)
+    parser.add_argument("--exit-after-idle", type=float, default=None,
+                        help="stop after this many seconds without new photos")
+    args = parser.parse_args()
+
+    pool, detect_fn = make_detector(args.weights, args.replay_csv, args.workers, args.conf, args.imgsz)
+    watcher = FlightWatcher(
+        args.folder, args.output,
+        LiveTargets(barcode_vis_thresh=args.barcode_vis_thresh, back=args.back, up=args.up),
+        pool, detect_fn, workers=args.workers,
+        poll_interval=args.poll_interval, debounce=args.debounce,
+        author=args.author, takeoff_ref_point=args.takeoff_ref_point, speed=args.speed,
+    )
+    with pool:
+        try:
+            final = asyncio.run(watcher.run(args.exit_after_idle))
+        except KeyboardInterrupt:
+            final = watcher.current
+    n = 0 if final is None else len(final)
+    print(f"🎉  {n} targets from {len(watcher.targets)} images, KMZ written {watcher.writes}× → {args.output}")
@@ -0,0 +1,340 @@
+"""
+Detections + camera GPS → ``combined_with_gps`` table.
+
+Importable replacement for the loop in add_camera_position.ipynb:
+
+1.  Collect the distinct photos referenced by the bounding-box CSV.
+2.  Read each photo's GPS exactly once, in a thread or process pool, from
+    the EXIF header only (see ``kmz_file_generation/gps_exif.py``).
+3.  Stream the bounding boxes in chunks, attach GPS with a vectorised
+    merge and append every chunk to a CSV or Parquet file.
+
+:func:`enrich_flight` does the same from / to the detection store
+(``object_detection/detection_store.py``).
+
+Memory stays bounded by *chunksize* plus one row per distinct image.
+Chunks are written in the order they are read, so the streamed file keeps
+the row order of the box CSV.  The in-memory
+:func:`join_camera_positions` / :func:`get_df_with_camera_position`
+return the rows sorted by ``(image, class)`` – input order inside each
+group – exactly like the notebook's ``groupby`` loop that produced
+``combined_with_gps.csv``.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import os
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+import pandas as pd
+
+_REPO = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(_REPO / "kmz_file_generation"))
+sys.path.insert(0, str(_REPO / "object_detection"))
+from gps_exif import GpsCache, read_gps  # noqa: E402
+from detection_store import BOXES, COMBINED, DetectionStore, normalize_image_names  # noqa: E402
+
+#: Column order of ``combined_with_gps.csv``
+COMBINED_COLUMNS = ["image", "class", "x1", "x2", "y1", "y2", "latitude", "longitude", "altitude"]
+#: Row order of ``combined_with_gps.csv`` (the notebook grouped by these)
+COMBINED_ORDER = ["image", "class"]
+GPS_COLUMNS = ["latitude", "longitude", "altitude"]
+
+DEFAULT_CHUNKSIZE = 50_000
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+def extract_gps_info(photo_path: str | Path, cache: GpsCache | None = None):
+    """
+    GPS of one photo, or ``(None, None, None)`` if it cannot be read.
+
+    :param photo_path: JPEG file.
+    :param cache: Optional shared :class:`GpsCache`.
+    :returns: (lat, lon, alt)
+    """
+    try:
+        return cache.get(photo_path) if cache is not None else read_gps(photo_path)
+    except (ValueError, OSError) as e:
+        logging.warning("GPS extraction error for %s: %s", photo_path, e)
+        return None, None, None
+
+
+# Process-pool workers cannot share a SQLite handle – each opens its own.
+_WORKER_CACHE: GpsCache | None = None
+
+
+def _init_process_worker(cache_path: str | None) -> None:
+    global _WORKER_CACHE
+    _WORKER_CACHE = GpsCache(cache_path) if cache_path else None
+
+
+def _extract_in_process(photo_path: str):
+    return extract_gps_info(photo_path, _WORKER_CACHE)
+
+
+def _make_executor(executor: str, workers: int, cache_path: str | Path | None) -> tuple[Executor, Callable, GpsCache | None]:
+    """Pool + per-item function for *executor* (``"thread"`` or ``"process"``)."""
+    if executor == "thread":
+        cache = GpsCache(cache_path) if cache_path else None
+        return ThreadPoolExecutor(max_workers=workers), partial(extract_gps_info, cache=cache), cache
+    if executor == "process":
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_process_worker,
+            initargs=(str(cache_path) if cache_path else None,),
+        )
+        return pool, _extract_in_process, None
+    raise ValueError(f"executor must be 'thread' or 'process', got {executor!r}")
+
+
+def extract_gps_table(
+    image_names: Iterable[str],
+    photo_dir: str | Path,
+    workers: int = DEFAULT_WORKERS,
+    executor: str = "thread",
+    cache_path: str | Path | None = None,
+) -> pd.DataFrame:
+    """
+    Read GPS for every distinct image name, in parallel.
+
+    :param image_names: Photo file names (duplicates are read once).
+    :param photo_dir: Folder holding the photos.
+    :param workers: Pool size.
+    :param executor: ``"thread"`` (default – EXIF reads are I/O bound) or
+                     ``"process"``.
+    :param cache_path: Optional SQLite :class:`GpsCache` file.
+    :returns: DataFrame ``image, latitude, longitude, altitude``; photos
+              without GPS get NaN.
+    """
+    names = sorted(set(image_names))
+    paths = [os.path.join(photo_dir, name) for name in names]
+
+    t0 = time.perf_counter()
+    pool, fn, cache = _make_executor(executor, workers, cache_path)
+    try:
+        with pool:
+            chunk = max(1, math.ceil(len(paths) / (workers * 4)))
+            kwargs = {"chunksize": chunk} if executor == "process" else {}
+            fixes = list(pool.map(fn, paths, **kwargs))
+    finally:
+        if cache is not None:
+            cache.close()
+    elapsed = time.perf_counter() - t0
+
+    logging.info("GPS extracted for %d images in %.2fs (%.1f images/sec)",
+                 len(names), elapsed, len(names) / elapsed if elapsed else float("inf"))
+    gps = pd.DataFrame(fixes, columns=GPS_COLUMNS, dtype=float)
+    gps.insert(0, "image", names)
+    return gps
+
+
+def _iter_boxes(csv_path: str | Path, chunksize: int) -> Iterator[pd.DataFrame]:
+    """Bounding boxes in chunks, with the ``image`` column normalised."""
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        chunk["image"] = normalize_image_names(chunk["image"])
+        yield chunk
+
+
+def _distinct_images(csv_path: str | Path, chunksize: int) -> set[str]:
+    names: set[str] = set()
+    for chunk in pd.read_csv(csv_path, usecols=["image"], chunksize=chunksize):
+        names.update(normalize_image_names(chunk["image"]).unique())
+    return names
+
+
+class _ChunkSink:
+    """Append DataFrame chunks to a ``.csv`` or ``.parquet`` file."""
+
+    def __init__(self, output: Path):
+        self.output = output
+        self.parquet = output.suffix == ".parquet"
+        self._writer = None
+        self._first = True
+        output.parent.mkdir(parents=True, exist_ok=True)
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.output, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.output, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        elif self._first:                 # no rows – still leave a valid file
+            empty = pd.DataFrame(columns=COMBINED_COLUMNS)
+            if self.parquet:
+                empty.to_parquet(self.output, index=False)
+            else:
+                empty.to_csv(self.output, index=False)
+
+
+@dataclass
+class IngestStats:
+    """
+    Summary of one :func:`build_combined_table` run.
+
+    :param images:          Distinct photos read.
+    :param boxes:           Bounding-box rows written.
+    :param seconds:         Wall time of the whole run.
+    :param images_per_sec:  GPS extraction throughput.
+    :param output:          File that was written.
+    """
+    images: int
+    boxes: int
+    seconds: float
+    images_per_sec: float
+    output: Path
+
+
+def build_combined_table(
+    csv_path: str | Path,
+    photo_dir: str | Path,
+    output: str | Path,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    workers: int = DEFAULT_WORKERS,
+    executor: str = "thread",
+    cache_path: str | Path | None = None,
+) -> IngestStats:
+    """
+    Join camera GPS onto the bounding-box CSV and stream the result to disk.
+
+    Rows keep the order of *csv_path* (a global ``(image, class)`` sort
+    would hold the whole table in memory); sort the result by
+    :data:`COMBINED_ORDER` to compare it with ``combined_with_gps.csv``.
+    The output format follows the suffix of *output*: ``.parquet`` or CSV
+    otherwise.
+
+    :param csv_path: Detections with ``image, class, x1, y1, x2, y2`` columns.
+    :param photo_dir: Folder holding the original photos.
+    :param output: Destination file.
+    :param chunksize: Rows per streamed chunk.
+    :param workers: GPS pool size.
+    :param executor: ``"thread"`` or ``"process"``.
+    :param cache_path: Optional SQLite :class:`GpsCache` file.
+    :returns: :class:`IngestStats`
+    """
+    t0 = time.perf_counter()
+    names = _distinct_images(csv_path, chunksize)
+
+    t_gps = time.perf_counter()
+    gps = extract_gps_table(names, photo_dir, workers=workers, executor=executor, cache_path=cache_path)
+    gps_elapsed = time.perf_counter() - t_gps
+
+    sink = _ChunkSink(Path(output))
+    n_boxes = 0
+    try:
+        for chunk in _iter_boxes(csv_path, chunksize):
+            merged = chunk.merge(gps, on="image", how="left", sort=False)
+            sink.write(merged[COMBINED_COLUMNS])
+            n_boxes += len(merged)
+    finally:
+        sink.close()
+
+    stats = IngestStats(
+        images=len(names),
+        boxes=n_boxes,
+        seconds=time.perf_counter() - t0,
+        images_per_sec=len(names) / gps_elapsed if gps_elapsed else float("inf"),
+        output=Path(output),
+    )
+    logging.info("Wrote %d boxes for %d images to %s in %.2fs",
+                 stats.boxes, stats.images, stats.output, stats.seconds)
+    return stats
+
+
+def get_df_with_camera_position(
+    csv_path: str | Path,
+    photo_dir: str | Path,
+    workers: int = DEFAULT_WORKERS,
+    executor: str = "thread",
+    cache_path: str | Path | None = None,
+) -> pd.DataFrame:
+    """
+    In-memory variant of :func:`build_combined_table` for notebooks and
+    small flights; returns the ``combined_with_gps`` DataFrame.
+    """
+    return join_camera_positions(pd.read_csv(csv_path), photo_dir,
+                                 workers=workers, executor=executor, cache_path=cache_path)
+
+
+def join_camera_positions(
+    boxes: pd.DataFrame,
+    photo_dir: str | Path,
+    workers: int = DEFAULT_WORKERS,
+    executor: str = "thread",
+    cache_path: str | Path | None = None,
+) -> pd.DataFrame:
+    """
+    Attach camera GPS to an in-memory bounding-box table.
+
+    :param boxes: Rows with ``image, class, x1, y1, x2, y2``; export names
+                  are normalised to the original photo names.
+    :returns: The ``combined_with_gps`` columns, sorted by ``(image, class)``
+              with the order of *boxes* kept inside each group.
+    """
+    df = boxes.copy()
+    df["image"] = normalize_image_names(df["image"])
+    gps = extract_gps_table(df["image"].unique(), photo_dir,
+                            workers=workers, executor=executor, cache_path=cache_path)
+    combined = df.merge(gps, on="image", how="left", sort=False)[COMBINED_COLUMNS]
+    return combined.sort_values(COMBINED_ORDER, kind="stable").reset_index(drop=True)
+
+
+def enrich_flight(
+    store_root: str | Path,
+    flight: str,
+    photo_dir: str | Path,
+    workers: int = DEFAULT_WORKERS,
+    executor: str = "thread",
+    cache_path: str | Path | None = None,
+) -> int:
+    """
+    Detection-store variant: read the flight's ``boxes`` table, attach
+    camera GPS and write it back as the ``combined`` table.
+
+    Image names in the store are already normalised, so no string
+    clean-up happens here.
+
+    :returns: Number of rows written.
+    """
+    store = DetectionStore(store_root)
+    boxes = store.read(flight, table=BOXES)
+    gps = extract_gps_table(boxes["image"].astype(str).unique(), photo_dir,
+                            workers=workers, executor=executor, cache_path=cache_path)
+    gps["image"] = gps["image"].astype(boxes["image"].dtype)
+    combined = boxes.drop(columns=["flight"]).merge(gps, on="image", how="left", sort=False)
+    store.write(combined, flight=flight, table=COMBINED)
+    return len(combined)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Join camera GPS onto detected bounding boxes.")
+    parser.add_argument("csv_path", help="bounding-box CSV (e.g. all_bounding_boxes.csv)")
+    parser.add_argument("photo_dir", help="folder with the original JPEGs")
+    parser.add_argument("output", help="combined_with_gps.csv or .parquet")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--cache", dest="cache_path", default=None, help="SQLite GPS cache file")
+    args = parser.parse_args()
+
+    result = build_combined_table(**vars(args))
+    print(f"{result.boxes} boxes, {result.images} images, {result.images_per_sec:.1f} images/sec → {result.output}")
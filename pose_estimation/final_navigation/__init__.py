@@ -1 +1 @@
-from geometry import compute_target_coordinate
\ No newline at end of file
+from .geometry import compute_target_coordinate, compute_target_coordinates
@@ -2,58 +2,119 @@
 Geodetic ( lat, lon, alt ) ↔ local-ENU helpers.
 
 All heavy lifting is done once here so geometry.py can stay vector-math-only.
+Every public function works on whole (N, 3) arrays: one PyProj call per
+direction, no Python loop over points.
 """
 from __future__ import annotations
 
+from functools import lru_cache
+
 import numpy as np
-from pyproj import Transformer
 import logging
 
 from .exceptions import GeodesyError
+from .metrics import inc
+
+WGS84_GEODETIC = "epsg:4979"
+WGS84_ECEF = "epsg:4978"
+
+
+@lru_cache(maxsize=None)
+def _transformer(src: str, dst: str):
+    """
+    PyProj transformer *src* → *dst*, built on first use.
+
+    Importing pyproj and building a transformer loads the PROJ database;
+    deferring both keeps ``import final_navigation`` cheap for processes
+    that never convert a coordinate.  One instance per direction is
+    re-used across calls (thread-safe in PyProj ≥3.2).
+    """
+    from pyproj import Transformer
+
+    return Transformer.from_crs(src, dst, always_xy=True)
+
 
-# Re-use one transformer pair across calls (thread-safe in PyProj ≥3.2).
-_TO_ECEF = Transformer.from_crs("epsg:4979", "epsg:4978", always_xy=True)
-_FROM_ECEF = Transformer.from_crs("epsg:4978", "epsg:4979", always_xy=True)
+def _to_ecef():
+    return _transformer(WGS84_GEODETIC, WGS84_ECEF)
+
+
+def _from_ecef():
+    return _transformer(WGS84_ECEF, WGS84_GEODETIC)
 
 
 def _geodetic_to_ecef(lat: float, lon: float, alt: float) -> np.ndarray:
     """Internal helper: single-point geodetic → ECEF."""
+    return _geodetic_to_ecef_array(np.array([[lat, lon, alt]], dtype=float))[0]
+
+
+def _ecef_to_geodetic(x: float, y: float, z: float) -> np.ndarray:
+    """Internal helper: single-point ECEF → geodetic."""
+    return _ecef_to_geodetic_array(np.array([[x, y, z]], dtype=float))[0]
+
+
+def _as_points(points: np.ndarray) -> np.ndarray:
+    """Coerce *points* to a float (N, 3) array (a single (3,) row is allowed)."""
+    pts = np.asarray(points, dtype=float)
+    if pts.ndim == 1:
+        pts = pts.reshape(1, -1)
+    if pts.ndim != 2 or pts.shape[1] != 3:
+        raise GeodesyError(f"Expected an (N, 3) array, got shape {pts.shape}")
+    return pts
+
+
+def _geodetic_to_ecef_array(points: np.ndarray) -> np.ndarray:
+    """
+    Internal helper: batch geodetic → ECEF in one PyProj call.
+
+    :param points: (N, 3) array of [lat, lon, alt].
+    :returns: (N, 3) array of ECEF [x, y, z] (m).
+    """
+    pts = _as_points(points)
+    inc("geodesy_points_transformed", len(pts))
     try:
-        x, y, z = _TO_ECEF.transform(lon, lat, alt)  # note lon/lat order
-        logging.info(f"Geodetic coordinates: {lat=}, {lon=}, {alt=} got converted to ECEF: {x=}, {y=}, {z=}")
+        x, y, z = _to_ecef().transform(pts[:, 1], pts[:, 0], pts[:, 2])  # note lon/lat order
     except Exception as exc:  # noqa: E501
         raise GeodesyError(
-            f"Cannot convert ({lat=}, {lon=}, {alt=}) to ECEF"
+            f"Cannot convert {len(pts)} geodetic point(s) to ECEF"
         ) from exc
-    return np.array([x, y, z])
+    ecef = np.column_stack((x, y, z))
+    if not np.isfinite(ecef).all():
+        raise GeodesyError("Geodetic → ECEF produced non-finite coordinates")
+    return ecef
 
 
-def _ecef_to_geodetic(x: float, y: float, z: float) -> np.ndarray:
-    """Internal helper: single-point ECEF → geodetic."""
+def _ecef_to_geodetic_array(ecef: np.ndarray) -> np.ndarray:
+    """
+    Internal helper: batch ECEF → geodetic in one PyProj call.
+
+    :param ecef: (N, 3) array of ECEF [x, y, z] (m).
+    :returns: (N, 3) array of [lat, lon, alt].
+    """
+    xyz = _as_points(ecef)
+    inc("geodesy_points_transformed", len(xyz))
     try:
-        lon, lat, alt = _FROM_ECEF.transform(x, y, z)
-        logging.info(f"ECEF coordinates: {x=}, {y=}, {z=} got converted to Geodetic: {lat=}, {lon=}, {alt=}")
+        lon, lat, alt = _from_ecef().transform(xyz[:, 0], xyz[:, 1], xyz[:, 2])
     except Exception as exc:
-        raise GeodesyError(f"Cannot convert ECEF ({x}, {y}, {z}) to geodetic") from exc
-    return np.array([lat, lon, alt])
+        raise GeodesyError(f"Cannot convert {len(xyz)} ECEF point(s) to geodetic") from exc
+    geo = np.column_stack((lat, lon, alt))
+    if not np.isfinite(geo).all():
+        raise GeodesyError("ECEF → geodetic produced non-finite coordinates")
+    return geo
 
 
-def geodetic_to_enu(
-    points: np.ndarray, origin: np.ndarray
-) -> np.ndarray:
+@lru_cache(maxsize=256)
+def _enu_frame(lat0: float, lon0: float, alt0: float) -> tuple[np.ndarray, np.ndarray]:
     """
-    Convert an array of geodetic coordinates to local ENU.
+    ECEF origin and ECEF→ENU rotation matrix for one local origin.
 
-    :param points: (N, 3) array of [lat, lon, alt] (° , ° , m).
-    :param origin: (3,) array – local origin [lat0, lon0, alt0] (deg, deg, m).
-    :returns: (N, 3) ENU coordinates (m) relative to origin.
+    Cached per origin so repeated calls around the same take-off point skip
+    the PyProj call and the trigonometry.  The returned arrays are read-only.
     """
-    # Pre-compute ECEF of origin + rotation matrix
-    x0, y0, z0 = _geodetic_to_ecef(*origin)
-    lat0, lon0, _ = np.radians(origin)
+    ecef0 = _geodetic_to_ecef_array(np.array([[lat0, lon0, alt0]]))[0]
+    lat_r, lon_r = np.radians(lat0), np.radians(lon0)
 
-    sin_lat, cos_lat = np.sin(lat0), np.cos(lat0)
-    sin_lon, cos_lon = np.sin(lon0), np.cos(lon0)
+    sin_lat, cos_lat = np.sin(lat_r), np.cos(lat_r)
+    sin_lon, cos_lon = np.sin(lon_r), np.cos(lon_r)
 
     rot = np.array(
         [
@@ -62,10 +123,45 @@ def geodetic_to_enu(
             [cos_lat * cos_lon, cos_lat * sin_lon, sin_lat],
         ]
     )
+    ecef0.setflags(write=False)
+    rot.setflags(write=False)
+    return ecef0, rot
+
+
+def _enu_rotations(origins: np.ndarray) -> np.ndarray:
+    """(M, 3, 3) ECEF→ENU rotation matrices, one per [lat0, lon0, alt0] row."""
+    lat_r, lon_r = np.radians(origins[:, 0]), np.radians(origins[:, 1])
+
+    sin_lat, cos_lat = np.sin(lat_r), np.cos(lat_r)
+    sin_lon, cos_lon = np.sin(lon_r), np.cos(lon_r)
+
+    rot = np.empty((len(origins), 3, 3))
+    rot[:, 0] = np.column_stack((-sin_lon, cos_lon, np.zeros_like(sin_lon)))
+    rot[:, 1] = np.column_stack((-sin_lat * cos_lon, -sin_lat * sin_lon, cos_lat))
+    rot[:, 2] = np.column_stack((cos_lat * cos_lon, cos_lat * sin_lon, sin_lat))
+    return rot
+
+
+def _origin_key(origin: np.ndarray) -> tuple[float, float, float]:
+    """Hashable cache key for *origin*."""
+    lat0, lon0, alt0 = np.asarray(origin, dtype=float).reshape(3)
+    return float(lat0), float(lon0), float(alt0)
 
-    ecef_pts = np.vstack([_geodetic_to_ecef(*p) for p in points])
-    d = ecef_pts - np.array([x0, y0, z0])
-    return (rot @ d.T).T  # shape (N, 3)
+
+def geodetic_to_enu(
+    points: np.ndarray, origin: np.ndarray
+) -> np.ndarray:
+    """
+    Convert an array of geodetic coordinates to local ENU.
+
+    :param points: (N, 3) array of [lat, lon, alt] (° , ° , m).
+    :param origin: (3,) array – local origin [lat0, lon0, alt0] (deg, deg, m).
+    :returns: (N, 3) ENU coordinates (m) relative to origin.
+    """
+    ecef0, rot = _enu_frame(*_origin_key(origin))
+    ecef_pts = _geodetic_to_ecef_array(points)
+    logging.debug("Converted %d geodetic point(s) to ENU", len(ecef_pts))
+    return (ecef_pts - ecef0) @ rot.T  # shape (N, 3)
 
 
 def enu_to_geodetic(
@@ -78,21 +174,59 @@ def enu_to_geodetic(
     :param origin: (3,) geodetic origin used earlier.
     :returns: (N, 3) array of [lat, lon, alt].
     """
-    x0, y0, z0 = _geodetic_to_ecef(*origin)
-    lat0, lon0, _ = np.radians(origin)
+    ecef0, rot = _enu_frame(*_origin_key(origin))
+    ecef = ecef0 + _as_points(enu) @ rot  # rot is orthonormal → rot.T is its inverse
+    geo = _ecef_to_geodetic_array(ecef)
+    logging.debug("Converted %d ENU point(s) to geodetic", len(geo))
+    return geo
 
-    sin_lat, cos_lat = np.sin(lat0), np.cos(lat0)
-    sin_lon, cos_lon = np.sin(lon0), np.cos(lon0)
 
-    rot_T = np.array(
-        [
-            [-sin_lon, -sin_lat * cos_lon, cos_lat * cos_lon],
-            [cos_lon, -sin_lat * sin_lon, cos_lat * sin_lon],
-            [0.0, cos_lat, sin_lat],
-        ]
-    )
+def _as_point_sets(points: np.ndarray, n_sets: int) -> np.ndarray:
+    """Coerce *points* to a float (M, K, 3) array with M == *n_sets*."""
+    pts = np.asarray(points, dtype=float)
+    if pts.ndim == 2:
+        pts = pts[:, None, :]
+    if pts.ndim != 3 or pts.shape[0] != n_sets or pts.shape[2] != 3:
+        raise GeodesyError(f"Expected an ({n_sets}, K, 3) array, got shape {pts.shape}")
+    return pts
+
+
+def geodetic_to_enu_batch(
+    points: np.ndarray, origins: np.ndarray
+) -> np.ndarray:
+    """
+    Convert M point sets to M local ENU frames, one origin per set.
+
+    Points and origins go through PyProj together in a single call.
+
+    :param points: (M, K, 3) array of [lat, lon, alt]; (M, 3) means K = 1.
+    :param origins: (M, 3) array – one origin [lat0, lon0, alt0] per set.
+    :returns: (M, K, 3) ENU coordinates (m), set *i* relative to origin *i*.
+    """
+    origins = _as_points(origins)
+    pts = _as_point_sets(points, len(origins))
+    m, k, _ = pts.shape
+    ecef = _geodetic_to_ecef_array(np.concatenate((pts.reshape(-1, 3), origins)))
+    ecef_pts, ecef0 = ecef[: m * k].reshape(m, k, 3), ecef[m * k:]
+    rot = _enu_rotations(origins)
+    logging.debug("Converted %d geodetic point(s) in %d frame(s) to ENU", m * k, m)
+    return np.einsum("mij,mkj->mki", rot, ecef_pts - ecef0[:, None, :])
+
+
+def enu_to_geodetic_batch(
+    enu: np.ndarray, origins: np.ndarray
+) -> np.ndarray:
+    """
+    Convert M ENU point sets back to geodetic, one origin per set.
 
-    ecef_origin = np.array([x0, y0, z0])  # ⬅️ 3-vector
-    ecef_delta = (rot_T @ enu.T).T
-    ecef = ecef_origin + ecef_delta  # ✅ add all three
-    return np.vstack([_ecef_to_geodetic(*row) for row in ecef])
+    :param enu: (M, K, 3) ENU array (m); (M, 3) means K = 1.
+    :param origins: (M, 3) geodetic origins used earlier.
+    :returns: array of [lat, lon, alt] with the shape of *enu*.
+    """
+    origins = _as_points(origins)
+    pts = _as_point_sets(enu, len(origins))
+    ecef0, rot = _geodetic_to_ecef_array(origins), _enu_rotations(origins)
+    ecef = ecef0[:, None, :] + np.einsum("mkj,mji->mki", pts, rot)
+    geo = _ecef_to_geodetic_array(ecef.reshape(-1, 3))
+    logging.debug("Converted %d ENU point(s) in %d frame(s) to geodetic", len(geo), len(origins))
+    return geo.reshape(np.shape(enu))
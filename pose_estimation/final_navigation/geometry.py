@@ -7,7 +7,13 @@ import numpy as np
 from numpy.linalg import svd, norm
 import logging
 
-from geodesy import geodetic_to_enu, enu_to_geodetic
+from .geodesy import (
+    enu_to_geodetic,
+    enu_to_geodetic_batch,
+    geodetic_to_enu,
+    geodetic_to_enu_batch,
+)
+from .metrics import inc, timed
 
 BACK_DISTANCE_METRES: float = 10.0
 UP_DISTANCE_METRES: float = 4.0
@@ -30,6 +36,23 @@ def fit_plane_normal(points_enu: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
     return centroid, normal
 
 
+def fit_plane_normals(points_enu: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Batch :func:`fit_plane_normal`: one stacked SVD over M point sets.
+
+    :param points_enu: (M, N, 3) ENU point sets.
+    :returns: (centroids, normals) – each (M, 3); normals are unit length and
+              oriented like :func:`fit_plane_normal` (never pointing north).
+    """
+    centroids = points_enu.mean(axis=1)
+    _, _, vt = svd(points_enu - centroids[:, None, :])
+    normals = vt[:, -1]
+    normals /= norm(normals, axis=1, keepdims=True)
+    normals[normals[:, 1] > 0] *= -1
+    return centroids, normals
+
+
+@timed("target_coordinate")
 def compute_target_coordinate(
     corner_points_gps: list[list[float]],
     back: float = BACK_DISTANCE_METRES,
@@ -53,18 +76,58 @@ def compute_target_coordinate(
     """
     pts = np.asarray(corner_points_gps, dtype=float)
     origin = pts.mean(axis=0)
-    logging.info(f"Origin: {origin=}")
+    logging.debug("Origin: %s", origin)
 
     enu = geodetic_to_enu(pts, origin)
     logging.debug("ENU points:\n%s", enu)
     enu[:, 2] = enu[:, 2].mean()        # flatten onto common z plane
-    print("ENU points (flattened):\n", enu)
+    logging.debug("ENU points (flattened):\n%s", enu)
 
     centroid, normal = fit_plane_normal(enu)
-    print("Centroid: ", centroid)
-    print("Normal: ", normal)
+    logging.debug("Centroid: %s, normal: %s", centroid, normal)
     target_enu = centroid - back * normal
     target_enu[2] += up                # rise
-    print("Target ENU: ", target_enu)
+    logging.debug("Target ENU: %s", target_enu)
+    inc("targets_computed")
 
     return enu_to_geodetic(target_enu.reshape(1, 3), origin)[0].tolist()
+
+
+@timed("target_coordinates")
+def compute_target_coordinates(
+    corner_points_gps: np.ndarray,
+    back: float | np.ndarray = BACK_DISTANCE_METRES,
+    up: float | np.ndarray = UP_DISTANCE_METRES,
+) -> np.ndarray:
+    """
+    Batch :func:`compute_target_coordinate` for M pallets in one call.
+
+    Same steps, vectorised: every pallet keeps its own ENU origin (its corner
+    centroid), all corners go through one geodesy call each way and all
+    planes are fitted with one stacked SVD.  Nothing is printed.
+
+    :param corner_points_gps: (M, 4, 3) array of [lat, lon, alt] corners.
+    :param back: metres to retreat from each pallet plane, scalar or (M,).
+    :param up: metres to rise vertically, scalar or (M,).
+    :returns: (M, 3) array of [lat, lon, alt] target points.
+    """
+    pts = np.asarray(corner_points_gps, dtype=float)
+    if pts.ndim != 3 or pts.shape[2] != 3:
+        raise ValueError(f"Expected an (M, 4, 3) corner array, got shape {pts.shape}")
+    m = len(pts)
+    back = np.broadcast_to(np.asarray(back, dtype=float), (m,))
+    up = np.broadcast_to(np.asarray(up, dtype=float), (m,))
+    if m == 0:
+        return np.empty((0, 3))
+
+    origins = pts.mean(axis=1)
+    enu = geodetic_to_enu_batch(pts, origins)
+    enu[:, :, 2] = enu[:, :, 2].mean(axis=1, keepdims=True)   # flatten each pallet
+
+    centroids, normals = fit_plane_normals(enu)
+    target_enu = centroids - back[:, None] * normals
+    target_enu[:, 2] += up
+    logging.debug("Computed %d target point(s)", m)
+    inc("targets_computed", m)
+
+    return enu_to_geodetic_batch(target_enu, origins)
@@ -0,0 +1,231 @@
+"""
+Process-wide stage timers and counters, with optional profiling hooks.
+
+    from final_navigation.metrics import inc, timer
+
+    with timer("stream_kmz"):
+        ...
+    inc("waypoints_rendered", len(waypoints))
+
+Counters and timers are always on – a dict update under a lock and two
+``perf_counter`` calls – so they can stay in hot paths.  Everything else is
+switched on through the environment and costs nothing otherwise:
+
+``MAKEATHON_METRICS=<file>``
+    Dump the metrics at interpreter exit: Prometheus text format when
+    *file* ends in ``.prom`` (for the node-exporter textfile collector),
+    JSON otherwise.
+``MAKEATHON_PROFILE=cprofile,tracemalloc``
+    ``cprofile`` writes one ``<stage>.<pid>.prof`` per outermost timed
+    stage into ``MAKEATHON_PROFILE_DIR`` (default ``profiles``);
+    ``tracemalloc`` records the peak traced memory of every outermost
+    stage.  Nested stages are timed but not profiled separately.
+
+This module only depends on the standard library so the KMZ scripts can
+import it without pulling in anything else.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Iterator
+
+ENV_METRICS = "MAKEATHON_METRICS"
+ENV_PROFILE = "MAKEATHON_PROFILE"
+ENV_PROFILE_DIR = "MAKEATHON_PROFILE_DIR"
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+#: Prefix of every Prometheus metric name
+PROM_PREFIX = "makeathon_"
+
+
+def profile_modes() -> set[str]:
+    """Profiling hooks requested through :data:`ENV_PROFILE`."""
+    raw = os.environ.get(ENV_PROFILE, "")
+    return {mode.strip() for mode in raw.split(",") if mode.strip() in PROFILE_MODES}
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and stage timers.
+
+    :ivar counters: ``{name: value}``.
+    :ivar stages:   ``{name: [calls, total seconds, max seconds, peak bytes]}``;
+                    peak bytes stays 0 unless tracemalloc profiling is on.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._exit_hook = False
+        self.counters: dict[str, float] = defaultdict(int)
+        self.stages: dict[str, list[float]] = {}
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """Add *value* to counter *name*."""
+        with self._lock:
+            self.counters[name] += value
+        self._register_exit_dump()
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Time the ``with`` block as one call of stage *name*."""
+        depth = getattr(self._local, "depth", 0)
+        modes = profile_modes() if depth == 0 else set()
+        profiler = tracing = None
+        if "cprofile" in modes:
+            import cProfile
+
+            profiler = cProfile.Profile()
+        if "tracemalloc" in modes:
+            import tracemalloc
+
+            tracing = not tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+        self._local.depth = depth + 1
+        t0 = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            seconds = time.perf_counter() - t0
+            self._local.depth = depth
+            peak = 0
+            if tracing is not None:
+                import tracemalloc
+
+                peak = tracemalloc.get_traced_memory()[1]
+                if tracing:
+                    tracemalloc.stop()
+            self._record(name, seconds, peak)
+            if profiler is not None:
+                folder = Path(os.environ.get(ENV_PROFILE_DIR, "profiles"))
+                folder.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(folder / f"{name}.{os.getpid()}.prof")
+
+    def _record(self, name: str, seconds: float, peak: int) -> None:
+        with self._lock:
+            stage = self.stages.setdefault(name, [0, 0.0, 0.0, 0])
+            stage[0] += 1
+            stage[1] += seconds
+            stage[2] = max(stage[2], seconds)
+            stage[3] = max(stage[3], peak)
+        self._register_exit_dump()
+
+    def timed(self, name: str | None = None):
+        """Decorator: time every call of the function as stage *name* (default: its name)."""
+        def decorate(fn):
+            stage = name or fn.__name__
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def snapshot(self) -> dict:
+        """JSON-serialisable copy of all counters and stages."""
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "time": time.time(),
+            "counters": dict(self.counters),
+            "stages": {name: {"calls": int(calls), "total_s": total, "max_s": worst, "peak_bytes": int(peak)}
+                       for name, (calls, total, worst, peak) in self.stages.items()},
+        }
+
+    def drain(self) -> dict:
+        """
+        :meth:`snapshot` and :meth:`reset` in one step – the metrics
+        recorded since the last drain, e.g. to ship from a worker process
+        to the parent's registry with :meth:`merge`.
+        """
+        with self._lock:
+            snap = self._snapshot()
+            self.counters.clear()
+            self.stages.clear()
+        return snap
+
+    def merge(self, snap: dict) -> None:
+        """Add the counters and stages of a :meth:`snapshot` / :meth:`drain` to this registry."""
+        with self._lock:
+            for name, value in snap["counters"].items():
+                self.counters[name] += value
+            for name, other in snap["stages"].items():
+                stage = self.stages.setdefault(name, [0, 0.0, 0.0, 0])
+                stage[0] += other["calls"]
+                stage[1] += other["total_s"]
+                stage[2] = max(stage[2], other["max_s"])
+                stage[3] = max(stage[3], other["peak_bytes"])
+        self._register_exit_dump()
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format of :meth:`snapshot`."""
+        snap = self.snapshot()
+        lines = []
+        for name, value in sorted(snap["counters"].items()):
+            metric = f"{PROM_PREFIX}{name}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value:g}"]
+        if snap["stages"]:
+            for suffix, key, kind in (("stage_seconds_sum", "total_s", "counter"),
+                                      ("stage_seconds_count", "calls", "counter"),
+                                      ("stage_seconds_max", "max_s", "gauge"),
+                                      ("stage_peak_bytes", "peak_bytes", "gauge")):
+                metric = PROM_PREFIX + suffix
+                lines.append(f"# TYPE {metric} {kind}")
+                lines += [f'{metric}{{stage="{name}"}} {stage[key]:g}'
+                          for name, stage in sorted(snap["stages"].items())]
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str | Path) -> Path:
+        """
+        Atomically write the metrics to *path*: Prometheus text format for
+        ``*.prom``, JSON otherwise.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        text = self.to_prometheus() if path.suffix == ".prom" else json.dumps(self.snapshot(), indent=2)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+        return path
+
+    def reset(self) -> None:
+        """Drop all counters and stages."""
+        with self._lock:
+            self.counters.clear()
+            self.stages.clear()
+
+    def _register_exit_dump(self) -> None:
+        """Dump to :data:`ENV_METRICS` at exit, registered on first use."""
+        if self._exit_hook:
+            return
+        self._exit_hook = True
+        target = os.environ.get(ENV_METRICS)
+        if target:
+            atexit.register(self.dump, target)
+
+
+#: The process-wide registry
+METRICS = Metrics()
+
+inc = METRICS.inc
+timer = METRICS.timer
+timed = METRICS.timed
@@ -0,0 +1,229 @@
+"""
+Single-view pallet placement: intersect every detection's pixel ray with a
+known pallet plane.
+
+Monocular alternative to ``rank_pallet_points`` + :class:`Triangulator`:
+no rank matching between images and no second view is needed, so every
+frame that shows a pallet contributes – including the ones the rank
+matching drops.  All boxes of all images are projected at once:
+
+1.  Camera centres → local ENU (one geodesy call).
+2.  Ray of every box centre: ``d = Rᵀ K⁻¹ [u, v, 1]ᵀ`` with K from
+    :class:`CameraIntrinsics` and R from the camera heading and gimbal
+    pitch (:func:`triangulation.camera_rotation`).
+3.  Intersection with the plane ``n · X = n · p₀``:
+    ``X = C + d · n·(p₀ − C) / n·d``; rays parallel to or pointing away
+    from the plane give NaN.
+4.  :func:`pallet_merge.merge_pallets` collapses the per-image estimates.
+
+The photos are oblique: the README capture geometry puts the camera
+:data:`CAPTURE_DISTANCE_M` in front of and :data:`CAPTURE_HEIGHT_M` above
+the pallets, so the gimbal pitch defaults to :data:`CAPTURE_PITCH_DEG`
+and the plane is horizontal, ``camera_height`` metres below each camera
+(or at a fixed ellipsoid altitude ``plane_alt``); the optical axis then
+meets it :data:`CAPTURE_DISTANCE_M` in front of the camera.
+
+The heading has no default: it places every view and is not in the
+detections.  Missions written by ``pipeline/flight_pipeline.py`` fly one
+heading and pitch for the whole row, which is what the projector
+assumes.  ``combined_with_gps.csv`` carries no attitude and its photos
+were not taken at one heading – no constant heading/pitch brings its
+single views together – so it can only be located with triangulation.
+
+With ``refine=True`` the clusters found in step 4 serve as multi-view
+correspondences: every cluster seen from two or more images is
+triangulated from all of its views and replaces the single-view
+estimates.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from final_navigation.geodesy import enu_to_geodetic, geodetic_to_enu
+from pallet_merge import MERGE_RADIUS_M, MERGED_COLUMNS, cluster_points, merge_pallets
+from triangulation import CameraIntrinsics, Triangulator, camera_rotation
+
+#: README capture geometry: horizontal distance (m) from the camera to the pallets …
+CAPTURE_DISTANCE_M = 10.0
+#: … and camera height above the pallet plane (m)
+CAPTURE_HEIGHT_M = 5.0
+#: Gimbal pitch (deg) whose optical axis meets the pallets at that geometry
+CAPTURE_PITCH_DEG = -math.degrees(math.atan2(CAPTURE_HEIGHT_M, CAPTURE_DISTANCE_M))
+
+PROJECTED_COLUMNS = ["image", "x", "y", "cam_lat", "cam_lon", "cam_alt", "lat", "lon", "alt"]
+
+
+@dataclass
+class GroundProjector:
+    """
+    Reusable single-view projector.
+
+    :param intrinsics:    Camera intrinsics shared by all views.
+    :param heading:       Camera heading (deg clockwise from north) shared by
+                          all views; required unless *rotation* is given.
+    :param pitch:         Gimbal pitch (deg, negative looks down).
+    :param rotation:      3×3 world(ENU) → camera rotation shared by all
+                          views; overrides *heading* / *pitch*.
+    :param plane_normal:  Pallet plane normal in ENU (default: up).
+    :param plane_alt:     Ellipsoid altitude of the plane; ``None`` puts it
+                          *camera_height* below every camera.
+    :param camera_height: Camera height above the plane (m) when
+                          *plane_alt* is not given.
+    """
+    intrinsics: CameraIntrinsics = field(default_factory=CameraIntrinsics)
+    heading: float | None = None
+    pitch: float = CAPTURE_PITCH_DEG
+    rotation: np.ndarray | None = None
+    plane_normal: np.ndarray = field(default_factory=lambda: np.array([0.0, 0.0, 1.0]))
+    plane_alt: float | None = None
+    camera_height: float = CAPTURE_HEIGHT_M
+
+    def __post_init__(self):
+        if self.rotation is None:
+            if self.heading is None:
+                raise ValueError("Single-view projection needs the camera heading (or a rotation); "
+                                 "use triangulation when the photos were not taken at one known heading")
+            self.rotation = camera_rotation(self.heading, self.pitch)
+        self._K_inv = np.linalg.inv(self.intrinsics.K)
+        self.plane_normal = np.asarray(self.plane_normal, dtype=float)
+        self.plane_normal = self.plane_normal / np.linalg.norm(self.plane_normal)
+
+    def rays(self, pix: np.ndarray) -> np.ndarray:
+        """(N, 3) ENU ray directions of (N, 2) pixels."""
+        cam_dirs = np.c_[pix, np.ones(len(pix))] @ self._K_inv.T
+        return cam_dirs @ self.rotation                  # Rᵀ d, row-wise
+
+    def project(self, pix: np.ndarray, cams: np.ndarray, origin: np.ndarray) -> np.ndarray:
+        """
+        Intersect the rays of *pix* seen from *cams* with the pallet plane.
+
+        :param pix:    (N, 2) pixel coordinates.
+        :param cams:   (N, 3) camera ``lat, lon, alt`` of each pixel.
+        :param origin: ENU origin ``[lat, lon, alt]``.
+        :returns:      (N, 3) ENU points; NaN where the ray misses the plane.
+        """
+        centres = geodetic_to_enu(cams, origin)
+        d = self.rays(pix)
+        n = self.plane_normal
+        if self.plane_alt is None:
+            p0 = centres - self.camera_height * n
+        else:
+            p0 = np.broadcast_to([0.0, 0.0, self.plane_alt - origin[2]], centres.shape)
+        denom = d @ n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.einsum("ij,j->i", p0 - centres, n) / denom
+        t[~(t > 0) | (np.abs(denom) < 1e-12)] = np.nan
+        return centres + t[:, None] * d
+
+    def project_boxes(self, df: pd.DataFrame, classes: str | tuple[str, ...] = "pallets") -> pd.DataFrame:
+        """
+        Project the centre of every box of *classes*.
+
+        :param df: detections with columns
+                   ``image, class, x1, y1, x2, y2, latitude, longitude, altitude``.
+        :returns:  DataFrame ``image, x, y, cam_lat, cam_lon, cam_alt, lat, lon, alt``,
+                   one row per box with camera GPS; ``lat/lon/alt`` is the
+                   projected point (NaN if the ray misses the plane).
+        """
+        classes = (classes,) if isinstance(classes, str) else classes
+        boxes = df[df["class"].isin(classes)].dropna(subset=["latitude", "longitude", "altitude"])
+        if boxes.empty:
+            return pd.DataFrame(columns=PROJECTED_COLUMNS)
+
+        x = 0.5 * (boxes["x1"].to_numpy(dtype=float) + boxes["x2"].to_numpy(dtype=float))
+        y = 0.5 * (boxes["y1"].to_numpy(dtype=float) + boxes["y2"].to_numpy(dtype=float))
+        cams = boxes[["latitude", "longitude", "altitude"]].to_numpy(dtype=float)
+        origin = cams.mean(axis=0)
+        enu = self.project(np.c_[x, y], cams, origin)
+
+        geo = np.full_like(enu, np.nan)
+        ok = np.isfinite(enu).all(axis=1)
+        if ok.any():
+            geo[ok] = enu_to_geodetic(enu[ok], origin)
+        return pd.DataFrame({
+            "image": boxes["image"].to_numpy(),
+            "x": x,
+            "y": y,
+            "cam_lat": cams[:, 0],
+            "cam_lon": cams[:, 1],
+            "cam_alt": cams[:, 2],
+            "lat": geo[:, 0],
+            "lon": geo[:, 1],
+            "alt": geo[:, 2],
+        })
+
+
+def refine_clusters(views: pd.DataFrame,
+                    radius: float = MERGE_RADIUS_M,
+                    triangulator: Triangulator | None = None) -> pd.DataFrame:
+    """
+    Replace single-view estimates by a multi-view triangulation per cluster.
+
+    Clusters of projected points (same linkage as :func:`merge_pallets`)
+    give the correspondences; clusters seen from at least two images are
+    triangulated from all of their views.
+
+    :param views: Output of :meth:`GroundProjector.project_boxes`.
+    :returns:     Points for :func:`merge_pallets`: ``rank, lat, lon, alt,
+                  n_views, reproj_err_px`` – one row per refined cluster plus
+                  the unrefined single-view rows.
+    """
+    views = views.dropna(subset=["lat", "lon", "alt"]).reset_index(drop=True)
+    single = pd.DataFrame({"rank": np.arange(len(views)), "lat": views["lat"], "lon": views["lon"],
+                           "alt": views["alt"], "n_views": 1, "reproj_err_px": 0.0})
+    if views.empty:
+        return single
+
+    geo = views[["lat", "lon", "alt"]].to_numpy(dtype=float)
+    labels = cluster_points(geodetic_to_enu(geo, geo.mean(axis=0)), radius)
+    n_images = pd.Series(views["image"].astype(str).to_numpy()).groupby(labels).nunique()
+    multi = n_images.index[n_images.to_numpy() >= 2].to_numpy()
+    in_multi = np.isin(labels, multi)
+    if not in_multi.any():
+        return single
+
+    triangulator = triangulator or Triangulator()
+    ranked = pd.DataFrame({
+        "rank": labels[in_multi],
+        "image": views["image"].to_numpy()[in_multi],
+        "x": views["x"].to_numpy()[in_multi],
+        "y": views["y"].to_numpy()[in_multi],
+        "lat": views["cam_lat"].to_numpy()[in_multi],
+        "lon": views["cam_lon"].to_numpy()[in_multi],
+        "alt": views["cam_alt"].to_numpy()[in_multi],
+    })
+    refined = triangulator.triangulate(ranked).dropna(subset=["lat", "lon", "alt"])
+    done = refined["rank"].to_numpy()
+    first_row = pd.Series(np.arange(len(views))).groupby(labels).min()
+    refined["rank"] = first_row.loc[done].to_numpy()                  # keep first-sighting order
+    keep_single = ~np.isin(labels, done)
+    return pd.concat([refined, single[keep_single]], ignore_index=True)
+
+
+def locate_pallets(df: pd.DataFrame,
+                   projector: GroundProjector,
+                   radius: float = MERGE_RADIUS_M,
+                   refine: bool = False) -> pd.DataFrame:
+    """
+    One position per physical pallet from single views.
+
+    :param df: ``combined_with_gps`` detections.
+    :param projector: Camera model (heading, pitch) and plane.
+    :param radius: Merge distance (m).
+    :param refine: Triangulate clusters seen from two or more images.
+    :returns: :data:`pallet_merge.MERGED_COLUMNS`; ``rank`` is the order of
+              first sighting.
+    """
+    views = projector.project_boxes(df)
+    if refine:
+        points = refine_clusters(views, radius, Triangulator(projector.intrinsics, projector.rotation))
+    else:
+        points = views.dropna(subset=["lat", "lon", "alt"]).reset_index(drop=True)
+        points = points[["lat", "lon", "alt"]].assign(rank=np.arange(len(points)))
+    if points.empty:
+        return pd.DataFrame(columns=MERGED_COLUMNS)
+    return merge_pallets(points, radius)
@@ -0,0 +1,123 @@
+"""
+One target per physical pallet from overlapping triangulations.
+
+Overlapping frames see the same pallet many times and left-to-right ranks
+do not always agree between images, so :meth:`Triangulator.triangulate`
+returns several estimates of one pallet.  :func:`merge_pallets` collapses
+them in O(N log N):
+
+1.  All estimates go to a local ENU frame (one geodesy call).
+2.  A KD-tree finds every pair closer than *radius* metres; connected
+    components of that graph are the clusters.
+3.  Each cluster is merged into a weighted (per-axis) median position –
+    robust against a single bad triangulation.  The weight of an estimate
+    is its view count divided by ``1 + reprojection error``.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+from final_navigation.geodesy import enu_to_geodetic, geodetic_to_enu
+
+#: Estimates closer than this (m) belong to the same pallet.  Must stay
+#: below the pallet spacing: clusters are single-linkage and can chain.
+MERGE_RADIUS_M = 0.75
+
+MERGED_COLUMNS = ["rank", "lat", "lon", "alt", "n_estimates", "n_views", "weight", "spread_m"]
+
+
+def estimate_weights(points: pd.DataFrame) -> np.ndarray:
+    """
+    Per-estimate weight ``n_views / (1 + reproj_err_px)``; columns that are
+    missing count as one view / zero error.
+    """
+    n_views = points["n_views"].to_numpy(dtype=float) if "n_views" in points else np.ones(len(points))
+    err = points["reproj_err_px"].to_numpy(dtype=float) if "reproj_err_px" in points else np.zeros(len(points))
+    return n_views / (1.0 + np.nan_to_num(err, nan=0.0))
+
+
+def cluster_points(enu: np.ndarray, radius: float = MERGE_RADIUS_M) -> np.ndarray:
+    """
+    Single-linkage cluster labels (0..K-1) of (N, 3) ENU points.
+    """
+    n = len(enu)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    pairs = cKDTree(enu).query_pairs(radius, output_type="ndarray")
+    graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    return labels
+
+
+def weighted_median(values: np.ndarray, weights: np.ndarray, labels: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Per-group weighted median of (N, D) *values*, vectorised over groups.
+
+    :returns: (n_groups, D) array.
+    """
+    out = np.empty((n_groups, values.shape[1]))
+    totals = np.bincount(labels, weights=weights, minlength=n_groups)
+    start = np.concatenate(([0.0], np.cumsum(totals)[:-1]))       # cumulative weight before each group
+    for k in range(values.shape[1]):
+        order = np.lexsort((values[:, k], labels))
+        lab = labels[order]
+        within = np.cumsum(weights[order]) - start[lab]
+        hit = np.flatnonzero(within >= 0.5 * totals[lab])
+        _, first = np.unique(lab[hit], return_index=True)
+        out[:, k] = values[order[hit[first]], k]
+    return out
+
+
+def merge_pallets(points: pd.DataFrame, radius: float = MERGE_RADIUS_M) -> pd.DataFrame:
+    """
+    Collapse duplicate pallet estimates into one row per physical pallet.
+
+    :param points: Rows with ``lat, lon, alt`` (e.g. the output of
+                   :meth:`triangulation.Triangulator.triangulate`); optional
+                   ``rank``, ``n_views``, ``reproj_err_px``.  Rows without
+                   coordinates are ignored.
+    :param radius: Merge distance in metres.
+    :returns: DataFrame ``rank, lat, lon, alt, n_estimates, n_views, weight,
+              spread_m`` ordered by ``rank`` (the smallest rank of the
+              cluster); ``spread_m`` is the RMS distance of the estimates to
+              the merged position.
+    """
+    points = points.dropna(subset=["lat", "lon", "alt"])
+    if points.empty:
+        return pd.DataFrame(columns=MERGED_COLUMNS)
+
+    geo = points[["lat", "lon", "alt"]].to_numpy(dtype=float)
+    origin = geo.mean(axis=0)
+    enu = geodetic_to_enu(geo, origin)
+
+    labels = cluster_points(enu, radius)
+    n_groups = int(labels.max()) + 1
+    weights = np.maximum(estimate_weights(points), np.finfo(float).tiny)
+
+    merged = weighted_median(enu, weights, labels, n_groups)
+    sq = np.sum((enu - merged[labels]) ** 2, axis=1)
+    n_est = np.bincount(labels, minlength=n_groups)
+    spread = np.sqrt(np.bincount(labels, weights=sq, minlength=n_groups) / n_est)
+
+    ranks = points["rank"].to_numpy() if "rank" in points else np.arange(len(points))
+    first_rank = np.full(n_groups, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(first_rank, labels, ranks.astype(np.int64))
+    n_views = (np.bincount(labels, weights=points["n_views"].to_numpy(dtype=float), minlength=n_groups)
+               if "n_views" in points else n_est)
+
+    out_geo = enu_to_geodetic(merged, origin)
+    out = pd.DataFrame({
+        "rank": first_rank,
+        "lat": out_geo[:, 0],
+        "lon": out_geo[:, 1],
+        "alt": out_geo[:, 2],
+        "n_estimates": n_est,
+        "n_views": np.asarray(n_views).astype(np.int64),
+        "weight": np.bincount(labels, weights=weights, minlength=n_groups),
+        "spread_m": spread,
+    })
+    return out.sort_values("rank", kind="stable").reset_index(drop=True)
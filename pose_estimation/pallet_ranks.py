@@ -0,0 +1,151 @@
+"""
+Vectorised left-to-right pallet ranking across images.
+
+Array version of ``process_images`` from geometry_2d.ipynb.  Every step –
+barcode visibility, pallet line direction, optical-centre distance and the
+left-to-right rank – is computed for all images at once with NumPy
+``bincount``/``lexsort`` instead of a ``groupby`` loop with one sklearn
+PCA per image.  The principal direction of each image's pallet points is
+the closed-form eigenvector of its 2×2 covariance matrix.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+#: Columns of the ranked result
+RANK_COLUMNS = ["rank", "image", "x", "y", "lat", "lon", "alt"]
+
+MAX_LINE_ANGLE_DEG: float = 45.0
+
+
+def _group_mean(codes: np.ndarray, values: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Per-group mean of *values*; NaN for empty groups."""
+    sums = np.bincount(codes, weights=values, minlength=len(counts))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+
+def line_angles_to_horizontal(codes: np.ndarray, x: np.ndarray, y: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Angle (deg, 0–90) between each group's principal 2-D direction and the
+    image horizontal axis.
+
+    For the covariance ``[[a, b], [b, c]]`` the major eigenvector makes the
+    angle ``θ = ½·atan2(2b, a − c)`` with the x axis.
+
+    :param codes: (N,) group index of every point.
+    :param x, y:  (N,) point coordinates.
+    :param n_groups: number of groups.
+    :returns: (n_groups,) angles; NaN for empty groups.
+    """
+    counts = np.bincount(codes, minlength=n_groups).astype(float)
+    dx = x - _group_mean(codes, x, counts)[codes]
+    dy = y - _group_mean(codes, y, counts)[codes]
+    a = np.bincount(codes, weights=dx * dx, minlength=n_groups)
+    b = np.bincount(codes, weights=dx * dy, minlength=n_groups)
+    c = np.bincount(codes, weights=dy * dy, minlength=n_groups)
+    theta = 0.5 * np.arctan2(2.0 * b, a - c)
+    angles = np.degrees(np.arccos(np.clip(np.abs(np.cos(theta)), 0.0, 1.0)))
+    angles[counts == 0] = np.nan
+    return angles
+
+
+def rank_pallet_points(df: pd.DataFrame,
+                       image_width_px: int,
+                       image_height_px: int,
+                       barcode_vis_thresh: float = 0.7) -> pd.DataFrame:
+    """
+    Pick the pallet line nearest the optical centre in every usable image and
+    rank its points left to right.
+
+    An image is used when it shows at least ``barcode_vis_thresh`` × the
+    maximum per-image barcode count, has two or more pallets, and its
+    ``(x1, y1)`` pallet line is closer to horizontal than 45°.  Of the two
+    candidate lines – ``(x1, y1)`` and ``(x2, y2)`` corners – the one with
+    the smaller mean distance to the optical centre is kept.
+
+    :param df: detections with columns
+               ``image, class, x1, x2, y1, y2, latitude, longitude, altitude``
+               where ``class`` is ``'barcode'`` or ``'pallets'``.
+    :param image_width_px:  image width (optical centre x = width / 2).
+    :param image_height_px: image height (optical centre y = height / 2).
+    :param barcode_vis_thresh: fraction of the max barcode count an image needs.
+    :returns: DataFrame ``rank, image, x, y, lat, lon, alt`` ordered by
+              ``(rank, image)``; ``lat/lon/alt`` are the camera position.
+    """
+    codes, images = pd.factorize(df["image"], sort=True)
+    n_img = len(images)
+    cls = df["class"].to_numpy()
+
+    # 1) Barcode visibility threshold
+    bc_counts = np.bincount(codes[cls == "barcode"], minlength=n_img)
+    max_barcodes = int(bc_counts.max()) if bc_counts.any() else 0
+    keep = bc_counts >= max_barcodes * barcode_vis_thresh
+
+    # 2) Pallet rows of images that pass
+    pal_rows = np.flatnonzero((cls == "pallets") & keep[codes])
+    pal_codes = codes[pal_rows]
+    keep &= np.bincount(pal_codes, minlength=n_img) >= 2
+    sel = keep[pal_codes]
+    pal_rows, pal_codes = pal_rows[sel], pal_codes[sel]
+
+    x1 = df["x1"].to_numpy(dtype=float)[pal_rows]
+    y1 = df["y1"].to_numpy(dtype=float)[pal_rows]
+    x2 = df["x2"].to_numpy(dtype=float)[pal_rows]
+    y2 = df["y2"].to_numpy(dtype=float)[pal_rows]
+
+    # 3) Line through the (x1, y1) corners must be roughly horizontal
+    angles = line_angles_to_horizontal(pal_codes, x1, y1, n_img)
+    with np.errstate(invalid="ignore"):
+        keep &= angles < MAX_LINE_ANGLE_DEG
+
+    # 4) Choose the line closer to the optical centre
+    cx, cy = image_width_px / 2.0, image_height_px / 2.0
+    counts = np.bincount(pal_codes, minlength=n_img).astype(float)
+    d1 = _group_mean(pal_codes, np.hypot(x1 - cx, y1 - cy), counts)
+    d2 = _group_mean(pal_codes, np.hypot(x2 - cx, y2 - cy), counts)
+    use_first = (d1 < d2)[pal_codes]
+    x = np.where(use_first, x1, x2)
+    y = np.where(use_first, y1, y2)
+
+    sel = keep[pal_codes]
+    pal_rows, pal_codes, x, y = pal_rows[sel], pal_codes[sel], x[sel], y[sel]
+
+    # 5) Left-to-right rank within each image
+    order = np.lexsort((x, pal_codes))
+    pal_codes, x, y = pal_codes[order], x[order], y[order]
+    starts = np.searchsorted(pal_codes, pal_codes, side="left")
+    rank = np.arange(len(pal_codes)) - starts
+
+    # 6) Camera position = first row of each image
+    _, first_row = np.unique(codes, return_index=True)
+    cam = df[["latitude", "longitude", "altitude"]].to_numpy(dtype=float)[first_row]
+
+    out = pd.DataFrame({
+        "rank": rank.astype(np.int32),
+        "image": pd.Categorical.from_codes(pal_codes, categories=images),
+        "x": x,
+        "y": y,
+        "lat": cam[pal_codes, 0],
+        "lon": cam[pal_codes, 1],
+        "alt": cam[pal_codes, 2],
+    })
+    order = np.lexsort((pal_codes, rank))
+    return out.iloc[order].reset_index(drop=True)
+
+
+def ranks_to_dicts(ranked: pd.DataFrame) -> list[dict]:
+    """
+    Convert :func:`rank_pallet_points` output to the legacy ``final_list``
+    layout: one dict per rank, ``{image: {"point": (x, y), "lat", "lon", "alt"}}``.
+    """
+    final_list = []
+    for _, grp in ranked.groupby("rank", sort=True):
+        final_list.append({
+            img: {"point": (x, y), "lat": lat, "lon": lon, "alt": alt}
+            for img, x, y, lat, lon, alt in zip(
+                grp["image"].astype(str), grp["x"], grp["y"], grp["lat"], grp["lon"], grp["alt"]
+            )
+        })
+    return final_list
@@ -0,0 +1,297 @@
+"""
+Multi-view DLT triangulation of ranked pallet points.
+
+Replacement for ``get_3d`` in triangulate_into_3d.ipynb.  The camera model
+(intrinsics + orientation) is built once per :class:`Triangulator`, every
+camera centre is converted to a local ENU frame in a single geodesy call,
+and every rank is solved from *all* of its views with one stacked SVD:
+
+    for each view i of a point:   u_i × (P_i X) = 0
+    → two rows per view, zero-padded to the largest view count,
+    → ``np.linalg.svd`` over the whole (M, 2V, 4) stack.
+
+Image points are normalised with K⁻¹ before the SVD for conditioning.
+Per-point RMS reprojection error (pixels) is returned alongside.
+
+:class:`IncrementalTriangulator` solves the same system for views that
+arrive one image at a time (live mode, ``pipeline/watch.py``).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from final_navigation.geodesy import enu_to_geodetic, geodetic_to_enu
+
+#: World (ENU) → camera rotation of a nadir camera with image-up = North:
+#: camera x = East, camera y = South, optical axis = Down.
+NADIR_ROTATION = np.array([
+    [1.0, 0.0, 0.0],
+    [0.0, -1.0, 0.0],
+    [0.0, 0.0, -1.0],
+])
+
+
+def camera_rotation(heading: float, pitch: float) -> np.ndarray:
+    """
+    3×3 world(ENU) → camera rotation of a camera without roll.
+
+    Camera axes are x right, y down, z along the optical axis, as in
+    :data:`NADIR_ROTATION` (``camera_rotation(0, -90)``).
+
+    :param heading: Optical axis direction (deg clockwise from north).
+    :param pitch:   Gimbal pitch (deg, negative looks down).
+    """
+    h, p = np.radians(heading), np.radians(pitch)
+    forward = np.array([np.sin(h) * np.cos(p), np.cos(h) * np.cos(p), np.sin(p)])
+    right = np.array([np.cos(h), -np.sin(h), 0.0])
+    return np.stack((right, np.cross(forward, right), forward))
+
+
+TRIANGULATED_COLUMNS = ["rank", "lat", "lon", "alt", "n_views", "reproj_err_px"]
+
+
+@dataclass(frozen=True)
+class CameraIntrinsics:
+    """
+    Pin-hole intrinsics (defaults: DJI M4TD wide camera).
+
+    :param sensor_width_mm:  Sensor width.
+    :param sensor_height_mm: Sensor height.
+    :param focal_length_mm:  Focal length.
+    :param image_width_px:   Image width.
+    :param image_height_px:  Image height.
+    """
+    sensor_width_mm: float = 7.6
+    sensor_height_mm: float = 5.7
+    focal_length_mm: float = 7.0
+    image_width_px: int = 4032
+    image_height_px: int = 3024
+
+    @property
+    def K(self) -> np.ndarray:
+        """3×3 camera matrix."""
+        fx = (self.focal_length_mm / self.sensor_width_mm) * self.image_width_px
+        fy = (self.focal_length_mm / self.sensor_height_mm) * self.image_height_px
+        cx, cy = self.image_width_px / 2, self.image_height_px / 2
+        return np.array([[fx, 0, cx],
+                         [0, fy, cy],
+                         [0, 0, 1]])
+
+
+@dataclass
+class Triangulator:
+    """
+    Reusable multi-view triangulator.
+
+    :param intrinsics: Camera intrinsics shared by all views.
+    :param rotation:   3×3 world(ENU) → camera rotation shared by all views.
+    """
+    intrinsics: CameraIntrinsics = field(default_factory=CameraIntrinsics)
+    rotation: np.ndarray = field(default_factory=lambda: NADIR_ROTATION.copy())
+
+    def __post_init__(self):
+        self.K = self.intrinsics.K
+        self._K_inv = np.linalg.inv(self.K)
+
+    def projections(self, centres: np.ndarray) -> np.ndarray:
+        """(R, 3, 4) normalised projection matrices ``[R | -R C]`` of ENU camera centres."""
+        R = self.rotation
+        return np.concatenate(
+            (np.broadcast_to(R, (len(centres), 3, 3)), (-centres @ R.T)[:, :, None]), axis=2
+        )
+
+    def dlt_rows(self, pix: np.ndarray, P: np.ndarray) -> np.ndarray:
+        """
+        The two DLT equations ``u·P₃ − P₁`` and ``v·P₃ − P₂`` of every view.
+
+        :param pix: (R, 2) pixel coordinates.
+        :param P:   (R, 3, 4) matrices from :meth:`projections`.
+        :returns:   (R, 2, 4) rows.
+        """
+        uv = np.c_[pix, np.ones(len(pix))] @ self._K_inv.T
+        u, v = uv[:, 0:1] / uv[:, 2:3], uv[:, 1:2] / uv[:, 2:3]
+        return np.stack((u * P[:, 2] - P[:, 0], v * P[:, 2] - P[:, 1]), axis=1)
+
+    def reprojection_sq(self, X: np.ndarray, P: np.ndarray, pix: np.ndarray) -> np.ndarray:
+        """Squared pixel reprojection error of every view of (R, 3) points *X*."""
+        proj = np.einsum("ij,rjk,rk->ri", self.K, P, np.c_[X, np.ones(len(X))])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sum((proj[:, :2] / proj[:, 2:3] - pix) ** 2, axis=1)
+
+    def triangulate(self, ranked: pd.DataFrame) -> pd.DataFrame:
+        """
+        Triangulate every rank from all of its views.
+
+        :param ranked: Rows ``rank, image, x, y, lat, lon, alt`` as produced by
+                       :func:`pallet_ranks.rank_pallet_points` (``lat/lon/alt``
+                       is the camera position of the row's image).
+        :returns: DataFrame ``rank, lat, lon, alt, n_views, reproj_err_px``,
+                  one row per rank.  Ranks seen in fewer than two views get
+                  NaN coordinates.
+        """
+        if ranked.empty:
+            return pd.DataFrame(columns=TRIANGULATED_COLUMNS)
+
+        ranks, point_idx = np.unique(ranked["rank"].to_numpy(), return_inverse=True)
+        n_pts = len(ranks)
+
+        # 1) Camera centres → local ENU (one geodesy call)
+        cams = ranked[["lat", "lon", "alt"]].to_numpy(dtype=float)
+        origin = cams.mean(axis=0)
+        centres = geodetic_to_enu(cams, origin)                      # (R, 3)
+
+        # 2) Normalised projection matrices [R | -R C] and DLT rows
+        P = self.projections(centres)                                # (R, 3, 4)
+        pix = ranked[["x", "y"]].to_numpy(dtype=float)
+        rows = self.dlt_rows(pix, P)                                 # (R, 2, 4)
+
+        # 3) Slot every view into a zero-padded (M, 2V, 4) DLT stack
+        order = np.argsort(point_idx, kind="stable")
+        sorted_idx = point_idx[order]
+        slot = np.empty(len(order), dtype=int)
+        slot[order] = np.arange(len(order)) - np.searchsorted(sorted_idx, sorted_idx)
+        n_views = np.bincount(point_idx, minlength=n_pts)
+
+        A = np.zeros((n_pts, 2 * n_views.max(), 4))
+        A[point_idx, 2 * slot] = rows[:, 0]
+        A[point_idx, 2 * slot + 1] = rows[:, 1]
+
+        _, _, vt = np.linalg.svd(A, full_matrices=False)             # U: (M, 2V, 4), not (M, 2V, 2V)
+        Xh = vt[:, -1]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            X = Xh[:, :3] / Xh[:, 3:4]                               # (M, 3) ENU
+        X[n_views < 2] = np.nan
+
+        # 4) RMS reprojection error per point (pixels)
+        resid = self.reprojection_sq(X[point_idx], P, pix)
+        err = np.sqrt(np.bincount(point_idx, weights=resid, minlength=n_pts) / n_views)
+
+        # 5) Back to geodetic (one geodesy call)
+        geo = np.full((n_pts, 3), np.nan)
+        ok = np.isfinite(X).all(axis=1)
+        if ok.any():
+            geo[ok] = enu_to_geodetic(X[ok], origin)
+
+        return pd.DataFrame({
+            "rank": ranks,
+            "lat": geo[:, 0],
+            "lon": geo[:, 1],
+            "alt": geo[:, 2],
+            "n_views": n_views,
+            "reproj_err_px": err,
+        })
+
+
+@dataclass
+class IncrementalTriangulator(Triangulator):
+    """
+    Running :class:`Triangulator` for images that arrive (or drop out) one
+    at a time.
+
+    The DLT solution of a point is the eigenvector of the smallest
+    eigenvalue of ``AᵀA``, and ``AᵀA`` is a sum over views.  Every rank
+    therefore keeps its 4×4 normal matrix: :meth:`add` / :meth:`remove`
+    touch only the views of one image and :meth:`solve` is one batched
+    ``eigh`` over (M, 4, 4).  The ENU origin stays fixed (the first camera
+    added, unless given) so accumulated matrices remain valid; at solve
+    time they are moved to the mean camera centre (``TᵀNT``), the frame
+    :meth:`Triangulator.triangulate` solves in, so both agree.
+
+    :param origin: ENU origin ``[lat, lon, alt]``.
+    """
+    origin: np.ndarray | None = None
+
+    def __post_init__(self):
+        super().__post_init__()
+        self._normal: dict[int, np.ndarray] = {}
+        self._count: dict[int, int] = {}
+        self._views: dict[str, tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._centre_sum = np.zeros(3)
+        self._n_views = 0
+
+    @property
+    def images(self) -> set[str]:
+        return set(self._views)
+
+    def add(self, image: str, ranked: pd.DataFrame) -> set[int]:
+        """
+        Add (or replace) the views of one image.
+
+        :param ranked: The image's rows of :func:`pallet_ranks.rank_pallet_points`.
+        :returns: Ranks whose solution changed.
+        """
+        touched = self.remove(image)
+        if ranked.empty:
+            return touched
+        cams = ranked[["lat", "lon", "alt"]].to_numpy(dtype=float)
+        if self.origin is None:
+            self.origin = cams[0].copy()
+        centres = geodetic_to_enu(cams, self.origin)
+        P = self.projections(centres)
+        pix = ranked[["x", "y"]].to_numpy(dtype=float)
+        rows = self.dlt_rows(pix, P)
+        normal = np.einsum("rki,rkj->rij", rows, rows)              # (R, 4, 4)
+        ranks = ranked["rank"].to_numpy().astype(np.int64)
+        for rank, n in zip(ranks.tolist(), normal):
+            self._normal[rank] = self._normal.get(rank, 0.0) + n
+            self._count[rank] = self._count.get(rank, 0) + 1
+        self._views[image] = (ranks, P, pix, normal)
+        self._centre_sum += centres.sum(axis=0)
+        self._n_views += len(centres)
+        return touched | set(ranks.tolist())
+
+    def remove(self, image: str) -> set[int]:
+        """Drop the views of *image*; returns the ranks that changed."""
+        if image not in self._views:
+            return set()
+        ranks, P, _, normal = self._views.pop(image)
+        self._centre_sum -= self._centres(P).sum(axis=0)
+        self._n_views -= len(P)
+        for rank, n in zip(ranks.tolist(), normal):
+            self._count[rank] -= 1
+            if self._count[rank] == 0:
+                del self._count[rank], self._normal[rank]
+            else:
+                self._normal[rank] = self._normal[rank] - n
+        return set(ranks.tolist())
+
+    def _centres(self, P: np.ndarray) -> np.ndarray:
+        """Camera centres back from ``[R | -R C]``."""
+        return -P[:, :, 3] @ self.rotation
+
+    def solve(self) -> pd.DataFrame:
+        """Current estimate of every rank, same columns as :meth:`Triangulator.triangulate`."""
+        if not self._normal:
+            return pd.DataFrame(columns=TRIANGULATED_COLUMNS)
+        ranks = np.array(sorted(self._normal), dtype=np.int64)
+        n_views = np.array([self._count[r] for r in ranks.tolist()])
+        shift = np.eye(4)
+        shift[:3, 3] = self._centre_sum / self._n_views              # X = X' + mean centre
+        normal = shift.T @ np.stack([self._normal[r] for r in ranks.tolist()]) @ shift
+        _, vecs = np.linalg.eigh(normal)
+        Xh = vecs[:, :, 0]                                           # smallest eigenvalue
+        with np.errstate(invalid="ignore", divide="ignore"):
+            X = Xh[:, :3] / Xh[:, 3:4] + shift[:3, 3]
+        X[n_views < 2] = np.nan
+
+        view_ranks, P, pix, _ = (np.concatenate(parts) for parts in zip(*self._views.values()))
+        point_idx = np.searchsorted(ranks, view_ranks)
+        resid = self.reprojection_sq(X[point_idx], P, pix)
+        err = np.sqrt(np.bincount(point_idx, weights=resid, minlength=len(ranks)) / n_views)
+
+        geo = np.full((len(ranks), 3), np.nan)
+        ok = np.isfinite(X).all(axis=1)
+        if ok.any():
+            geo[ok] = enu_to_geodetic(X[ok], self.origin)
+
+        return pd.DataFrame({
+            "rank": ranks,
+            "lat": geo[:, 0],
+            "lon": geo[:, 1],
+            "alt": geo[:, 2],
+            "n_views": n_views,
+            "reproj_err_px": err,
+        })